@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Rick Jefferson Solutions - Mailing Path Benchmark
+Throughput and resilience of bulk dispute mailing against the USPS stand-in
+
+Starts usps_standin in-process, points a fresh USPSService at it and runs a
+mailing job end to end (address verification, label creation, label
+download into the label store). Reports throughput, job outcome, retries,
+circuit breaker activity, quota waits and what the stand-in saw per API
+family.
+
+The client-side USPS quota is off by default (the stand-in has no quota and
+the production rate would dominate the timing); --quota-per-hour turns it on.
+
+Usage:
+    python benchmark_mailing.py --letters 500 --concurrency 20 \\
+        --latency lognormal:120:0.6 --error-rate 0.05 --burst-every 30 --burst-seconds 3
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+
+# Recipients reused across letters so envelope consolidation has work to do
+RECIPIENTS = [
+    {"streetAddress": "PO Box 4500", "cityName": "Allen", "state": "TX", "zipCode": "75013"},
+    {"streetAddress": "PO Box 740256", "cityName": "Atlanta", "state": "GA", "zipCode": "30374"},
+    {"streetAddress": "PO Box 2000", "cityName": "Chester", "state": "PA", "zipCode": "19016"}
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def configure_environment(port: int, workdir: str, quota_per_hour: float = 0) -> None:
+    """Environment for the platform modules; must run before they are imported"""
+    os.environ.update({
+        'USPS_BASE_URL': f'http://127.0.0.1:{port}',
+        'USPS_ENVIRONMENT': 'standin',
+        'USPS_CONSUMER_KEY': 'standin',
+        'USPS_CONSUMER_SECRET': 'standin',
+        'USPS_ADDRESS_CACHE_PERSISTENT': 'false',
+        'USPS_LABEL_STORE_DIR': os.path.join(workdir, 'labels'),
+        'USPS_LOCATIONS_FILE': os.path.join(workdir, 'usps_locations.json'),
+        'USPS_LOCATIONS_REFRESH_HOURS': '0',
+        'USPS_TRACKING_REFRESH_ENABLED': 'false',
+        'USPS_QUOTA_PER_HOUR': str(quota_per_hour),
+        'MAILING_JOB_STORE': 'memory'
+    })
+    os.environ.pop('REDIS_URL', None)
+
+
+async def run_benchmark(args) -> dict:
+    import httpx
+    import uvicorn
+    from usps_standin import FaultProfile, create_standin_app
+    from usps_service import USPSService
+    from mailing_jobs import MailingJobManager
+
+    standin = create_standin_app(FaultProfile(args.latency, args.error_rate, args.burst_every, args.burst_seconds))
+    server = uvicorn.Server(uvicorn.Config(standin, host='127.0.0.1', port=args.port, log_level='warning'))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    service = USPSService()
+    await service.start()
+    manager = MailingJobManager(service, concurrency=args.concurrency)
+
+    items = [
+        {
+            'clientId': f"client-{index % args.clients}",
+            'disputeId': f"dispute-{index}",
+            'recipientAddress': random.choice(RECIPIENTS),
+            'letterType': 'initial',
+            'pageCount': random.randint(1, 4)
+        }
+        for index in range(args.letters)
+    ]
+
+    started = time.perf_counter()
+    job = await manager.create_job(items, concurrency=args.concurrency, consolidate=not args.no_consolidate)
+    while True:
+        progress = await manager.get_progress(job['jobId'])
+        if progress['status'] not in ('queued', 'running'):
+            break
+        await asyncio.sleep(0.1)
+    elapsed = time.perf_counter() - started
+
+    health = await service.health_check()
+    async with httpx.AsyncClient(base_url=service.base_url) as client:
+        standin_stats = (await client.get('/__standin/stats')).json()
+
+    await manager.close()
+    await service.close()
+    server.should_exit = True
+    await server_task
+
+    return {
+        'letters': args.letters,
+        'concurrency': args.concurrency,
+        'faults': {
+            'latency': args.latency,
+            'errorRate': args.error_rate,
+            'burstEverySeconds': args.burst_every,
+            'burstSeconds': args.burst_seconds
+        },
+        'elapsedSeconds': round(elapsed, 3),
+        'lettersPerSecond': round(args.letters / elapsed, 2) if elapsed else None,
+        'job': progress,
+        'retries': health.get('retries'),
+        'circuitBreakers': health.get('circuitBreakers'),
+        'coalescing': health.get('coalescing'),
+        'quota': health.get('quota'),
+        'standin': standin_stats
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the bulk mailing path against the USPS stand-in')
+    parser.add_argument('--letters', type=int, default=200)
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--no-consolidate', action='store_true')
+    parser.add_argument('--latency', default='lognormal:80:0.5')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--burst-every', type=float, default=0.0)
+    parser.add_argument('--burst-seconds', type=float, default=0.0)
+    parser.add_argument('--quota-per-hour', type=float, default=0,
+                        help='Client-side USPS quota to apply (default 0: off)')
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', default=None, help='Write the report as JSON to this file')
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    args.port = args.port or free_port()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(args.port, workdir, args.quota_per_hour)
+        report = asyncio.run(run_benchmark(args))
+
+    job = report['job']
+    print("📮 Mailing path benchmark (USPS stand-in)")
+    print("=" * 45)
+    print(f"Letters: {report['letters']}  Concurrency: {report['concurrency']}  Envelopes: {job['envelopes']}")
+    print(f"Elapsed: {report['elapsedSeconds']}s  Throughput: {report['lettersPerSecond']} letters/s")
+    print(f"Job: {job['status']}  Sent: {job['sent']}  Failed: {job['failed']}  Unconfirmed: {job['unconfirmed']}")
+    retries = report['retries'] or {}
+    print(f"Retries: {retries.get('total', 0)}")
+    for family, counters in (retries.get('byFamily') or {}).items():
+        print(f"  {family}: {counters['retries']} retries, {counters['recovered']} recovered, "
+              f"{counters['exhausted']} exhausted, {counters['notRetried']} not retried")
+    quota = report['quota'] or {}
+    if quota.get('enabled'):
+        for request_class, counters in quota['classes'].items():
+            print(f"Quota '{request_class}': {counters['waited']} waited {counters['waitSeconds']}s, "
+                  f"{counters['rejected']} rejected")
+    else:
+        print("Quota: off")
+    for name, breaker in (report['circuitBreakers'] or {}).items():
+        print(f"Circuit '{name}': {breaker['state']}, opened {breaker['timesOpened']}x, rejected {breaker['rejected']}")
+    for family, stats in report['standin']['families'].items():
+        print(f"  {family}: {stats['requests']} requests, {stats['throttled']} throttled, {stats['errors']} errors")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📄 Report saved to: {args.output}")
+
+    return 0 if job['status'] == 'completed' else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Rick Jefferson Solutions - Dispute Letter Envelope Batching
+Groups letters that can share one certified envelope
+
+Letters for the same client and the same recipient address (with the same
+extra services) created within USPS_ENVELOPE_WINDOW_HOURS of each other
+go in one envelope. That means one label, one CERTIFIED_MAIL/RETURN_RECEIPT
+fee and one tracking number for all of them. An envelope is closed when
+the next letter would push it over USPS_ENVELOPE_MAX_WEIGHT_OZ.
+
+Letters of one job share a creation time, so the window matters when a
+job picks up unsent letters left by earlier jobs (see mailing_jobs).
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from usps_cache import normalize_address
+from usps_rates import letter_weight_oz
+
+DEFAULT_WINDOW_HOURS = float(os.getenv('USPS_ENVELOPE_WINDOW_HOURS', '24'))
+
+# First-Class Mail flats top out at 13 oz
+DEFAULT_MAX_WEIGHT_OZ = float(os.getenv('USPS_ENVELOPE_MAX_WEIGHT_OZ', '13'))
+
+
+def envelope_key(letter: Dict) -> Tuple:
+    """Letters with the same key may share an envelope"""
+    return (
+        str(letter['client_id']),
+        normalize_address(letter['recipient_address']),
+        tuple(sorted(letter.get('special_services') or []))
+    )
+
+
+def envelope_weight_oz(letters: List[Dict]) -> float:
+    """Weight of one envelope holding every page of letters"""
+    return letter_weight_oz(sum(letter.get('page_count') or 1 for letter in letters))
+
+
+def envelope_letter_types(letters: List[Dict]) -> List[str]:
+    """Distinct letter types in an envelope, in letter order"""
+    return list(dict.fromkeys(letter['letter_type'] for letter in letters))
+
+
+def group_envelopes(letters: List[Dict], window_hours: Optional[float] = None,
+                    max_weight_oz: Optional[float] = None) -> List[List[Dict]]:
+    """
+    Split letters into envelopes.
+
+    letters should be in creation order. Letters keep their relative order inside an envelope; envelopes are
+    returned in the order of their first letter.
+    """
+    window = timedelta(hours=DEFAULT_WINDOW_HOURS if window_hours is None else window_hours)
+    max_weight = max_weight_oz or DEFAULT_MAX_WEIGHT_OZ
+
+    envelopes: List[List[Dict]] = []
+    open_envelopes: Dict[Tuple, List[Dict]] = {}
+
+    for letter in letters:
+        key = envelope_key(letter)
+        envelope = open_envelopes.get(key)
+
+        if envelope is not None:
+            opened_at = envelope[0].get('created_at') or datetime.now()
+            created_at = letter.get('created_at') or datetime.now()
+            if created_at - opened_at > window or envelope_weight_oz(envelope + [letter]) > max_weight:
+                envelope = None
+
+        if envelope is None:
+            envelope = []
+            envelopes.append(envelope)
+            open_envelopes[key] = envelope
+
+        envelope.append(letter)
+
+    return envelopes
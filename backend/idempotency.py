@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Rick Jefferson Solutions - Idempotency Key Store
+Replays the original result for retried POST requests that hit Stripe and USPS
+
+Each (scope, Idempotency-Key) pair is recorded while the first request is
+in flight and after it completes. Duplicates arriving while the first request
+is still running wait on it; later duplicates get the stored result without a
+new upstream call. Records expire after IDEMPOTENCY_TTL_SECONDS.
+
+A failure is only forgotten (so a retry runs again) when the upstream call is
+known not to have happened. A result marked outcomeUnknown (e.g. a label
+request that timed out or got a 5xx) is stored and replayed like a success:
+USPS may have bought the postage, so a retry must not buy it again.
+
+When Redis is configured the records are shared by every API worker, so a
+retry routed to a different uvicorn worker is still deduplicated.
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_NOT_FOUND = object()
+
+
+class IdempotencyConflictError(Exception):
+    """Raised when an idempotency key is reused with a different request payload"""
+
+
+class IdempotencyInProgressError(Exception):
+    """Raised when another worker is still processing the same idempotency key"""
+
+
+class IdempotencyStore:
+    """TTL store of in-flight and completed idempotent requests"""
+
+    def __init__(self, ttl_seconds: Optional[int] = None, wait_timeout_seconds: Optional[float] = None,
+                 max_entries: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds or int(os.getenv('IDEMPOTENCY_TTL_SECONDS', '86400'))
+        self.wait_timeout_seconds = wait_timeout_seconds or float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT_SECONDS', '60'))
+        self.max_entries = max_entries or int(os.getenv('IDEMPOTENCY_MAX_ENTRIES', '10000'))
+        self.poll_interval_seconds = 0.1
+
+        # record key -> {'fingerprint', 'future', 'expires_at'}; insertion order is expiry order
+        self._records: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.stats = {'executed': 0, 'replayed': 0, 'waited': 0, 'conflicts': 0}
+
+    @staticmethod
+    def fingerprint(payload: Any) -> str:
+        """Stable hash of a request payload"""
+        canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def is_replayable(result: Any) -> bool:
+        """
+        Failed service results are not stored so that a retry can try again,
+        unless the failure may have taken effect upstream (outcomeUnknown).
+        """
+        if not (isinstance(result, dict) and result.get('success') is False):
+            return True
+        return bool(result.get('outcomeUnknown'))
+
+    async def run(self, scope: str, key: Optional[str], payload: Any,
+                  operation: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run operation once per (scope, key) and return (result, replayed).
+
+        Requests without a key are executed directly.
+        """
+        if not key:
+            return await operation(), False
+
+        record_key = f"{scope}:{key}"
+        fingerprint = self.fingerprint(payload)
+
+        while True:
+            self._purge_expired()
+            record = self._records.get(record_key)
+            if record is None:
+                break
+
+            if record['fingerprint'] != fingerprint:
+                self.stats['conflicts'] += 1
+                raise IdempotencyConflictError(
+                    f"Idempotency-Key '{key}' was already used with a different request payload"
+                )
+
+            future = record['future']
+            if not future.done():
+                self.stats['waited'] += 1
+
+            try:
+                result = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    # The original request was cancelled; run this one instead
+                    continue
+                raise
+
+            self.stats['replayed'] += 1
+            return result, True
+
+        return await self._execute(record_key, fingerprint, operation)
+
+    async def _execute(self, record_key: str, fingerprint: str,
+                       operation: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Run the operation as the owner of record_key"""
+        future = asyncio.get_running_loop().create_future()
+        self._records[record_key] = {
+            'fingerprint': fingerprint,
+            'future': future,
+            'expires_at': time.monotonic() + self.ttl_seconds
+        }
+
+        owns_shared = False
+        try:
+            owns_shared, shared_result = await self._claim_shared(record_key, fingerprint)
+
+            if shared_result is not _NOT_FOUND:
+                result, replayed = shared_result, True
+                self.stats['replayed'] += 1
+            else:
+                result, replayed = await operation(), False
+                self.stats['executed'] += 1
+
+        except asyncio.CancelledError:
+            self._records.pop(record_key, None)
+            future.cancel()
+            if owns_shared:
+                await self._release_shared(record_key)
+            raise
+
+        except BaseException as error:
+            self._records.pop(record_key, None)
+            future.set_exception(error)
+            future.exception()  # mark retrieved when there are no waiters
+            if owns_shared:
+                await self._release_shared(record_key)
+            raise
+
+        future.set_result(result)
+
+        if self.is_replayable(result):
+            if owns_shared:
+                await self._store_shared(record_key, fingerprint, result)
+        else:
+            self._records.pop(record_key, None)
+            if owns_shared:
+                await self._release_shared(record_key)
+
+        return result, replayed
+
+    def _purge_expired(self) -> None:
+        """Drop expired and over-capacity records from the front of the queue"""
+        now = time.monotonic()
+        while self._records:
+            oldest_key, oldest = next(iter(self._records.items()))
+            if not oldest['future'].done():
+                break
+            if oldest['expires_at'] > now and len(self._records) <= self.max_entries:
+                break
+            self._records.pop(oldest_key)
+
+    # ========== SHARED (REDIS) TIER ==========
+
+    @staticmethod
+    def _shared_key(record_key: str) -> str:
+        return f"idempotency:{record_key}"
+
+    async def _claim_shared(self, record_key: str, fingerprint: str) -> Tuple[bool, Any]:
+        """
+        Claim record_key across workers.
+
+        Returns (owned, result). result is the stored response when another
+        worker already completed the request, otherwise _NOT_FOUND.
+        """
+        redis = get_redis()
+        if redis is None:
+            return False, _NOT_FOUND
+
+        shared_key = self._shared_key(record_key)
+        marker = json.dumps({'state': 'in_flight', 'fingerprint': fingerprint})
+        deadline = time.monotonic() + self.wait_timeout_seconds
+
+        try:
+            while True:
+                if await redis.set(shared_key, marker, nx=True, ex=self.ttl_seconds):
+                    return True, _NOT_FOUND
+
+                raw = await redis.get(shared_key)
+                if raw is not None:
+                    entry = json.loads(raw)
+                    if entry.get('fingerprint') != fingerprint:
+                        self.stats['conflicts'] += 1
+                        raise IdempotencyConflictError(
+                            "Idempotency-Key was already used with a different request payload"
+                        )
+                    if entry.get('state') == 'completed':
+                        return False, entry.get('response')
+
+                # In flight elsewhere, or expired between SET NX and GET: back off either way
+                if time.monotonic() >= deadline:
+                    raise IdempotencyInProgressError(
+                        "A request with this Idempotency-Key is still being processed"
+                    )
+
+                self.stats['waited'] += 1
+                await asyncio.sleep(self.poll_interval_seconds)
+
+        except (IdempotencyConflictError, IdempotencyInProgressError):
+            raise
+        except Exception as error:
+            logger.warning(f"Shared idempotency store unavailable, using local store only: {str(error)}")
+            return False, _NOT_FOUND
+
+    async def _store_shared(self, record_key: str, fingerprint: str, result: Any) -> None:
+        redis = get_redis()
+        try:
+            await redis.set(
+                self._shared_key(record_key),
+                json.dumps({'state': 'completed', 'fingerprint': fingerprint, 'response': result}, default=str),
+                ex=self.ttl_seconds
+            )
+        except Exception as error:
+            logger.warning(f"Failed to store idempotent response: {str(error)}")
+
+    async def _release_shared(self, record_key: str) -> None:
+        redis = get_redis()
+        try:
+            await redis.delete(self._shared_key(record_key))
+        except Exception as error:
+            logger.warning(f"Failed to release idempotency key: {str(error)}")
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Rick Jefferson Solutions - USPS Label Store
+Content-addressed local storage for shipping label PDFs
+
+Labels are fetched from USPS once and written to
+<USPS_LABEL_STORE_DIR>/blobs/<sha[:2]>/<sha>.pdf, so identical files are
+stored once. refs/<tracking number> holds the hash of a letter's label,
+which links letters.tracking_number to its blob. Multi-label print files
+are assembled by streaming one label at a time and cached under prints/
+keyed by the hashes they contain, so a reprint is served straight from disk.
+
+Features:
+- Streaming, hash-as-you-write blob ingestion with deduplication
+- Byte-range reads for resumable downloads
+- Streaming multi-label PDF assembly (requires pypdf)
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import os
+import re
+import io
+import asyncio
+import hashlib
+import logging
+import tempfile
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from pypdf import PdfReader
+    from pypdf.generic import (
+        ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject, StreamObject
+    )
+    PDF_ASSEMBLY_AVAILABLE = True
+except ImportError:
+    PDF_ASSEMBLY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LABEL_STORE_DIR = Path(__file__).parent / 'data' / 'labels'
+CHUNK_SIZE = 64 * 1024
+
+_TRACKING_NUMBER = re.compile(r'^[A-Za-z0-9]{1,40}$')
+
+# Page attributes a page can inherit from its parent page-tree nodes
+INHERITABLE_PAGE_KEYS = ('/Resources', '/MediaBox', '/CropBox', '/Rotate')
+
+
+class LabelNotFoundError(Exception):
+    """Raised when no label is stored for a tracking number"""
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single 'bytes=start-end' range into inclusive offsets.
+
+    Returns None for a missing or multi-range header (serve the whole file)
+    and raises ValueError when the range cannot be satisfied.
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+
+    start_text, _, end_text = header[len('bytes='):].strip().partition('-')
+    if start_text:
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    elif end_text:
+        start = max(size - int(end_text), 0)
+        end = size - 1
+    else:
+        raise ValueError("Empty byte range")
+
+    end = min(end, size - 1)
+    if start > end or start >= size:
+        raise ValueError(f"Range {header} not satisfiable for {size} bytes")
+    return start, end
+
+
+def iter_file(path: Path, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+    """Read path[start:end] (inclusive) in chunks"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = (end - start + 1) if end is not None else None
+        while remaining is None or remaining > 0:
+            chunk = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+class LabelStore:
+    """Content-addressed blob store for label PDFs"""
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = Path(root or os.getenv('USPS_LABEL_STORE_DIR') or DEFAULT_LABEL_STORE_DIR)
+        self.blob_dir = self.root / 'blobs'
+        self.ref_dir = self.root / 'refs'
+        self.print_dir = self.root / 'prints'
+        self.tmp_dir = self.root / 'tmp'
+        for directory in (self.blob_dir, self.ref_dir, self.print_dir, self.tmp_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+        self.stats_counters = {'stored': 0, 'deduplicated': 0}
+
+    # ========== BLOBS AND REFS ==========
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.blob_dir / sha256[:2] / f"{sha256}.pdf"
+
+    def _ref_path(self, tracking_number: str) -> Path:
+        if not _TRACKING_NUMBER.match(tracking_number or ''):
+            raise ValueError(f"Invalid tracking number: {tracking_number!r}")
+        return self.ref_dir / tracking_number
+
+    def get_hash(self, tracking_number: str) -> Optional[str]:
+        """Hash of the stored label for a tracking number, or None"""
+        try:
+            return self._ref_path(tracking_number).read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def label_path(self, tracking_number: str) -> Path:
+        sha256 = self.get_hash(tracking_number)
+        if sha256 is None or not self.blob_path(sha256).exists():
+            raise LabelNotFoundError(f"No stored label for {tracking_number}")
+        return self.blob_path(sha256)
+
+    def _link(self, tracking_number: str, sha256: str) -> None:
+        ref_path = self._ref_path(tracking_number)
+        tmp_path = ref_path.with_suffix('.tmp')
+        tmp_path.write_text(sha256)
+        os.replace(tmp_path, ref_path)
+
+    def _commit_blob(self, tmp_path: Path, sha256: str) -> None:
+        """Move a fully written temp file into place, or drop it if the blob exists"""
+        blob_path = self.blob_path(sha256)
+        if blob_path.exists():
+            tmp_path.unlink()
+            self.stats_counters['deduplicated'] += 1
+            return
+        blob_path.parent.mkdir(exist_ok=True)
+        os.replace(tmp_path, blob_path)
+        self.stats_counters['stored'] += 1
+
+    async def put_stream(self, tracking_number: str, chunks: AsyncIterator[bytes]) -> str:
+        """Store a label from a byte stream, link it to tracking_number and return its hash"""
+        self._ref_path(tracking_number)
+        digest = hashlib.sha256()
+        fd, name = tempfile.mkstemp(dir=self.tmp_dir, suffix='.part')
+        tmp_path = Path(name)
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                async for chunk in chunks:
+                    digest.update(chunk)
+                    await asyncio.to_thread(f.write, chunk)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        sha256 = digest.hexdigest()
+        await asyncio.to_thread(self._commit_blob, tmp_path, sha256)
+        await asyncio.to_thread(self._link, tracking_number, sha256)
+        return sha256
+
+    async def put_bytes(self, tracking_number: str, data: bytes) -> str:
+        async def one_chunk():
+            yield data
+        return await self.put_stream(tracking_number, one_chunk())
+
+    # ========== PRINT FILES ==========
+
+    def iter_print_pdf(self, tracking_numbers: List[str]) -> Tuple[Optional[Path], Iterator[bytes]]:
+        """
+        Multi-label print PDF for tracking_numbers.
+
+        Returns (path, chunks): path is set when the assembled file is already
+        cached (so ranges can be served), otherwise chunks streams a freshly
+        assembled file while caching it.
+        """
+        hashes = [self.get_hash(number) for number in tracking_numbers]
+        missing = [number for number, sha256 in zip(tracking_numbers, hashes) if sha256 is None]
+        if missing:
+            raise LabelNotFoundError(f"No stored label for {', '.join(missing)}")
+
+        key = hashlib.sha256(','.join(hashes).encode('ascii')).hexdigest()
+        print_path = self.print_dir / f"{key}.pdf"
+        if print_path.exists():
+            return print_path, iter_file(print_path)
+
+        if not PDF_ASSEMBLY_AVAILABLE:
+            raise RuntimeError("Multi-label PDFs require the pypdf package")
+
+        return None, self._assemble_and_cache([self.blob_path(sha256) for sha256 in hashes], print_path)
+
+    def _assemble_and_cache(self, paths: List[Path], print_path: Path) -> Iterator[bytes]:
+        fd, name = tempfile.mkstemp(dir=self.tmp_dir, suffix='.part')
+        tmp_path = Path(name)
+        try:
+            with os.fdopen(fd, 'wb') as cache:
+                for chunk in iter_merged_pdf(paths):
+                    cache.write(chunk)
+                    yield chunk
+            os.replace(tmp_path, print_path)
+        finally:
+            # Client went away (GeneratorExit) or assembly failed
+            tmp_path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict:
+        return {
+            'root': str(self.root),
+            'pdfAssembly': PDF_ASSEMBLY_AVAILABLE,
+            **self.stats_counters
+        }
+
+
+def iter_merged_pdf(paths: List[Path]) -> Iterator[bytes]:
+    """
+    Concatenate the pages of several PDFs into one PDF, streaming output.
+
+    Only one source file is parsed at a time; its page objects are
+    renumbered and written immediately, so memory use does not grow with
+    the number of labels. The page tree, catalog and xref table go last.
+    """
+    buffer = io.BytesIO()
+    offset = 0
+    offsets: Dict[int, int] = {}
+    pages_id, catalog_id = 1, 2
+    next_id = 3
+    page_ids: List[int] = []
+
+    def flush() -> bytes:
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    def write_object(object_id: int, obj) -> None:
+        offsets[object_id] = offset + buffer.tell()
+        buffer.write(f"{object_id} 0 obj\n".encode('ascii'))
+        obj.write_to_stream(buffer)
+        buffer.write(b"\nendobj\n")
+
+    def emit():
+        nonlocal offset
+        data = flush()
+        offset += len(data)
+        return data
+
+    buffer.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    for path in paths:
+        reader = PdfReader(str(path))
+        mapping: Dict[Tuple[int, int], int] = {}
+        pending: List[Tuple[IndirectObject, int]] = []
+
+        def reference(indirect: IndirectObject) -> IndirectObject:
+            nonlocal next_id
+            key = (indirect.idnum, indirect.generation)
+            if key not in mapping:
+                mapping[key] = next_id
+                pending.append((indirect, next_id))
+                next_id += 1
+            return IndirectObject(mapping[key], 0, None)
+
+        def copy(obj):
+            if isinstance(obj, IndirectObject):
+                return reference(obj)
+            if isinstance(obj, DictionaryObject):
+                copied = DictionaryObject()
+                for name, value in obj.items():
+                    copied[NameObject(name)] = copy(value)
+                return copied
+            if isinstance(obj, ArrayObject):
+                return ArrayObject(copy(value) for value in obj)
+            return obj
+
+        # Number the pages first so references to them (annotations, link
+        # destinations) point at the copied page instead of pulling it in
+        for page in reader.pages:
+            mapping[(page.indirect_reference.idnum, page.indirect_reference.generation)] = next_id
+            next_id += 1
+
+        for page in reader.pages:
+            page_id = mapping[(page.indirect_reference.idnum, page.indirect_reference.generation)]
+            page_ids.append(page_id)
+
+            page_dict = DictionaryObject()
+            for name, value in page.items():
+                if name != '/Parent':
+                    page_dict[NameObject(name)] = copy(value)
+            parent = page.get('/Parent')
+            while parent is not None:
+                parent = parent.get_object()
+                for name in INHERITABLE_PAGE_KEYS:
+                    if name not in page_dict and name in parent:
+                        page_dict[NameObject(name)] = copy(parent[name])
+                parent = parent.get('/Parent')
+            page_dict[NameObject('/Parent')] = IndirectObject(pages_id, 0, None)
+            write_object(page_id, page_dict)
+
+            while pending:
+                indirect, object_id = pending.pop()
+                obj = indirect.get_object()
+                if isinstance(obj, StreamObject):
+                    # Renumber the stream's references in place; pypdf then writes
+                    # the data still encoded, with a fresh /Length
+                    for name, value in list(obj.items()):
+                        if name != '/Length':
+                            obj[NameObject(name)] = copy(value)
+                    write_object(object_id, obj)
+                else:
+                    write_object(object_id, copy(obj))
+
+            if buffer.tell() >= CHUNK_SIZE:
+                yield emit()
+
+    kids = ArrayObject(IndirectObject(page_id, 0, None) for page_id in page_ids)
+    write_object(pages_id, DictionaryObject({
+        NameObject('/Type'): NameObject('/Pages'),
+        NameObject('/Kids'): kids,
+        NameObject('/Count'): NumberObject(len(page_ids))
+    }))
+    write_object(catalog_id, DictionaryObject({
+        NameObject('/Type'): NameObject('/Catalog'),
+        NameObject('/Pages'): IndirectObject(pages_id, 0, None)
+    }))
+
+    xref_offset = offset + buffer.tell()
+    buffer.write(f"xref\n0 {next_id}\n0000000000 65535 f \n".encode('ascii'))
+    for object_id in range(1, next_id):
+        buffer.write(f"{offsets[object_id]:010d} 00000 n \n".encode('ascii'))
+    buffer.write(
+        f"trailer\n<< /Size {next_id} /Root {catalog_id} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode('ascii')
+    )
+    yield emit()
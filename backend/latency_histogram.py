@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Rick Jefferson Solutions - Route Latency Histograms
+Per-route request latency percentiles (p50/p95/p99) for the API
+
+Latencies are recorded in microseconds into log-linear buckets (HDR
+style): 32 linear sub-buckets per power of two, so every bucket is within
+~3% of its value, from 1 microsecond to ~19 hours in 1024 counters.
+Recording is a bit_length, a shift and a list increment (~0.5us in
+CPython). Histograms merge by adding counts, so windows and workers
+combine exactly.
+
+Each worker keeps one histogram per route for each of the last
+LATENCY_WINDOW_SLOTS slots of LATENCY_SLOT_SECONDS (default 5 x 60s), so
+percentiles cover a sliding window. With Redis configured every worker
+publishes its window every LATENCY_PUBLISH_SECONDS and readers merge all
+workers; otherwise percentiles cover the answering worker only.
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import os
+import json
+import time
+import socket
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+LINEAR_LIMIT = SUB_BUCKETS * 2
+MAX_MICROSECONDS = (1 << 36) - 1
+BUCKET_COUNT = ((MAX_MICROSECONDS.bit_length() - SUB_BUCKET_BITS - 1) << SUB_BUCKET_BITS) + LINEAR_LIMIT
+
+WORKER_KEY_PREFIX = 'latency:worker:'
+
+
+def bucket_bounds(index: int) -> Tuple[int, int]:
+    """[low, high) microseconds covered by a bucket"""
+    if index < LINEAR_LIMIT:
+        return index, index + 1
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    top = index - (shift << SUB_BUCKET_BITS)
+    return top << shift, (top + 1) << shift
+
+
+class LatencyHistogram:
+    """Log-linear latency histogram (count and mean are derived from the buckets)"""
+
+    __slots__ = ('counts', 'max_us')
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.max_us = 0
+
+    def record(self, seconds: float) -> None:
+        microseconds = int(seconds * 1_000_000)
+        if microseconds < LINEAR_LIMIT:
+            if microseconds < 0:
+                microseconds = 0
+            self.counts[microseconds] += 1
+        else:
+            if microseconds > MAX_MICROSECONDS:
+                microseconds = MAX_MICROSECONDS
+            shift = microseconds.bit_length() - SUB_BUCKET_BITS - 1
+            self.counts[(shift << SUB_BUCKET_BITS) + (microseconds >> shift)] += 1
+        if microseconds > self.max_us:
+            self.max_us = microseconds
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        counts = self.counts
+        for index, count in enumerate(other.counts):
+            if count:
+                counts[index] += count
+        self.max_us = max(self.max_us, other.max_us)
+        return self
+
+    def _midpoint(self, index: int) -> float:
+        low, high = bucket_bounds(index)
+        return min((low + high) / 2, self.max_us)
+
+    def percentile(self, pct: float) -> float:
+        """Latency in milliseconds at or below which pct% of requests finished"""
+        total = self.count
+        if not total:
+            return 0.0
+        rank = max(1, round(pct / 100 * total))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self._midpoint(index) / 1000
+        return self.max_us / 1000
+
+    def summary(self) -> Dict:
+        total = self.count
+        weighted = sum(count * self._midpoint(index) for index, count in enumerate(self.counts) if count)
+        return {
+            'count': total,
+            'meanMs': round(weighted / total / 1000, 3) if total else 0.0,
+            'p50Ms': round(self.percentile(50), 3),
+            'p90Ms': round(self.percentile(90), 3),
+            'p95Ms': round(self.percentile(95), 3),
+            'p99Ms': round(self.percentile(99), 3),
+            'maxMs': round(self.max_us / 1000, 3)
+        }
+
+    def to_dict(self) -> Dict:
+        """Compact form: only non-empty buckets"""
+        return {
+            'buckets': {str(index): count for index, count in enumerate(self.counts) if count},
+            'maxUs': self.max_us
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'LatencyHistogram':
+        histogram = cls()
+        for index, count in data.get('buckets', {}).items():
+            histogram.counts[int(index)] = count
+        histogram.max_us = data.get('maxUs', 0)
+        return histogram
+
+
+class RouteLatencyRecorder:
+    """Sliding-window latency histograms per route"""
+
+    def __init__(self):
+        self.slot_seconds = float(os.getenv('LATENCY_SLOT_SECONDS', '60'))
+        self.window_slots = int(os.getenv('LATENCY_WINDOW_SLOTS', '5'))
+        self.publish_seconds = float(os.getenv('LATENCY_PUBLISH_SECONDS', '10'))
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._slots: Deque[Dict[str, LatencyHistogram]] = deque(maxlen=self.window_slots)
+        self._current: Dict[str, LatencyHistogram] = {}
+        self._slots.append(self._current)
+        self._slot_ends = time.perf_counter() + self.slot_seconds
+        self._publish_task: Optional[asyncio.Task] = None
+
+    @property
+    def window_seconds(self) -> int:
+        return int(self.slot_seconds * self.window_slots)
+
+    def record(self, route: str, seconds: float, now: float) -> None:
+        """Record one request; now is time.perf_counter() (callers already have it)"""
+        if now >= self._slot_ends:
+            self._rotate(now)
+        histogram = self._current.get(route)
+        if histogram is None:
+            histogram = self._current[route] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def _rotate(self, now: float) -> None:
+        # Idle slots in between count as empty
+        elapsed_slots = int((now - self._slot_ends) // self.slot_seconds) + 1
+        for _ in range(min(elapsed_slots, self.window_slots)):
+            self._current = {}
+            self._slots.append(self._current)
+        self._slot_ends += elapsed_slots * self.slot_seconds
+
+    def window(self) -> Dict[str, LatencyHistogram]:
+        """This worker's histograms merged over the window"""
+        self._rotate(time.perf_counter())
+        merged: Dict[str, LatencyHistogram] = {}
+        for slot in self._slots:
+            for route, histogram in slot.items():
+                merged.setdefault(route, LatencyHistogram()).merge(histogram)
+        return merged
+
+    # ========== SHARING ACROSS WORKERS ==========
+
+    def start(self) -> None:
+        if get_redis() is not None and self._publish_task is None:
+            self._publish_task = asyncio.create_task(self._publish_loop())
+
+    async def close(self) -> None:
+        if self._publish_task is not None:
+            self._publish_task.cancel()
+            try:
+                await self._publish_task
+            except asyncio.CancelledError:
+                pass
+            self._publish_task = None
+
+    async def _publish(self) -> None:
+        redis = get_redis()
+        if redis is None:
+            return
+        snapshot = {route: histogram.to_dict() for route, histogram in self.window().items()}
+        await redis.set(
+            f"{WORKER_KEY_PREFIX}{self.worker_id}", json.dumps(snapshot, separators=(',', ':')),
+            ex=int(self.publish_seconds * 3)
+        )
+
+    async def _publish_loop(self) -> None:
+        while True:
+            try:
+                await self._publish()
+            except Exception as error:
+                logger.warning(f"Failed to publish route latencies: {str(error)}")
+            await asyncio.sleep(self.publish_seconds)
+
+    async def collect(self) -> Tuple[Dict[str, LatencyHistogram], List[str]]:
+        """Window histograms merged across workers, and the workers included"""
+        merged = self.window()
+        workers = [self.worker_id]
+
+        redis = get_redis()
+        if redis is None:
+            return merged, workers
+
+        try:
+            keys = [key async for key in redis.scan_iter(match=f"{WORKER_KEY_PREFIX}*")]
+            own_key = f"{WORKER_KEY_PREFIX}{self.worker_id}"
+            keys = [key for key in keys if key != own_key]
+            for key, raw in zip(keys, await redis.mget(keys) if keys else []):
+                if not raw:
+                    continue
+                for route, data in json.loads(raw).items():
+                    merged.setdefault(route, LatencyHistogram()).merge(LatencyHistogram.from_dict(data))
+                workers.append(key[len(WORKER_KEY_PREFIX):])
+        except Exception as error:
+            logger.warning(f"Route latencies from other workers unavailable: {str(error)}")
+        return merged, workers
+
+    async def report(self, route: Optional[str] = None) -> Dict:
+        """Percentiles per route over the window, slowest p95 first"""
+        histograms, workers = await self.collect()
+        routes = [
+            {'route': name, **histogram.summary()}
+            for name, histogram in histograms.items()
+            if route is None or name.endswith(f" {route}")
+        ]
+        routes.sort(key=lambda item: item['p95Ms'], reverse=True)
+        return {
+            'windowSeconds': self.window_seconds,
+            'workers': workers,
+            'routes': routes
+        }
+
+
+# Create singleton instance
+route_latency = RouteLatencyRecorder()
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Rick Jefferson Solutions - Dispute Letter Store
+Persistence for mailing jobs, dispute letters and their tracking events
+
+Two backends share one interface:
+- InMemoryLetterStore: process-local, the default (matches the API's
+  in-memory clients/disputes storage); single-worker deployments only
+- SQLLetterStore: the mailing_jobs, letters and letter_tracking tables
+  from database/schema.sql, selected with MAILING_JOB_STORE=database
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import os
+import json
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+# letters.letter_type values allowed by the CHECK in database/schema.sql
+LetterType = Literal['initial', 'follow_up', 'escalation', 'final', 'custom']
+
+# Columns of the letters table the mailing code reads and writes
+LETTER_FIELDS = (
+    'id', 'dispute_id', 'client_id', 'mailing_job_id', 'mailing_job_position', 'letter_type',
+    'status', 'subject', 'content', 'recipient_name', 'recipient_address', 'recipient_id', 'send_method',
+    'special_services', 'page_count', 'sent_at', 'delivered_at', 'tracking_number', 'created_at', 'updated_at'
+)
+
+
+class LetterStore(ABC):
+    """Interface shared by the letter store backends"""
+
+    @abstractmethod
+    async def create_job(self, job: Dict) -> Dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_job(self, job_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_job(self, job_id: str, **fields) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def claim_job(self, job_id: str, force: bool = False) -> bool:
+        """Atomically mark a job running; False if it is already running"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def create_letters(self, letters: List[Dict]) -> List[Dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_letters(self, job_id: str, status: Optional[str] = None) -> List[Dict]:
+        """Letters of a job in submission order, each with its latest tracking event"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_unsent_letters(self, client_ids: List[str], since: datetime) -> List[Dict]:
+        """Job letters of these clients created since, not sent yet, oldest first, each with its latest event"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_letter(self, letter_id: str, **fields) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def add_tracking_event(self, letter_id: str, status: str, description: Optional[str] = None,
+                                 metadata: Optional[Dict] = None) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def count_letters(self, job_id: str) -> Dict[str, int]:
+        """Letter counts by status for a job"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_letters_in_transit(self) -> List[Dict]:
+        """Mailed letters that have a tracking number and are not delivered yet"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_letters_by_tracking(self, tracking_number: str) -> List[Dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_tracking_events(self, letter_id: str) -> List[Dict]:
+        """Tracking events of a letter, oldest first"""
+        raise NotImplementedError
+
+
+class InMemoryLetterStore(LetterStore):
+    """Process-local letter store"""
+
+    def __init__(self):
+        self.jobs: Dict[str, Dict] = {}
+        self.letters: Dict[str, Dict] = {}
+        self.job_letters: Dict[str, List[str]] = {}
+        self.tracking: Dict[str, List[Dict]] = {}
+
+    async def create_job(self, job: Dict) -> Dict:
+        job = {'id': str(uuid4()), 'created_at': datetime.now(), **job}
+        self.jobs[job['id']] = job
+        self.job_letters[job['id']] = []
+        return dict(job)
+
+    async def get_job(self, job_id: str) -> Optional[Dict]:
+        job = self.jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def update_job(self, job_id: str, **fields) -> None:
+        self.jobs[job_id].update(fields, updated_at=datetime.now())
+
+    async def claim_job(self, job_id: str, force: bool = False) -> bool:
+        job = self.jobs[job_id]
+        if job['status'] == 'running' and not force:
+            return False
+        job.update(status='running', started_at=job.get('started_at') or datetime.now(), completed_at=None,
+                   cancel_requested_at=None)
+        return True
+
+    async def create_letters(self, letters: List[Dict]) -> List[Dict]:
+        created = []
+        now = datetime.now()
+        for letter in letters:
+            letter = {**{field: None for field in LETTER_FIELDS}, **letter}
+            letter.update(id=str(uuid4()), created_at=now, updated_at=now)
+            self.letters[letter['id']] = letter
+            self.tracking[letter['id']] = []
+            if letter.get('mailing_job_id'):
+                self.job_letters[letter['mailing_job_id']].append(letter['id'])
+            created.append(dict(letter))
+        return created
+
+    async def get_letters(self, job_id: str, status: Optional[str] = None) -> List[Dict]:
+        letters = []
+        for letter_id in self.job_letters.get(job_id, []):
+            letter = self.letters[letter_id]
+            if status is None or letter['status'] == status:
+                events = self.tracking[letter_id]
+                letters.append({**letter, 'last_event': events[-1]['status'] if events else None})
+        return letters
+
+    async def get_unsent_letters(self, client_ids: List[str], since: datetime) -> List[Dict]:
+        client_ids = set(client_ids)
+        letters = [
+            {**letter, 'last_event': self.tracking[letter['id']][-1]['status'] if self.tracking[letter['id']] else None}
+            for letter in self.letters.values()
+            if letter['mailing_job_id'] and letter['status'] != 'sent'
+            and str(letter['client_id']) in client_ids and letter['created_at'] >= since
+        ]
+        return sorted(letters, key=lambda letter: (letter['created_at'], letter['mailing_job_position']))
+
+    async def update_letter(self, letter_id: str, **fields) -> None:
+        self.letters[letter_id].update(fields, updated_at=datetime.now())
+
+    async def add_tracking_event(self, letter_id: str, status: str, description: Optional[str] = None,
+                                 metadata: Optional[Dict] = None) -> None:
+        self.tracking[letter_id].append({
+            'id': str(uuid4()),
+            'letter_id': letter_id,
+            'status': status,
+            'description': description,
+            'metadata': metadata,
+            'created_at': datetime.now()
+        })
+
+    async def count_letters(self, job_id: str) -> Dict[str, int]:
+        return dict(Counter(self.letters[letter_id]['status'] for letter_id in self.job_letters.get(job_id, [])))
+
+    async def get_letters_in_transit(self) -> List[Dict]:
+        return [
+            dict(letter) for letter in self.letters.values()
+            if letter['status'] == 'sent' and letter['tracking_number']
+        ]
+
+    async def get_letters_by_tracking(self, tracking_number: str) -> List[Dict]:
+        return [dict(letter) for letter in self.letters.values() if letter['tracking_number'] == tracking_number]
+
+    async def get_tracking_events(self, letter_id: str) -> List[Dict]:
+        return list(self.tracking.get(letter_id, []))
+
+
+class SQLLetterStore(LetterStore):
+    """
+    Letter store on the PostgreSQL schema.
+
+    Uses a synchronous SQLAlchemy engine run in worker threads so the event
+    loop is never blocked on the database.
+    """
+
+    JSON_FIELDS = ('recipient_address', 'special_services', 'options')
+
+    def __init__(self, database_url: str):
+        from sqlalchemy import create_engine, text
+
+        self.text = text
+        self.engine = create_engine(database_url, pool_pre_ping=True, future=True)
+
+    async def _execute(self, sql: str, params: Any = None, fetch: bool = False):
+        def run():
+            with self.engine.begin() as conn:
+                result = conn.execute(self.text(sql), params or {})
+                if fetch:
+                    return [dict(row._mapping) for row in result]
+                return result.rowcount
+
+        return await asyncio.to_thread(run)
+
+    def _encode(self, fields: Dict) -> Dict:
+        return {
+            key: json.dumps(value) if key in self.JSON_FIELDS and value is not None else value
+            for key, value in fields.items()
+        }
+
+    @staticmethod
+    def _assignments(fields: Dict) -> str:
+        return ', '.join(
+            f"{key} = CAST(:{key} AS JSONB)" if key in SQLLetterStore.JSON_FIELDS else f"{key} = :{key}"
+            for key in fields
+        )
+
+    async def create_job(self, job: Dict) -> Dict:
+        job = {'id': str(uuid4()), **job}
+        columns = ', '.join(job)
+        values = ', '.join(
+            f"CAST(:{key} AS JSONB)" if key in self.JSON_FIELDS else f":{key}" for key in job
+        )
+        rows = await self._execute(
+            f"INSERT INTO mailing_jobs ({columns}) VALUES ({values}) RETURNING *",
+            self._encode(job),
+            fetch=True
+        )
+        return rows[0]
+
+    async def get_job(self, job_id: str) -> Optional[Dict]:
+        rows = await self._execute("SELECT * FROM mailing_jobs WHERE id = :id", {'id': job_id}, fetch=True)
+        return rows[0] if rows else None
+
+    async def update_job(self, job_id: str, **fields) -> None:
+        await self._execute(
+            f"UPDATE mailing_jobs SET {self._assignments(fields)} WHERE id = :job_id",
+            {**self._encode(fields), 'job_id': job_id}
+        )
+
+    async def claim_job(self, job_id: str, force: bool = False) -> bool:
+        updated = await self._execute(
+            "UPDATE mailing_jobs SET status = 'running', "
+            "started_at = COALESCE(started_at, CURRENT_TIMESTAMP), completed_at = NULL, "
+            "cancel_requested_at = NULL "
+            "WHERE id = :id AND (status <> 'running' OR :force)",
+            {'id': job_id, 'force': force}
+        )
+        return updated == 1
+
+    async def create_letters(self, letters: List[Dict]) -> List[Dict]:
+        rows = []
+        for letter in letters:
+            letter = {key: value for key, value in letter.items() if key != 'client_id'}
+            rows.append(self._encode({'id': str(uuid4()), **letter}))
+        if not rows:
+            return []
+
+        columns = list(rows[0])
+        values = ', '.join(
+            f"CAST(:{key} AS JSONB)" if key in self.JSON_FIELDS else f":{key}" for key in columns
+        )
+        await self._execute(f"INSERT INTO letters ({', '.join(columns)}) VALUES ({values})", rows)
+        return await self.get_letters(letters[0]['mailing_job_id']) if letters[0].get('mailing_job_id') else rows
+
+    # Letters with their client and latest tracking event
+    LETTER_SELECT = (
+        "SELECT l.*, d.client_id, last_event.status AS last_event "
+        "FROM letters l "
+        "JOIN disputes d ON d.id = l.dispute_id "
+        "LEFT JOIN LATERAL ("
+        "  SELECT t.status FROM letter_tracking t WHERE t.letter_id = l.id "
+        "  ORDER BY t.created_at DESC LIMIT 1"
+        ") last_event ON TRUE "
+    )
+
+    async def get_letters(self, job_id: str, status: Optional[str] = None) -> List[Dict]:
+        return await self._execute(
+            self.LETTER_SELECT
+            + "WHERE l.mailing_job_id = :job_id AND (CAST(:status AS VARCHAR) IS NULL OR l.status = :status) "
+            "ORDER BY l.mailing_job_position",
+            {'job_id': job_id, 'status': status},
+            fetch=True
+        )
+
+    async def get_unsent_letters(self, client_ids: List[str], since: datetime) -> List[Dict]:
+        return await self._execute(
+            self.LETTER_SELECT
+            + "WHERE d.client_id = ANY(CAST(:client_ids AS UUID[])) AND l.mailing_job_id IS NOT NULL "
+            "AND l.status <> 'sent' AND l.created_at >= :since "
+            "ORDER BY l.created_at, l.mailing_job_position",
+            {'client_ids': list(client_ids), 'since': since},
+            fetch=True
+        )
+
+    async def update_letter(self, letter_id: str, **fields) -> None:
+        await self._execute(
+            f"UPDATE letters SET {self._assignments(fields)} WHERE id = :letter_id",
+            {**self._encode(fields), 'letter_id': letter_id}
+        )
+
+    async def add_tracking_event(self, letter_id: str, status: str, description: Optional[str] = None,
+                                 metadata: Optional[Dict] = None) -> None:
+        await self._execute(
+            "INSERT INTO letter_tracking (letter_id, status, description, metadata) "
+            "VALUES (:letter_id, :status, :description, CAST(:metadata AS JSONB))",
+            {
+                'letter_id': letter_id,
+                'status': status,
+                'description': description,
+                'metadata': json.dumps(metadata) if metadata is not None else None
+            }
+        )
+
+    async def count_letters(self, job_id: str) -> Dict[str, int]:
+        rows = await self._execute(
+            "SELECT status, COUNT(*) AS count FROM letters WHERE mailing_job_id = :job_id GROUP BY status",
+            {'job_id': job_id},
+            fetch=True
+        )
+        return {row['status']: row['count'] for row in rows}
+
+    async def get_letters_in_transit(self) -> List[Dict]:
+        return await self._execute(
+            "SELECT id, tracking_number, sent_at FROM letters "
+            "WHERE status = 'sent' AND tracking_number IS NOT NULL",
+            fetch=True
+        )
+
+    async def get_letters_by_tracking(self, tracking_number: str) -> List[Dict]:
+        return await self._execute(
+            "SELECT * FROM letters WHERE tracking_number = :tracking_number ORDER BY created_at",
+            {'tracking_number': tracking_number},
+            fetch=True
+        )
+
+    async def get_tracking_events(self, letter_id: str) -> List[Dict]:
+        return await self._execute(
+            "SELECT * FROM letter_tracking WHERE letter_id = :letter_id ORDER BY created_at",
+            {'letter_id': letter_id},
+            fetch=True
+        )
+
+
+def create_letter_store() -> LetterStore:
+    """
+    Letter store selected by MAILING_JOB_STORE (memory or database).
+
+    The memory store is per process, so it is refused when WEB_CONCURRENCY
+    starts several API workers: job lookups, resumes and cancels would only
+    work on the worker that created the job.
+    """
+    backend = os.getenv('MAILING_JOB_STORE', 'memory').lower()
+    if backend == 'database':
+        database_url = os.getenv('DATABASE_URL')
+        if not database_url:
+            raise ValueError("MAILING_JOB_STORE=database requires DATABASE_URL")
+        logger.info("Mailing jobs persisted to the database")
+        return SQLLetterStore(database_url)
+
+    workers = int(os.getenv('WEB_CONCURRENCY') or '1')
+    if workers > 1:
+        raise ValueError(
+            f"MAILING_JOB_STORE=memory cannot be shared by {workers} workers; set MAILING_JOB_STORE=database"
+        )
+    return InMemoryLetterStore()
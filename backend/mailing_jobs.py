@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Rick Jefferson Solutions - Bulk Dispute-Letter Mailing Jobs
+Mails large batches of dispute letters through USPSService in the background
+
+A job persists one letters row per item (status generated -> sent/failed)
+and records label_requested, label_created, label_failed and
+label_unconfirmed events in letter_tracking. Letters for the same client and recipient are consolidated
+into one envelope (see envelope_batching) unless the job opts out, and every
+letter in an envelope gets its tracking number. A consolidating job also
+takes unsent letters of earlier finished jobs for the same clients and
+recipients from within the envelope window, claiming those jobs while it
+mails them. Labels are created by a bounded pool of workers.
+
+Resuming a job only retries letters that were not sent. Letters whose label
+request was interrupted before USPS answered, or failed in a way that does
+not prove USPS never acted on it (5xx, timeout), are reported as unconfirmed
+and are only retried with force=True, so nothing is mailed twice by accident.
+
+Cancelling records the request on the job row, so the API worker running
+the job stops before its next envelope whichever worker was asked.
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from envelope_batching import (
+    DEFAULT_WINDOW_HOURS, envelope_key, envelope_letter_types, envelope_weight_oz, group_envelopes
+)
+from letter_store import LetterStore, create_letter_store
+from usps_quota import is_background
+from usps_service import USPSAddress, USPSDisputeMailRequest, USPSService
+
+logger = logging.getLogger(__name__)
+
+# Last events of letters whose label may exist at USPS
+UNCONFIRMED_EVENTS = ('label_requested', 'label_unconfirmed')
+
+# Jobs whose unsent letters a later job may mail in a shared envelope
+ADOPTABLE_JOB_STATUSES = ('completed_with_errors', 'failed')
+
+
+class MailingJobNotFoundError(Exception):
+    """Raised when a mailing job does not exist"""
+
+
+class MailingJobRunningError(Exception):
+    """Raised when a mailing job is already being processed"""
+
+
+def _iso(value) -> Optional[str]:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class MailingJobManager:
+    """Creates, runs, reports on and resumes bulk mailing jobs"""
+
+    def __init__(self, service: USPSService, store: Optional[LetterStore] = None,
+                 concurrency: Optional[int] = None):
+        self.service = service
+        self.store = store or create_letter_store()
+        self.default_concurrency = concurrency or int(os.getenv('USPS_MAILING_JOB_CONCURRENCY', '10'))
+        self.consolidate_by_default = os.getenv('USPS_ENVELOPE_BATCHING', 'true').lower() == 'true'
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def _letter_row(self, job_id: str, position: int, item: Dict) -> Dict:
+        letter_type = item['letterType']
+        recipient = self.service.recipients.get(item['recipientId']) if item.get('recipientId') else None
+        return {
+            'dispute_id': item['disputeId'],
+            'client_id': item['clientId'],
+            'mailing_job_id': job_id,
+            'mailing_job_position': position,
+            'letter_type': letter_type,
+            'status': 'generated',
+            'subject': item.get('subject') or f"{letter_type.replace('_', ' ').title()} dispute letter",
+            'content': item.get('content') or '',
+            'recipient_name': item.get('recipientName') or (recipient and recipient['name']),
+            'recipient_address': recipient['address'] if recipient else item['recipientAddress'],
+            'recipient_id': recipient and recipient['id'],
+            'send_method': 'mail',
+            'special_services': item.get('specialServices'),
+            'page_count': item.get('pageCount') or 1
+        }
+
+    async def create_job(self, items: List[Dict], concurrency: Optional[int] = None,
+                         verify_addresses: bool = True, consolidate: Optional[bool] = None,
+                         created_by: Optional[str] = None) -> Dict:
+        """Persist a job and its letters, then start mailing in the background"""
+        job = await self.store.create_job({
+            'status': 'queued',
+            'total_items': len(items),
+            'concurrency': concurrency or self.default_concurrency,
+            'verify_addresses': verify_addresses,
+            'options': {'consolidate': self.consolidate_by_default if consolidate is None else consolidate},
+            'created_by': created_by
+        })
+        await self.store.create_letters([
+            self._letter_row(job['id'], position, item) for position, item in enumerate(items)
+        ])
+
+        await self.store.claim_job(job['id'])
+        self._start(job['id'], retry_unconfirmed=False)
+        logger.info(f"Mailing job {job['id']} created with {len(items)} letters")
+
+        return await self.get_progress(job['id'])
+
+    async def resume_job(self, job_id: str, force: bool = False) -> Dict:
+        """
+        Retry the letters of a job that were not sent.
+
+        force also retries unconfirmed letters (label requested, outcome
+        unknown) and takes over a job left 'running' by a dead worker.
+        """
+        job = await self.store.get_job(job_id)
+        if job is None:
+            raise MailingJobNotFoundError(f"Mailing job {job_id} not found")
+
+        if job_id in self._tasks or not await self.store.claim_job(job_id, force=force):
+            raise MailingJobRunningError(f"Mailing job {job_id} is already running")
+
+        self._start(job_id, retry_unconfirmed=force)
+        logger.info(f"Mailing job {job_id} resumed (force={force})")
+
+        return await self.get_progress(job_id)
+
+    async def cancel_job(self, job_id: str) -> Dict:
+        """
+        Stop a running job; letters already sent stay sent.
+
+        A job running in this process is stopped before returning. One
+        running elsewhere stops before its next envelope: the progress then
+        still says 'running', with cancelRequested set.
+        """
+        job = await self.store.get_job(job_id)
+        if job is None:
+            raise MailingJobNotFoundError(f"Mailing job {job_id} not found")
+
+        if job['status'] != 'running':
+            return await self.get_progress(job_id)
+
+        # The job may be running in another API worker: it checks this
+        # request between envelopes and stops there
+        await self.store.update_job(job_id, cancel_requested_at=datetime.now())
+
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        return await self.get_progress(job_id)
+
+    async def get_progress(self, job_id: str) -> Optional[Dict]:
+        """Job status and per-status letter counts"""
+        job = await self.store.get_job(job_id)
+        if job is None:
+            return None
+
+        counts = await self.store.count_letters(job_id)
+        total = job['total_items']
+        sent = counts.get('sent', 0)
+        failed = counts.get('failed', 0)
+
+        return {
+            'jobId': str(job['id']),
+            'status': job['status'],
+            'total': total,
+            'sent': sent,
+            'failed': failed,
+            'pending': counts.get('generated', 0),
+            'unconfirmed': job.get('unconfirmed_items') or 0,
+            'percentComplete': round((sent + failed) / total * 100, 1) if total else 100.0,
+            'concurrency': job['concurrency'],
+            'envelopes': job.get('envelopes'),
+            'createdAt': _iso(job.get('created_at')),
+            'startedAt': _iso(job.get('started_at')),
+            'completedAt': _iso(job.get('completed_at')),
+            'lastError': job.get('last_error'),
+            'cancelRequested': job['status'] == 'running' and bool(job.get('cancel_requested_at'))
+        }
+
+    async def get_items(self, job_id: str, status: Optional[str] = None) -> List[Dict]:
+        """Per-letter status of a job, optionally filtered by letter status"""
+        if await self.store.get_job(job_id) is None:
+            raise MailingJobNotFoundError(f"Mailing job {job_id} not found")
+
+        return [
+            {
+                'letterId': str(letter['id']),
+                'position': letter['mailing_job_position'],
+                'clientId': str(letter['client_id']),
+                'disputeId': str(letter['dispute_id']),
+                'letterType': letter['letter_type'],
+                'recipientId': letter.get('recipient_id'),
+                'status': letter['status'],
+                'lastEvent': letter['last_event'],
+                'trackingNumber': letter['tracking_number'],
+                'sentAt': _iso(letter['sent_at'])
+            }
+            for letter in await self.store.get_letters(job_id, status)
+        ]
+
+    async def close(self) -> None:
+        """Cancel running jobs (they can be resumed later)"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _start(self, job_id: str, retry_unconfirmed: bool) -> None:
+        task = asyncio.create_task(self._run(job_id, retry_unconfirmed))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _run(self, job_id: str, retry_unconfirmed: bool) -> None:
+        """Mail every letter of the job that still needs it"""
+        # Bulk mailing yields USPS quota to interactive requests
+        is_background.set(True)
+        job = await self.store.get_job(job_id)
+        pending = self._unsent(await self.store.get_letters(job_id), retry_unconfirmed)
+        adopted_jobs: List[str] = []
+
+        if (job.get('options') or {}).get('consolidate'):
+            adopted, adopted_jobs = await self._adopt_letters(job_id, pending)
+            envelopes = group_envelopes(adopted + pending)
+        else:
+            envelopes = [[letter] for letter in pending]
+        await self.store.update_job(job_id, envelopes=len(envelopes))
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for envelope in envelopes:
+            queue.put_nowait(envelope)
+
+        cancel_requested = asyncio.Event()
+
+        async def worker():
+            while not queue.empty() and not cancel_requested.is_set():
+                if (await self.store.get_job(job_id)).get('cancel_requested_at'):
+                    cancel_requested.set()
+                    break
+                await self._mail_envelope(job_id, queue.get_nowait(), job['verify_addresses'])
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(job['concurrency'], len(envelopes)))]
+        try:
+            await asyncio.gather(*workers)
+
+        except asyncio.CancelledError:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await self._cancelled(job_id)
+            raise
+
+        except Exception as error:
+            for task in workers:
+                task.cancel()
+            logger.error(f"Mailing job {job_id} stopped: {str(error)}")
+            await self.store.update_job(job_id, status='failed', completed_at=datetime.now(),
+                                        last_error=str(error),
+                                        unconfirmed_items=await self._count_unconfirmed(job_id))
+            return
+
+        finally:
+            for other_id in adopted_jobs:
+                await self._finish(other_id)
+
+        if cancel_requested.is_set():
+            await self._cancelled(job_id)
+            return
+
+        status, counts = await self._finish(job_id)
+        logger.info(f"Mailing job {job_id} {status}: {counts}")
+
+    async def _cancelled(self, job_id: str) -> None:
+        """Mark a job cancelled, counting the letters left unconfirmed"""
+        await self.store.update_job(job_id, status='cancelled', completed_at=datetime.now(),
+                                    unconfirmed_items=await self._count_unconfirmed(job_id))
+        logger.info(f"Mailing job {job_id} cancelled")
+
+    async def _finish(self, job_id: str) -> Tuple[str, Dict[str, int]]:
+        """Mark a job completed, or completed_with_errors unless every letter was sent"""
+        job = await self.store.get_job(job_id)
+        counts = await self.store.count_letters(job_id)
+        status = 'completed' if counts.get('sent', 0) == job['total_items'] else 'completed_with_errors'
+        await self.store.update_job(job_id, status=status, completed_at=datetime.now(),
+                                    unconfirmed_items=await self._count_unconfirmed(job_id))
+        return status, counts
+
+    async def _adopt_letters(self, job_id: str, pending: List[Dict]) -> Tuple[List[Dict], List[str]]:
+        """
+        Unsent letters of earlier finished jobs that can share an envelope with pending.
+
+        Each of those jobs is claimed so that a resume cannot mail the same
+        letters meanwhile. Returns the letters, oldest first, and the
+        claimed job ids; the caller finishes those jobs when done.
+        """
+        if not pending:
+            return [], []
+
+        keys = {envelope_key(letter) for letter in pending}
+        since = datetime.now() - timedelta(hours=DEFAULT_WINDOW_HOURS)
+        candidates: Dict[str, set] = {}
+        client_ids = list({str(letter['client_id']) for letter in pending})
+        for letter in await self.store.get_unsent_letters(client_ids, since):
+            other_id = str(letter['mailing_job_id'])
+            if other_id != job_id and envelope_key(letter) in keys:
+                candidates.setdefault(other_id, set()).add(str(letter['id']))
+
+        adopted: List[Dict] = []
+        claimed: List[str] = []
+        for other_id, letter_ids in candidates.items():
+            other = await self.store.get_job(other_id)
+            if other['status'] not in ADOPTABLE_JOB_STATUSES or not await self.store.claim_job(other_id):
+                continue
+            claimed.append(other_id)
+            # Re-read after the claim: the job may have been resumed in between
+            adopted.extend(
+                letter for letter in self._unsent(await self.store.get_letters(other_id), False)
+                if str(letter['id']) in letter_ids
+            )
+
+        if claimed:
+            logger.info(f"Mailing job {job_id} takes {len(adopted)} unsent letters from jobs {', '.join(claimed)}")
+        return sorted(adopted, key=lambda letter: letter['created_at']), claimed
+
+    def _unsent(self, letters: List[Dict], retry_unconfirmed: bool) -> List[Dict]:
+        """Letters still to mail: not sent, and unconfirmed ones only when retrying those"""
+        return [
+            letter for letter in letters
+            if letter['status'] != 'sent' and (retry_unconfirmed or not self._is_unconfirmed(letter))
+        ]
+
+    @staticmethod
+    def _is_unconfirmed(letter: Dict) -> bool:
+        return letter['status'] == 'generated' and letter['last_event'] in UNCONFIRMED_EVENTS
+
+    async def _count_unconfirmed(self, job_id: str) -> int:
+        letters = await self.store.get_letters(job_id, 'generated')
+        return sum(1 for letter in letters if self._is_unconfirmed(letter))
+
+    async def _mail_envelope(self, job_id: str, letters: List[Dict], verify_address: bool) -> None:
+        """Verify the recipient, create one label for the envelope and record the outcome on every letter"""
+        first = letters[0]
+        letter_ids = [letter['id'] for letter in letters]
+        address = USPSAddress(**first['recipient_address'])
+        letter_types = envelope_letter_types(letters)
+        metadata = {'jobId': job_id, 'envelopeLetters': len(letters), 'letterTypes': letter_types}
+
+        # Registry recipients are pre-verified
+        if verify_address and not first.get('recipient_id'):
+            verification = await self.service.verify_address(address)
+            if not verification.get('success') or not verification.get('deliverable', True):
+                error = verification.get('error') or 'Recipient address is not deliverable'
+                await self._record(letter_ids, 'address_invalid', error, metadata, status='failed')
+                return
+
+        await self._record(letter_ids, 'label_requested', 'USPS label requested', metadata)
+
+        result = await self.service.send_dispute_letter(USPSDisputeMailRequest(
+            clientId=str(first['client_id']),
+            disputeId=str(first['dispute_id']),
+            disputeIds=[str(letter['dispute_id']) for letter in letters],
+            recipientAddress=address,
+            recipientId=first.get('recipient_id'),
+            letterType=first['letter_type'],
+            letterTypes=letter_types,
+            specialServices=first['special_services'],
+            pageCount=sum(letter.get('page_count') or 1 for letter in letters)
+        ))
+
+        if result.get('success'):
+            await self._record(
+                letter_ids,
+                'label_created',
+                f"USPS label created, tracking {result['trackingNumber']}",
+                {
+                    **metadata,
+                    'trackingNumber': result['trackingNumber'],
+                    'labelUrl': result.get('labelUrl'),
+                    'labelSha256': result.get('labelSha256'),
+                    'postage': result.get('postage'),
+                    'weight': envelope_weight_oz(letters)
+                },
+                status='sent',
+                sent_at=datetime.now(),
+                tracking_number=result['trackingNumber']
+            )
+        elif result.get('outcomeUnknown'):
+            # USPS may have created the label: keep the letters out of plain resumes
+            await self._record(letter_ids, 'label_unconfirmed', result.get('error'), metadata)
+        else:
+            await self._record(letter_ids, 'label_failed', result.get('error'), metadata, status='failed')
+
+    async def _record(self, letter_ids: List[str], event: str, description: Optional[str],
+                      metadata: Dict, **fields) -> None:
+        """Update every letter of an envelope and add the tracking event"""
+        for letter_id in letter_ids:
+            if fields:
+                await self.store.update_letter(letter_id, **fields)
+            await self.store.add_tracking_event(letter_id, event, description, metadata)
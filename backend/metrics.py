@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Rick Jefferson Solutions - API Metrics
+Prometheus metrics for the API, exposed at /metrics
+
+Request counts, latency histograms per route and status, in-flight
+requests, bcrypt executor queue depth, USPS/Stripe call latencies and
+errors, and cache lookups.
+
+The API runs as several uvicorn worker processes. With
+PROMETHEUS_MULTIPROC_DIR set (before this module is imported), every
+worker writes its metrics to files in that directory and /metrics merges
+them, so whichever worker answers the scrape reports totals for all of
+them. The directory must be emptied before the workers start; the
+Dockerfile does this. Without it, metrics cover the current process only.
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+from prometheus_client import multiprocess
+
+from latency_histogram import route_latency
+
+MULTIPROCESS = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+
+HTTP_REQUESTS = Counter(
+    'rjs_http_requests_total', 'HTTP requests handled',
+    ['method', 'route', 'status']
+)
+HTTP_REQUEST_DURATION = Histogram(
+    'rjs_http_request_duration_seconds', 'HTTP request latency',
+    ['method', 'route', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+HTTP_IN_FLIGHT = Gauge(
+    'rjs_http_requests_in_flight', 'HTTP requests being handled',
+    multiprocess_mode='livesum'
+)
+
+BCRYPT_QUEUE_DEPTH = Gauge(
+    'rjs_bcrypt_queue_depth', 'Password hashing jobs waiting for an executor thread',
+    multiprocess_mode='livesum'
+)
+BCRYPT_DURATION = Histogram(
+    'rjs_bcrypt_duration_seconds', 'Password hashing time on the executor',
+    ['operation'],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0)
+)
+
+EXTERNAL_REQUEST_DURATION = Histogram(
+    'rjs_external_request_duration_seconds', 'Latency of calls to external services',
+    ['service', 'operation', 'outcome'],
+    buckets=(0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+EXTERNAL_REQUEST_ERRORS = Counter(
+    'rjs_external_request_errors_total', 'Failed calls to external services',
+    ['service', 'operation']
+)
+
+CACHE_LOOKUPS = Counter(
+    'rjs_cache_lookups_total', 'Cache lookups by result (hit rate = hit / all)',
+    ['cache', 'result']
+)
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def record_external_call(service: str, operation: str, outcome: str, seconds: float, failed: bool) -> None:
+    EXTERNAL_REQUEST_DURATION.labels(service, operation, outcome).observe(seconds)
+    if failed:
+        EXTERNAL_REQUEST_ERRORS.labels(service, operation).inc()
+
+
+@contextmanager
+def external_call(service: str, operation: str):
+    """Time a blocking call to an external service; exceptions count as errors"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as error:
+        record_external_call(service, operation, type(error).__name__, time.perf_counter() - started, True)
+        raise
+    record_external_call(service, operation, 'ok', time.perf_counter() - started, False)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Metrics in the Prometheus text format, merged across workers when multiprocess"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead(pid: int) -> None:
+    """Drop a stopped worker's live gauges (in-flight, queue depth)"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request count, latency and in-flight requests per route.
+
+    Latencies also go to the route latency histograms behind
+    /api/v1/admin/latency (p50/p95/p99 over a sliding window).
+    """
+
+    def __init__(self, app, exclude_paths: Tuple[str, ...] = ('/metrics',)):
+        self.app = app
+        self.exclude_paths = exclude_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finished = time.perf_counter()
+            HTTP_IN_FLIGHT.dec()
+            # Route template, not the raw path, so ids do not explode the label set
+            route = scope.get('route')
+            route_path = getattr(route, 'path', None) or 'unmatched'
+            labels = (scope['method'], route_path, str(status_code))
+            HTTP_REQUESTS.labels(*labels).inc()
+            HTTP_REQUEST_DURATION.labels(*labels).observe(finished - started)
+            route_latency.record(f"{scope['method']} {route_path}", finished - started, finished)
@@ -3,6 +3,10 @@
 Rick Jefferson Solutions - Production Monitoring Dashboard
 Real-time monitoring dashboard with alerting for credit repair platform
 
+With --continuous the dashboard is served live (live_dashboard.py): viewers
+load a static page once and receive each cycle's results as server-sent
+events. A single run writes a static snapshot to monitoring_dashboard.html.
+
 Author: Rick Jefferson Architect
 Company: Rick Jefferson Solutions
 Contact: info@rickjeffersonsolutions.com
@@ -18,11 +22,13 @@ from datetime import datetime, timezone, timedelta
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import Dict, List, Any, Optional
-import schedule
 from pathlib import Path
 
 # Import our health monitor
 from health_checks import HealthMonitor
+from history_store import history_store
+from live_dashboard import LiveDashboard
+from timeseries import RAW_CAPACITY, TimeSeriesStore
 
 # Configure logging
 logging.basicConfig(
@@ -50,8 +56,20 @@ class MonitoringDashboard:
             'alert_cooldown_minutes': int(os.getenv('ALERT_COOLDOWN_MINUTES', '30'))
         }
         self.last_alerts = {}
-        self.monitoring_data = []
+        self.history = TimeSeriesStore()
+        self._load_history()
+        self.live = LiveDashboard(self.history)
         
+    def _load_history(self) -> None:
+        """Warm the in-memory history from the persistent store"""
+        interval = int(os.getenv('HEALTH_CHECK_INTERVAL', '5')) * 60
+        try:
+            loaded = history_store.load_into(self.history, time.time() - RAW_CAPACITY * interval)
+            if loaded:
+                logger.info(f"Loaded {loaded} history samples from {history_store.url}")
+        except Exception as e:
+            logger.error(f"Failed to load monitoring history: {e}")
+    
     def should_send_alert(self, service: str, status: str) -> bool:
         """Check if alert should be sent based on cooldown period"""
         if status == 'healthy':
@@ -173,7 +191,7 @@ Service Status Summary:
                 service = check.get('service', 'Unknown')
                 status = check.get('status', 'unknown')
                 
-                if status in ['unhealthy', 'error', 'warning'] and self.should_send_alert(service, status):
+                if status in ['unhealthy', 'error', 'warning', 'timeout'] and self.should_send_alert(service, status):
                     subject = f"{service} Status: {status.upper()}"
                     body = f"""
 Rick Jefferson Solutions Service Alert
@@ -193,6 +211,19 @@ Please investigate this service immediately.
                     if self.send_email_alert(subject, body):
                         alerts_sent.append(f"{service} {status}")
         
+        # Check route latency (p95 over the API's recent window)
+        slow_routes = health_report.get('summary', {}).get('slow_routes', [])
+        if slow_routes and self.should_send_alert('Route Latency', 'slow'):
+            routes = {route['route']: route for route in (health_report.get('route_latency') or {}).get('routes', [])}
+            subject = f"Slow API Routes: {len(slow_routes)}"
+            body = "Rick Jefferson Solutions Latency Alert\n\nRoutes over the p95 threshold:\n"
+            for name in slow_routes:
+                route = routes.get(name, {})
+                body += f"- {name}: p50 {route.get('p50Ms')}ms, p95 {route.get('p95Ms')}ms, p99 {route.get('p99Ms')}ms\n"
+            
+            if self.send_email_alert(subject, body):
+                alerts_sent.append("Route latency")
+        
         if alerts_sent:
             logger.warning(f"Alerts sent for: {', '.join(alerts_sent)}")
         else:
@@ -208,6 +239,7 @@ Please investigate this service immediately.
             'unhealthy': '#DC2626',
             'warning': '#D97706',
             'error': '#DC2626',
+            'timeout': '#D97706',
             'degraded': '#D97706'
         }
         
@@ -312,6 +344,10 @@ Please investigate this service immediately.
             border-left-color: #DC2626;
         }}
         
+        .service-card.timeout {{
+            border-left-color: #D97706;
+        }}
+        
         .service-header {{
             display: flex;
             justify-content: space-between;
@@ -353,6 +389,11 @@ Please investigate this service immediately.
             color: white;
         }}
         
+        .service-status.timeout {{
+            background-color: #D97706;
+            color: white;
+        }}
+        
         .service-details {{
             font-size: 14px;
             color: #6B7280;
@@ -363,6 +404,43 @@ Please investigate this service immediately.
             color: #14B8A6;
         }}
         
+        .latency-table {{
+            background: white;
+            border-radius: 10px;
+            padding: 20px;
+            margin-bottom: 30px;
+            box-shadow: 0 4px 15px rgba(0,0,0,0.1);
+            overflow-x: auto;
+        }}
+        
+        .latency-table h2 {{
+            font-size: 18px;
+            color: #1E3A8A;
+            margin-bottom: 15px;
+        }}
+        
+        .latency-table table {{
+            width: 100%;
+            border-collapse: collapse;
+            font-size: 14px;
+        }}
+        
+        .latency-table th, .latency-table td {{
+            padding: 8px 12px;
+            text-align: right;
+            border-bottom: 1px solid #E5E7EB;
+        }}
+        
+        .latency-table th:first-child, .latency-table td:first-child {{
+            text-align: left;
+            font-family: monospace;
+        }}
+        
+        .latency-table tr.slow td {{
+            color: #DC2626;
+            font-weight: bold;
+        }}
+        
         .footer {{
             background-color: #1E3A8A;
             color: white;
@@ -467,8 +545,13 @@ Please investigate this service immediately.
             </div>
 """
         
-        html += f"""
+        html += """
         </div>
+"""
+        
+        html += self.generate_route_latency_html(health_report)
+        
+        html += f"""
     </div>
     
     <div class="footer">
@@ -483,8 +566,35 @@ Please investigate this service immediately.
         
         return html
     
+    def generate_route_latency_html(self, health_report: Dict[str, Any]) -> str:
+        """Table of per-route latency percentiles, slowest p95 first"""
+        route_latency = health_report.get('route_latency') or {}
+        routes = route_latency.get('routes', [])
+        if not routes:
+            return ''
+        
+        slow_routes = set(health_report.get('summary', {}).get('slow_routes', []))
+        window_minutes = round(route_latency.get('windowSeconds', 0) / 60)
+        html = f"""
+        <div class="latency-table">
+            <h2>Route Latency (last {window_minutes} min, {len(route_latency.get('workers', []))} workers)</h2>
+            <table>
+                <tr><th>Route</th><th>Requests</th><th>p50 ms</th><th>p95 ms</th><th>p99 ms</th><th>Max ms</th></tr>
+"""
+        for route in routes:
+            row_class = ' class="slow"' if route['route'] in slow_routes else ''
+            html += (
+                f"<tr{row_class}><td>{route['route']}</td><td>{route['count']}</td>"
+                f"<td>{route['p50Ms']}</td><td>{route['p95Ms']}</td><td>{route['p99Ms']}</td><td>{route['maxMs']}</td></tr>\n"
+            )
+        html += """
+            </table>
+        </div>
+"""
+        return html
+    
     def save_dashboard(self, health_report: Dict[str, Any]) -> str:
-        """Save dashboard HTML to file"""
+        """Save a static dashboard snapshot to file (the live dashboard does not need it)"""
         html_content = self.generate_dashboard_html(health_report)
         dashboard_path = Path('monitoring_dashboard.html')
         
@@ -502,30 +612,20 @@ Please investigate this service immediately.
             # Run health checks
             health_report = await self.health_monitor.run_all_checks()
             
-            # Store monitoring data
-            self.monitoring_data.append({
-                'timestamp': datetime.now(timezone.utc).isoformat(),
-                'health_percentage': health_report.get('health_percentage', 0),
-                'overall_status': health_report.get('overall_status', 'unknown')
-            })
-            
-            # Keep only last 24 hours of data
-            cutoff_time = datetime.now(timezone.utc) - timedelta(hours=24)
-            self.monitoring_data = [
-                data for data in self.monitoring_data 
-                if datetime.fromisoformat(data['timestamp'].replace('Z', '+00:00')) > cutoff_time
-            ]
+            # Store monitoring history (fixed-size ring buffers, oldest evicted)
+            timestamp = time.time()
+            self.history.record_report(health_report, timestamp)
             
             # Process alerts
             self.process_alerts(health_report)
             
-            # Save dashboard
-            dashboard_file = self.save_dashboard(health_report)
+            # Push results to live dashboard viewers
+            viewers = self.live.publish(health_report, timestamp)
             
             # Save health report
-            report_file = self.health_monitor.save_report(health_report)
+            report_file = await self.health_monitor.save_report(health_report)
             
-            logger.info(f"Monitoring cycle completed - Dashboard: {dashboard_file}, Report: {report_file}")
+            logger.info(f"Monitoring cycle completed - Dashboard viewers: {viewers}, Report: {report_file}")
             
             return health_report
             
@@ -533,22 +633,36 @@ Please investigate this service immediately.
             logger.error(f"Monitoring cycle failed: {e}")
             return None
     
-    def start_continuous_monitoring(self, interval_minutes: int = 5) -> None:
-        """Start continuous monitoring with specified interval"""
-        logger.info(f"Starting continuous monitoring (every {interval_minutes} minutes)")
-        
-        # Schedule monitoring
-        schedule.every(interval_minutes).minutes.do(
-            lambda: asyncio.run(self.run_monitoring_cycle())
-        )
+    async def run_continuous_monitoring(self, interval_minutes: int = 5) -> None:
+        """Run monitoring cycles every interval_minutes on one event loop
         
-        # Run initial check
-        asyncio.run(self.run_monitoring_cycle())
+        Cycles start on a fixed cadence; a cycle that overruns the interval
+        delays the next one instead of overlapping it.
+        """
+        logger.info(f"Starting continuous monitoring (every {interval_minutes} minutes)")
+        interval = interval_minutes * 60
         
-        # Keep running
-        while True:
-            schedule.run_pending()
-            time.sleep(30)  # Check every 30 seconds
+        try:
+            await self.live.start()
+            self.health_monitor.start()
+            next_cycle = time.monotonic()
+            while True:
+                await self.run_monitoring_cycle()
+                next_cycle = max(next_cycle + interval, time.monotonic())
+                await asyncio.sleep(next_cycle - time.monotonic())
+        finally:
+            await self.close()
+    
+    async def close(self) -> None:
+        """Stop the live dashboard and close the health monitor's HTTP session"""
+        try:
+            await self.live.stop()
+        finally:
+            await self.health_monitor.close()
+    
+    def start_continuous_monitoring(self, interval_minutes: int = 5) -> None:
+        """Start continuous monitoring with specified interval"""
+        asyncio.run(self.run_continuous_monitoring(interval_minutes))
 
 async def main():
     """Main execution function"""
@@ -561,14 +675,19 @@ async def main():
     dashboard = MonitoringDashboard()
     
     # Run single monitoring cycle
-    health_report = await dashboard.run_monitoring_cycle()
+    try:
+        dashboard.health_monitor.start()
+        health_report = await dashboard.run_monitoring_cycle()
+    finally:
+        await dashboard.close()
     
     if health_report:
+        dashboard_file = dashboard.save_dashboard(health_report)
         print(f"✅ Monitoring cycle completed successfully")
         print(f"📊 Platform Status: {health_report['overall_status'].upper()}")
         print(f"💚 Health Score: {health_report['health_percentage']}%")
-        print(f"📈 Dashboard saved to: monitoring_dashboard.html")
-        print("\n🔄 To start continuous monitoring, run with --continuous flag")
+        print(f"📈 Dashboard saved to: {dashboard_file}")
+        print("\n🔄 To start continuous monitoring with the live dashboard, run with --continuous flag")
     else:
         print("❌ Monitoring cycle failed")
     
@@ -582,6 +701,6 @@ if __name__ == "__main__":
     
     if '--continuous' in sys.argv:
         dashboard = MonitoringDashboard()
-        dashboard.start_continuous_monitoring()
+        dashboard.start_continuous_monitoring(int(os.getenv('HEALTH_CHECK_INTERVAL', '5')))
     else:
         asyncio.run(main())
\ No newline at end of file
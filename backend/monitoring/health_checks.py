@@ -16,9 +16,11 @@ import time
 from datetime import datetime, timezone
 from typing import Dict, List, Any, Optional
 import aiohttp
-import psutil
 from pathlib import Path
 
+from history_store import history_store
+from resource_sampler import resource_sampler
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -30,8 +32,25 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Per-check timeouts (seconds); HEALTH_CHECK_TIMEOUT_SECONDS overrides the default
+DEFAULT_CHECK_TIMEOUTS = {
+    'API Health': 10.0,
+    'Database': 15.0,
+    'Stripe Integration': 10.0,
+    'Authentication System': 10.0,
+    'Frontend (Angular)': 10.0
+}
+
 class HealthMonitor:
-    """Production health monitoring for Rick Jefferson Solutions platform"""
+    """Production health monitoring for Rick Jefferson Solutions platform
+    
+    Checks share one pooled aiohttp session for the monitor's lifetime. Call
+    start() before the first cycle and close() when done (or use
+    `async with HealthMonitor()`). Each check has its own timeout and every
+    cycle has an overall deadline, so a slow service is reported with status
+    'timeout' instead of stalling the report. System resources come from the
+    background resource sampler, which start() launches and close() stops.
+    """
     
     def __init__(self):
         self.base_url = os.getenv('API_BASE_URL', 'http://localhost:8000')
@@ -43,205 +62,173 @@ class HealthMonitor:
             'response_time_ms': 5000,
             'error_rate_percent': 5.0
         }
+        default_timeout = os.getenv('HEALTH_CHECK_TIMEOUT_SECONDS')
+        self.check_timeouts = {
+            service: float(default_timeout) if default_timeout else timeout
+            for service, timeout in DEFAULT_CHECK_TIMEOUTS.items()
+        }
+        self.cycle_deadline = float(os.getenv('HEALTH_CYCLE_DEADLINE_SECONDS', '20'))
+        self.monitoring_api_key = os.getenv('MONITORING_API_KEY')
         self.results = []
-        
-    async def check_api_health(self) -> Dict[str, Any]:
-        """Check main API health endpoint"""
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    async def __aenter__(self) -> 'HealthMonitor':
+        self.start()
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Pooled session shared by all checks, created on first use"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=20, keepalive_timeout=300),
+                headers={'User-Agent': 'RJS-HealthMonitor/1.0'}
+            )
+        return self._session
+    
+    def start(self) -> None:
+        """Start the background resource sampler"""
+        resource_sampler.start()
+    
+    async def close(self) -> None:
+        """Close the pooled HTTP session and stop the resource sampler"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if resource_sampler.running:
+            # Joins the sampler thread, which may be in the middle of a sample
+            await asyncio.to_thread(resource_sampler.stop)
+    
+    def _timeout_result(self, service: str, timeout: float) -> Dict[str, Any]:
+        return {
+            'service': service,
+            'status': 'timeout',
+            'response_time_ms': round(timeout * 1000, 2),
+            'error': f'No response within {timeout:g}s',
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }
+    
+    async def _check_endpoint(self, service: str, url: str, read_body: bool = True) -> Dict[str, Any]:
+        """GET url on the shared session; 200 is healthy"""
+        timeout = self.check_timeouts[service]
         start_time = time.time()
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.base_url}/api/v1/health", timeout=10) as response:
-                    response_time = (time.time() - start_time) * 1000
-                    
-                    if response.status == 200:
-                        data = await response.json()
-                        return {
-                            'service': 'API Health',
-                            'status': 'healthy',
-                            'response_time_ms': round(response_time, 2),
-                            'details': data,
-                            'timestamp': datetime.now(timezone.utc).isoformat()
-                        }
-                    else:
-                        return {
-                            'service': 'API Health',
-                            'status': 'unhealthy',
-                            'response_time_ms': round(response_time, 2),
-                            'error': f'HTTP {response.status}',
-                            'timestamp': datetime.now(timezone.utc).isoformat()
-                        }
+            session = self._get_session()
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                response_time = (time.time() - start_time) * 1000
+                
+                if response.status == 200:
+                    details = await response.json() if read_body else {'url': url}
+                    return {
+                        'service': service,
+                        'status': 'healthy',
+                        'response_time_ms': round(response_time, 2),
+                        'details': details,
+                        'timestamp': datetime.now(timezone.utc).isoformat()
+                    }
+                else:
+                    return {
+                        'service': service,
+                        'status': 'unhealthy',
+                        'response_time_ms': round(response_time, 2),
+                        'error': f'HTTP {response.status}',
+                        'timestamp': datetime.now(timezone.utc).isoformat()
+                    }
+        except asyncio.TimeoutError:
+            return self._timeout_result(service, timeout)
         except Exception as e:
             return {
-                'service': 'API Health',
+                'service': service,
                 'status': 'error',
                 'error': str(e),
                 'timestamp': datetime.now(timezone.utc).isoformat()
             }
     
-    async def check_database_health(self) -> Dict[str, Any]:
-        """Check database connectivity and performance"""
-        start_time = time.time()
+    async def fetch_route_latency(self) -> Optional[Dict[str, Any]]:
+        """Per-route p50/p95/p99 from the API's latency histograms, or None if unavailable"""
+        headers = {'Authorization': f'Bearer {self.monitoring_api_key}'} if self.monitoring_api_key else {}
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.base_url}/api/v1/health/database", timeout=15) as response:
-                    response_time = (time.time() - start_time) * 1000
-                    
-                    if response.status == 200:
-                        data = await response.json()
-                        return {
-                            'service': 'Database',
-                            'status': 'healthy',
-                            'response_time_ms': round(response_time, 2),
-                            'details': data,
-                            'timestamp': datetime.now(timezone.utc).isoformat()
-                        }
-                    else:
-                        return {
-                            'service': 'Database',
-                            'status': 'unhealthy',
-                            'response_time_ms': round(response_time, 2),
-                            'error': f'HTTP {response.status}',
-                            'timestamp': datetime.now(timezone.utc).isoformat()
-                        }
+            async with self._get_session().get(
+                f"{self.base_url}/api/v1/admin/latency",
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=self.check_timeouts['API Health'])
+            ) as response:
+                if response.status != 200:
+                    logger.warning(f"Route latency unavailable: HTTP {response.status}")
+                    return None
+                return await response.json()
         except Exception as e:
-            return {
-                'service': 'Database',
-                'status': 'error',
-                'error': str(e),
-                'timestamp': datetime.now(timezone.utc).isoformat()
-            }
+            logger.warning(f"Route latency unavailable: {e}")
+            return None
+    
+    async def check_api_health(self) -> Dict[str, Any]:
+        """Check main API health endpoint"""
+        return await self._check_endpoint('API Health', f"{self.base_url}/api/v1/health")
+    
+    async def check_database_health(self) -> Dict[str, Any]:
+        """Check database connectivity and performance"""
+        return await self._check_endpoint('Database', f"{self.base_url}/api/v1/health/database")
     
     async def check_stripe_integration(self) -> Dict[str, Any]:
         """Check Stripe payment processing health"""
-        start_time = time.time()
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.base_url}/api/v1/stripe/health", timeout=10) as response:
-                    response_time = (time.time() - start_time) * 1000
-                    
-                    if response.status == 200:
-                        data = await response.json()
-                        return {
-                            'service': 'Stripe Integration',
-                            'status': 'healthy',
-                            'response_time_ms': round(response_time, 2),
-                            'details': data,
-                            'timestamp': datetime.now(timezone.utc).isoformat()
-                        }
-                    else:
-                        return {
-                            'service': 'Stripe Integration',
-                            'status': 'unhealthy',
-                            'response_time_ms': round(response_time, 2),
-                            'error': f'HTTP {response.status}',
-                            'timestamp': datetime.now(timezone.utc).isoformat()
-                        }
-        except Exception as e:
-            return {
-                'service': 'Stripe Integration',
-                'status': 'error',
-                'error': str(e),
-                'timestamp': datetime.now(timezone.utc).isoformat()
-            }
+        return await self._check_endpoint('Stripe Integration', f"{self.base_url}/api/v1/stripe/health")
     
     async def check_auth_system(self) -> Dict[str, Any]:
         """Check authentication system health"""
-        start_time = time.time()
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.base_url}/api/v1/auth/health", timeout=10) as response:
-                    response_time = (time.time() - start_time) * 1000
-                    
-                    if response.status == 200:
-                        data = await response.json()
-                        return {
-                            'service': 'Authentication System',
-                            'status': 'healthy',
-                            'response_time_ms': round(response_time, 2),
-                            'details': data,
-                            'timestamp': datetime.now(timezone.utc).isoformat()
-                        }
-                    else:
-                        return {
-                            'service': 'Authentication System',
-                            'status': 'unhealthy',
-                            'response_time_ms': round(response_time, 2),
-                            'error': f'HTTP {response.status}',
-                            'timestamp': datetime.now(timezone.utc).isoformat()
-                        }
-        except Exception as e:
-            return {
-                'service': 'Authentication System',
-                'status': 'error',
-                'error': str(e),
-                'timestamp': datetime.now(timezone.utc).isoformat()
-            }
+        return await self._check_endpoint('Authentication System', f"{self.base_url}/api/v1/auth/health")
     
     async def check_frontend_health(self) -> Dict[str, Any]:
         """Check Angular frontend availability"""
-        start_time = time.time()
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.frontend_url, timeout=10) as response:
-                    response_time = (time.time() - start_time) * 1000
-                    
-                    if response.status == 200:
-                        return {
-                            'service': 'Frontend (Angular)',
-                            'status': 'healthy',
-                            'response_time_ms': round(response_time, 2),
-                            'details': {'url': self.frontend_url},
-                            'timestamp': datetime.now(timezone.utc).isoformat()
-                        }
-                    else:
-                        return {
-                            'service': 'Frontend (Angular)',
-                            'status': 'unhealthy',
-                            'response_time_ms': round(response_time, 2),
-                            'error': f'HTTP {response.status}',
-                            'timestamp': datetime.now(timezone.utc).isoformat()
-                        }
-        except Exception as e:
-            return {
-                'service': 'Frontend (Angular)',
-                'status': 'error',
-                'error': str(e),
-                'timestamp': datetime.now(timezone.utc).isoformat()
-            }
+        return await self._check_endpoint('Frontend (Angular)', self.frontend_url, read_body=False)
     
-    def check_system_resources(self) -> Dict[str, Any]:
-        """Check system resource utilization"""
+    async def check_system_resources(self) -> Dict[str, Any]:
+        """Check system resource utilization from the latest background sample"""
         try:
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
+            # Before the sampler's first sample, take one off the event loop
+            snapshot = resource_sampler.snapshot() or await asyncio.to_thread(resource_sampler.sample)
+            latest = snapshot['latest']
+            window = snapshot['window']
+            cpu_percent = latest['cpu_percent']
+            memory_percent = latest['memory_percent']
+            disk_percent = latest['disk_percent']
             
             # Determine overall status
             status = 'healthy'
             alerts = []
             
-            if cpu_percent > self.alert_thresholds['cpu_percent']:
+            # Sustained CPU load, not a single spike, raises a warning
+            if window['cpu_percent']['p50'] > self.alert_thresholds['cpu_percent']:
                 status = 'warning'
-                alerts.append(f'High CPU usage: {cpu_percent}%')
+                alerts.append(f"High CPU usage: {window['cpu_percent']['p50']}% median over {snapshot['window_seconds']}s")
             
-            if memory.percent > self.alert_thresholds['memory_percent']:
+            if memory_percent > self.alert_thresholds['memory_percent']:
                 status = 'warning'
-                alerts.append(f'High memory usage: {memory.percent}%')
+                alerts.append(f'High memory usage: {memory_percent}%')
             
-            if disk.percent > self.alert_thresholds['disk_percent']:
+            if disk_percent > self.alert_thresholds['disk_percent']:
                 status = 'critical'
-                alerts.append(f'High disk usage: {disk.percent}%')
+                alerts.append(f'High disk usage: {disk_percent}%')
             
             return {
                 'service': 'System Resources',
                 'status': status,
                 'details': {
                     'cpu_percent': round(cpu_percent, 2),
-                    'memory_percent': round(memory.percent, 2),
-                    'memory_available_gb': round(memory.available / (1024**3), 2),
-                    'disk_percent': round(disk.percent, 2),
-                    'disk_free_gb': round(disk.free / (1024**3), 2)
+                    'cpu_p95_percent': window['cpu_percent']['p95'],
+                    'memory_percent': round(memory_percent, 2),
+                    'memory_p95_percent': window['memory_percent']['p95'],
+                    'memory_available_gb': latest['memory_available_gb'],
+                    'disk_percent': round(disk_percent, 2),
+                    'disk_free_gb': latest['disk_free_gb'],
+                    'net_sent_kbps': latest['net_sent_kbps'],
+                    'net_recv_kbps': latest['net_recv_kbps'],
+                    'sampled_at': latest['timestamp']
                 },
+                'window': window,
+                'window_seconds': snapshot['window_seconds'],
+                'processes': latest['processes'],
                 'alerts': alerts,
                 'timestamp': datetime.now(timezone.utc).isoformat()
             }
@@ -257,21 +244,52 @@ class HealthMonitor:
         """Run all health checks and compile results"""
         logger.info("Starting comprehensive health check for Rick Jefferson Solutions platform")
         
-        # Run async checks concurrently
-        async_checks = await asyncio.gather(
-            self.check_api_health(),
-            self.check_database_health(),
-            self.check_stripe_integration(),
-            self.check_auth_system(),
-            self.check_frontend_health(),
-            return_exceptions=True
-        )
+        cycle_start = time.time()
         
-        # Run sync checks
-        system_check = self.check_system_resources()
+        # Run endpoint checks concurrently
+        checks = {
+            'API Health': self.check_api_health(),
+            'Database': self.check_database_health(),
+            'Stripe Integration': self.check_stripe_integration(),
+            'Authentication System': self.check_auth_system(),
+            'Frontend (Angular)': self.check_frontend_health()
+        }
+        tasks = {asyncio.ensure_future(check): service for service, check in checks.items()}
+        latency_task = asyncio.ensure_future(self.fetch_route_latency())
+        
+        # Checks still running at the cycle deadline are reported as timed out
+        done, pending = await asyncio.wait([*tasks, latency_task], timeout=self.cycle_deadline)
+        for task in pending:
+            task.cancel()
+        route_latency = latency_task.result() if latency_task in done else None
+        pending.discard(latency_task)
+        if pending:
+            logger.warning(f"Health cycle deadline of {self.cycle_deadline:g}s reached; "
+                           f"timed out: {', '.join(tasks[task] for task in pending)}")
+        
+        all_checks = []
+        for task, service in tasks.items():
+            if task in pending:
+                all_checks.append(self._timeout_result(service, self.cycle_deadline))
+            elif task.exception() is not None:
+                all_checks.append({
+                    'service': service,
+                    'status': 'error',
+                    'error': str(task.exception()),
+                    'timestamp': datetime.now(timezone.utc).isoformat()
+                })
+            else:
+                all_checks.append(task.result())
+        
+        # Reads the background sampler's latest snapshot, no waiting once it is warm
+        system_check = await self.check_system_resources()
+        all_checks.append(system_check)
         
-        # Compile all results
-        all_checks = list(async_checks) + [system_check]
+        # Routes slower than the response time threshold at p95
+        slow_routes = [
+            route['route'] for route in (route_latency or {}).get('routes', [])
+            if route['p95Ms'] > self.alert_thresholds['response_time_ms']
+        ]
         
         # Calculate overall health
         healthy_count = sum(1 for check in all_checks if isinstance(check, dict) and check.get('status') == 'healthy')
@@ -294,12 +312,15 @@ class HealthMonitor:
             'checks_passed': healthy_count,
             'total_checks': total_checks,
             'timestamp': datetime.now(timezone.utc).isoformat(),
+            'cycle_duration_ms': round((time.time() - cycle_start) * 1000, 2),
             'checks': all_checks,
+            'route_latency': route_latency,
             'summary': {
                 'api_status': next((c.get('status') for c in all_checks if isinstance(c, dict) and c.get('service') == 'API Health'), 'unknown'),
                 'database_status': next((c.get('status') for c in all_checks if isinstance(c, dict) and c.get('service') == 'Database'), 'unknown'),
                 'frontend_status': next((c.get('status') for c in all_checks if isinstance(c, dict) and c.get('service') == 'Frontend (Angular)'), 'unknown'),
-                'system_status': system_check.get('status', 'unknown')
+                'system_status': system_check.get('status', 'unknown'),
+                'slow_routes': slow_routes
             }
         }
         
@@ -308,15 +329,19 @@ class HealthMonitor:
         
         return report
     
-    def save_report(self, report: Dict[str, Any], filename: Optional[str] = None) -> str:
-        """Save health check report to file"""
+    async def save_report(self, report: Dict[str, Any], filename: Optional[str] = None) -> str:
+        """Append report to the monitoring history store, or save it as JSON to filename
+        
+        The SQLite (or file) write runs in a worker thread, off the event loop.
+        """
         if not filename:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"health_report_{timestamp}.json"
+            ts = await asyncio.to_thread(history_store.append_report, report)
+            location = f"{history_store.url} (report {ts})"
+            logger.info(f"Health report stored in {location}")
+            return location
         
         filepath = Path(filename)
-        with open(filepath, 'w') as f:
-            json.dump(report, f, indent=2)
+        await asyncio.to_thread(filepath.write_text, json.dumps(report, indent=2))
         
         logger.info(f"Health report saved to {filepath}")
         return str(filepath)
@@ -332,11 +357,13 @@ async def main():
     monitor = HealthMonitor()
     
     try:
+        monitor.start()
+        
         # Run comprehensive health check
         report = await monitor.run_all_checks()
         
         # Save report
-        report_file = monitor.save_report(report)
+        report_file = await monitor.save_report(report)
         
         # Display summary
         print(f"Overall Platform Status: {report['overall_status'].upper()}")
@@ -358,6 +385,7 @@ async def main():
                     'UNHEALTHY': '❌',
                     'WARNING': '⚠️',
                     'ERROR': '🔥',
+                    'TIMEOUT': '⏱️',
                     'DEGRADED': '⚠️'
                 }.get(status, '❓')
                 
@@ -377,6 +405,9 @@ async def main():
         logger.error(f"Health check failed: {e}")
         print(f"❌ Health check failed: {e}")
         return None
+    
+    finally:
+        await monitor.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Rick Jefferson Solutions - Monitoring History Store
+Persistent, compact health check history in SQLite
+
+Replaces one indented JSON file per cycle with a single database
+(MONITORING_DB_URL, default sqlite:///monitoring.db):
+
+    reports   full reports, zlib-compressed JSON   kept MONITORING_REPORT_RETENTION_DAYS (7)
+    samples   numeric metrics per cycle            kept MONITORING_RAW_RETENTION_DAYS (14)
+    rollups   hourly count/sum/min/max per metric  kept MONITORING_ROLLUP_RETENTION_DAYS (365)
+
+Metrics are the ones the in-memory time series records (timeseries.py).
+Hourly rollups are updated as samples arrive, and expired rows are pruned
+at most once an hour. Range queries read a clustered (metric, time) index,
+so a month of history loads in milliseconds.
+
+Usage:
+    python history_store.py query "API Health.response_time_ms" --days 30
+    python history_store.py stats
+
+Author: Rick Jefferson Architect
+Company: Rick Jefferson Solutions
+Contact: info@rickjeffersonsolutions.com
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from timeseries import TimeSeriesStore, report_metrics
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_SECONDS = 3600
+PRUNE_EVERY_SECONDS = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metrics (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS reports (
+    ts INTEGER PRIMARY KEY,
+    overall_status TEXT,
+    health_percentage REAL,
+    checks_passed INTEGER,
+    total_checks INTEGER,
+    report BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS samples (
+    metric_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (metric_id, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollups (
+    metric_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    PRIMARY KEY (metric_id, ts)
+) WITHOUT ROWID;
+"""
+
+
+def sqlite_path(url: str) -> str:
+    """Database path from a sqlite:/// URL (or a plain path)"""
+    if url.startswith('sqlite:///'):
+        return url[len('sqlite:///'):] or ':memory:'
+    if '://' in url:
+        raise ValueError(f"Unsupported monitoring database URL: {url} (only sqlite:/// is supported)")
+    return url
+
+
+class HistoryStore:
+    """Append-only monitoring history with retention and hourly downsampling"""
+
+    def __init__(self, url: Optional[str] = None):
+        self.url = url or os.getenv('MONITORING_DB_URL', 'sqlite:///monitoring.db')
+        self.path = sqlite_path(self.url)
+        self.report_retention_days = float(os.getenv('MONITORING_REPORT_RETENTION_DAYS', '7'))
+        self.raw_retention_days = float(os.getenv('MONITORING_RAW_RETENTION_DAYS', '14'))
+        self.rollup_retention_days = float(os.getenv('MONITORING_ROLLUP_RETENTION_DAYS', '365'))
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._metric_ids: Dict[str, int] = {}
+        self._last_prune = 0.0
+
+    # ========== CONNECTION ==========
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ':memory:':
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self._metric_ids = dict(conn.execute('SELECT name, id FROM metrics'))
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _metric_id(self, conn: sqlite3.Connection, name: str) -> int:
+        metric_id = self._metric_ids.get(name)
+        if metric_id is None:
+            conn.execute('INSERT OR IGNORE INTO metrics (name) VALUES (?)', (name,))
+            metric_id = conn.execute('SELECT id FROM metrics WHERE name = ?', (name,)).fetchone()[0]
+            self._metric_ids[name] = metric_id
+        return metric_id
+
+    # ========== WRITES ==========
+
+    def append_report(self, report: Dict[str, Any], timestamp: Optional[float] = None) -> int:
+        """
+        Store a report and its metrics; returns the report's timestamp (epoch seconds).
+
+        Blocking: async callers run it in a worker thread. The report row is
+        replaced if a report was already stored for the same second, but the
+        first report's samples are kept so the hourly rollups count each
+        sample once.
+        """
+        ts = int(time.time() if timestamp is None else timestamp)
+        blob = zlib.compress(json.dumps(report, separators=(',', ':'), default=str).encode('utf-8'))
+        bucket = ts - ts % ROLLUP_SECONDS
+
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?, ?)',
+                    (ts, report.get('overall_status'), report.get('health_percentage'),
+                     report.get('checks_passed'), report.get('total_checks'), blob)
+                )
+                for metric, value in report_metrics(report):
+                    metric_id = self._metric_id(conn, metric)
+                    inserted = conn.execute(
+                        'INSERT OR IGNORE INTO samples VALUES (?, ?, ?)', (metric_id, ts, value)
+                    ).rowcount
+                    if not inserted:
+                        continue
+                    conn.execute(
+                        """
+                        INSERT INTO rollups VALUES (?, ?, 1, ?, ?, ?)
+                        ON CONFLICT (metric_id, ts) DO UPDATE SET
+                            count = count + 1, sum = sum + excluded.sum,
+                            min = MIN(min, excluded.min), max = MAX(max, excluded.max)
+                        """,
+                        (metric_id, bucket, value, value, value)
+                    )
+
+            if time.time() - self._last_prune >= PRUNE_EVERY_SECONDS:
+                self._prune(conn)
+        return ts
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        now = time.time()
+        self._last_prune = now
+        with conn:
+            reports = conn.execute('DELETE FROM reports WHERE ts < ?',
+                                   (now - self.report_retention_days * 86400,)).rowcount
+            samples = conn.execute('DELETE FROM samples WHERE ts < ?',
+                                   (now - self.raw_retention_days * 86400,)).rowcount
+            rollups = conn.execute('DELETE FROM rollups WHERE ts < ?',
+                                   (now - self.rollup_retention_days * 86400,)).rowcount
+        if reports or samples or rollups:
+            logger.info(f"Pruned monitoring history: {reports} reports, {samples} samples, {rollups} rollups")
+
+    def prune(self) -> None:
+        """Delete rows past their retention now"""
+        with self._lock:
+            self._prune(self._connect())
+
+    # ========== QUERIES ==========
+
+    def query(self, metric: str, start: Optional[float] = None, end: Optional[float] = None,
+              resolution: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Points of a metric between start and end (epoch seconds).
+
+        resolution is 'raw' or '1h'; by default raw samples are used when
+        the range is within raw retention. Points have the same shape as
+        TimeSeriesStore.query: timestamp, mean, min, max and count.
+        """
+        if resolution is None:
+            raw_from = time.time() - self.raw_retention_days * 86400
+            resolution = 'raw' if start is not None and start >= raw_from else '1h'
+        if resolution not in ('raw', '1h'):
+            raise ValueError(f"Unknown resolution '{resolution}'")
+
+        with self._lock:
+            conn = self._connect()
+            metric_id = self._metric_ids.get(metric)
+            if metric_id is None:
+                return []
+            params = (metric_id, start if start is not None else 0, end if end is not None else 2**62)
+            if resolution == 'raw':
+                rows = conn.execute(
+                    'SELECT ts, value FROM samples WHERE metric_id = ? AND ts BETWEEN ? AND ? ORDER BY ts',
+                    params
+                ).fetchall()
+                return [
+                    {'timestamp': ts, 'mean': value, 'min': value, 'max': value, 'count': 1}
+                    for ts, value in rows
+                ]
+
+            params = (metric_id, params[1] - params[1] % ROLLUP_SECONDS, params[2])
+            rows = conn.execute(
+                'SELECT ts, count, sum, min, max FROM rollups WHERE metric_id = ? AND ts BETWEEN ? AND ? ORDER BY ts',
+                params
+            ).fetchall()
+        return [
+            {'timestamp': ts, 'mean': total / count, 'min': low, 'max': high, 'count': count}
+            for ts, count, total, low, high in rows
+        ]
+
+    def reports(self, start: Optional[float] = None, end: Optional[float] = None,
+                limit: int = 100) -> List[Dict[str, Any]]:
+        """Full reports between start and end, newest first"""
+        with self._lock:
+            rows = self._connect().execute(
+                'SELECT report FROM reports WHERE ts BETWEEN ? AND ? ORDER BY ts DESC LIMIT ?',
+                (start if start is not None else 0, end if end is not None else 2**62, limit)
+            ).fetchall()
+        return [json.loads(zlib.decompress(blob)) for blob, in rows]
+
+    def latest_report(self) -> Optional[Dict[str, Any]]:
+        reports = self.reports(limit=1)
+        return reports[0] if reports else None
+
+    def load_into(self, store: TimeSeriesStore, since: float) -> int:
+        """Replay raw samples since `since` into an in-memory time series; returns samples loaded"""
+        with self._lock:
+            rows = self._connect().execute(
+                """
+                SELECT m.name, s.ts, s.value FROM samples s JOIN metrics m ON m.id = s.metric_id
+                WHERE s.ts >= ? ORDER BY s.ts
+                """,
+                (since,)
+            ).fetchall()
+        for name, ts, value in rows:
+            store.record(name, value, ts)
+        return len(rows)
+
+    def metrics(self) -> List[str]:
+        with self._lock:
+            self._connect()
+            return sorted(self._metric_ids)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            conn = self._connect()
+            counts = {
+                table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                for table in ('reports', 'samples', 'rollups', 'metrics')
+            }
+        size = os.path.getsize(self.path) if self.path != ':memory:' and os.path.exists(self.path) else 0
+        return {'url': self.url, **counts, 'size_bytes': size}
+
+
+# Create singleton instance
+history_store = HistoryStore()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Monitoring history store')
+    subcommands = parser.add_subparsers(dest='command', required=True)
+
+    query = subcommands.add_parser('query', help='Print a metric over a time range')
+    query.add_argument('metric')
+    query.add_argument('--days', type=float, default=1.0)
+    query.add_argument('--resolution', choices=['raw', '1h'], default=None)
+
+    subcommands.add_parser('stats', help='Row counts and database size')
+    subcommands.add_parser('metrics', help='List recorded metrics')
+    subcommands.add_parser('prune', help='Delete rows past retention')
+
+    args = parser.parse_args()
+
+    if args.command == 'query':
+        started = time.perf_counter()
+        points = history_store.query(args.metric, time.time() - args.days * 86400, resolution=args.resolution)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        for point in points:
+            print(f"{time.strftime('%Y-%m-%d %H:%M', time.gmtime(point['timestamp']))}  "
+                  f"mean={point['mean']:.2f} min={point['min']:.2f} max={point['max']:.2f} n={point['count']}")
+        print(f"\n{len(points)} points in {elapsed_ms:.1f}ms")
+    elif args.command == 'stats':
+        print(json.dumps(history_store.stats(), indent=2))
+    elif args.command == 'metrics':
+        print('\n'.join(history_store.metrics()))
+    else:
+        history_store.prune()
+        print(json.dumps(history_store.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Rick Jefferson Solutions - Live Monitoring Dashboard
+Dashboard served over HTTP with check results pushed as server-sent events
+
+The page (static/dashboard.html) is a fixed shell; it renders whatever the
+event stream at /events sends:
+
+    snapshot   on connect: latest report plus recent points of each charted metric
+    cycle      after every monitoring cycle: the report and its metric values
+
+Each event is serialized once and the same bytes are queued for every
+viewer, and the snapshot is rebuilt at most once per cycle from the
+in-memory time series (DASHBOARD_HISTORY_POINTS per metric), so the cost
+of a cycle or a new viewer does not grow with the number of viewers or
+the length of the history. Viewers that fall DASHBOARD_QUEUE_SIZE events
+behind skip to a fresh snapshot.
+
+With DASHBOARD_PASSWORD set, the dashboard asks for HTTP basic auth (any
+user name).
+
+Author: Rick Jefferson Architect
+Company: Rick Jefferson Solutions
+Contact: info@rickjeffersonsolutions.com
+"""
+
+import asyncio
+import base64
+import binascii
+import hmac
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+
+from aiohttp import web
+
+from timeseries import TimeSeriesStore, report_metrics
+
+logger = logging.getLogger(__name__)
+
+SHELL_PATH = Path(__file__).parent / 'static' / 'dashboard.html'
+KEEPALIVE_SECONDS = 15
+RECONNECT_MILLISECONDS = 5000
+
+
+def charted(metric: str) -> bool:
+    """Metrics the dashboard draws sparklines for"""
+    return (
+        metric == 'platform.health_percentage'
+        or (metric.endswith('.response_time_ms') and not metric.startswith('route.'))
+        or metric in ('System Resources.cpu_percent', 'System Resources.memory_percent')
+    )
+
+
+def sse_frame(event: str, data: Dict[str, Any], event_id: Optional[float] = None) -> bytes:
+    """One server-sent event; JSON is compact and has no newlines"""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {int(event_id)}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'), default=str)}")
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+class EventHub:
+    """Fans out pre-serialized dashboard events to connected viewers"""
+
+    def __init__(self, history: TimeSeriesStore, history_points: Optional[int] = None,
+                 queue_size: Optional[int] = None):
+        self.history = history
+        self.history_points = history_points or int(os.getenv('DASHBOARD_HISTORY_POINTS', '288'))
+        self.queue_size = queue_size or int(os.getenv('DASHBOARD_QUEUE_SIZE', '8'))
+        self.subscribers: Set[asyncio.Queue] = set()
+
+        self._report: Optional[Dict[str, Any]] = None
+        self._timestamp: Optional[float] = None
+        self._snapshot: Optional[bytes] = None
+
+    def publish(self, report: Dict[str, Any], timestamp: Optional[float] = None) -> int:
+        """Send a cycle's report and metric values to every viewer; returns viewers reached"""
+        self._report = report
+        self._timestamp = time.time() if timestamp is None else timestamp
+        self._snapshot = None
+
+        frame = sse_frame('cycle', {
+            'timestamp': self._timestamp,
+            'report': report,
+            'metrics': {metric: value for metric, value in report_metrics(report) if charted(metric)}
+        }, self._timestamp)
+
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # Too far behind: drop the backlog and resynchronize
+                self._drain(queue)
+                queue.put_nowait(self.snapshot())
+        return len(self.subscribers)
+
+    @property
+    def latest(self) -> Optional[Dict[str, Any]]:
+        return self._report
+
+    def snapshot(self) -> bytes:
+        """Latest report and recent history, built once per cycle"""
+        if self._snapshot is None:
+            series = {}
+            for metric in self.history.metrics():
+                if not charted(metric):
+                    continue
+                # Newest raw samples (bounded by the ring's capacity)
+                points = self.history.query(metric)[-self.history_points:]
+                series[metric] = [[point['timestamp'], round(point['mean'], 2)] for point in points]
+            self._snapshot = sse_frame('snapshot', {
+                'timestamp': self._timestamp,
+                'report': self._report,
+                'series': series,
+                'history_points': self.history_points
+            }, self._timestamp)
+        return self._snapshot
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        queue.put_nowait(self.snapshot())
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self.subscribers.discard(queue)
+
+    def close(self) -> None:
+        """End every open stream"""
+        for queue in list(self.subscribers):
+            self._drain(queue)
+            queue.put_nowait(None)
+        self.subscribers.clear()
+
+    @staticmethod
+    def _drain(queue: asyncio.Queue) -> None:
+        while not queue.empty():
+            queue.get_nowait()
+
+
+class LiveDashboard:
+    """HTTP server for the dashboard shell and its event stream"""
+
+    def __init__(self, history: TimeSeriesStore, host: Optional[str] = None, port: Optional[int] = None):
+        self.host = host or os.getenv('DASHBOARD_HOST', '0.0.0.0')
+        self.port = port if port is not None else int(os.getenv('DASHBOARD_PORT', '8050'))
+        self.password = os.getenv('DASHBOARD_PASSWORD', '')
+        self.hub = EventHub(history)
+        self._runner: Optional[web.AppRunner] = None
+
+    def publish(self, report: Dict[str, Any], timestamp: Optional[float] = None) -> int:
+        return self.hub.publish(report, timestamp)
+
+    # ========== HTTP ==========
+
+    def _authorized(self, request: web.Request) -> bool:
+        if not self.password:
+            return True
+        scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'basic':
+            return False
+        try:
+            _, _, password = base64.b64decode(credentials).decode('utf-8').partition(':')
+        except (binascii.Error, UnicodeDecodeError):
+            return False
+        return hmac.compare_digest(password.encode('utf-8'), self.password.encode('utf-8'))
+
+    @web.middleware
+    async def _auth_middleware(self, request: web.Request, handler):
+        if not self._authorized(request):
+            raise web.HTTPUnauthorized(headers={'WWW-Authenticate': 'Basic realm="RJS Monitoring"'})
+        return await handler(request)
+
+    async def _shell(self, request: web.Request) -> web.StreamResponse:
+        return web.FileResponse(SHELL_PATH, headers={'Cache-Control': 'no-cache'})
+
+    async def _events(self, request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(headers={
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+        await response.prepare(request)
+        await response.write(f"retry: {RECONNECT_MILLISECONDS}\n\n".encode('utf-8'))
+
+        queue = self.hub.subscribe()
+        logger.info(f"Dashboard viewer connected ({len(self.hub.subscribers)} watching)")
+        try:
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    frame = b': keepalive\n\n'
+                if frame is None:
+                    break
+                await response.write(frame)
+        except ConnectionResetError:
+            pass
+        finally:
+            self.hub.unsubscribe(queue)
+            logger.info(f"Dashboard viewer disconnected ({len(self.hub.subscribers)} watching)")
+        return response
+
+    async def _report(self, request: web.Request) -> web.Response:
+        return web.json_response(self.hub.latest or {}, dumps=lambda data: json.dumps(data, default=str))
+
+    def create_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._auth_middleware])
+        app.router.add_get('/', self._shell)
+        app.router.add_get('/events', self._events)
+        app.router.add_get('/api/report', self._report)
+        return app
+
+    # ========== LIFECYCLE ==========
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.create_app(), handle_signals=False)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Live dashboard at http://{self.host}:{self.port}/")
+
+    async def stop(self) -> None:
+        self.hub.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
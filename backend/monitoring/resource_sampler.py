@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Rick Jefferson Solutions - System Resource Sampler
+Background sampling of host and process resources for health monitoring
+
+A daemon thread samples CPU, memory, disk, network throughput and the
+busiest processes every RESOURCE_SAMPLE_INTERVAL_SECONDS and keeps the
+samples from the last RESOURCE_SAMPLE_WINDOW_SECONDS. After each sample it
+publishes a snapshot (latest values plus percentiles over the window), so
+readers on the event loop never wait on psutil.
+
+Author: Rick Jefferson Architect
+Company: Rick Jefferson Solutions
+Contact: info@rickjeffersonsolutions.com
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# Metrics summarized over the window
+WINDOW_METRICS = ('cpu_percent', 'memory_percent', 'disk_percent', 'net_sent_kbps', 'net_recv_kbps')
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class ResourceSampler:
+    """Rolling window of system resource samples filled by a background thread"""
+
+    def __init__(self, interval: Optional[float] = None, window: Optional[float] = None,
+                 top_processes: Optional[int] = None, disk_path: str = '/'):
+        self.interval = interval or float(os.getenv('RESOURCE_SAMPLE_INTERVAL_SECONDS', '5'))
+        self.window = window or float(os.getenv('RESOURCE_SAMPLE_WINDOW_SECONDS', '300'))
+        self.top_processes = top_processes if top_processes is not None else int(
+            os.getenv('RESOURCE_SAMPLE_TOP_PROCESSES', '5')
+        )
+        self.disk_path = disk_path
+        self.samples: Deque[Dict[str, Any]] = deque(maxlen=max(1, int(self.window / self.interval)))
+
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._sample_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_net = None
+        self._primed_at = 0.0
+
+    # ========== LIFECYCLE ==========
+
+    def start(self) -> None:
+        """Start sampling (no-op if already running)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            # Prime the counters that report usage since the previous call
+            psutil.cpu_percent(interval=None)
+            self._primed_at = time.monotonic()
+            self._last_net = (time.monotonic(), psutil.net_io_counters())
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='resource-sampler', daemon=True)
+            self._thread.start()
+        logger.info(f"Resource sampler started (every {self.interval:g}s, {self.window:g}s window)")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self) -> None:
+        # First sample soon after start so readers have data quickly
+        delay = min(self.interval, 1.0)
+        while not self._stop.wait(delay):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Resource sample failed: {e}")
+            delay = self.interval
+
+    # ========== SAMPLING ==========
+
+    def _process_stats(self) -> List[Dict[str, Any]]:
+        """Busiest processes by CPU since the previous sample"""
+        if self.top_processes <= 0:
+            return []
+
+        stats = []
+        # process_iter reuses Process objects, so cpu_percent() covers the time since the last sample
+        for proc in psutil.process_iter(['pid', 'name']):
+            try:
+                with proc.oneshot():
+                    stats.append({
+                        'pid': proc.info['pid'],
+                        'name': proc.info['name'],
+                        'cpu_percent': proc.cpu_percent(interval=None),
+                        'memory_mb': round(proc.memory_info().rss / (1024**2), 1),
+                        'threads': proc.num_threads()
+                    })
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+
+        stats.sort(key=lambda stat: stat['cpu_percent'], reverse=True)
+        return stats[:self.top_processes]
+
+    def sample(self) -> Dict[str, Any]:
+        """Take one sample and publish a new snapshot"""
+        with self._sample_lock:
+            return self._sample()
+
+    def _sample(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage(self.disk_path)
+        net = psutil.net_io_counters()
+
+        sent_kbps = recv_kbps = 0.0
+        if self._last_net is not None:
+            last_time, last_net = self._last_net
+            elapsed = now - last_time
+            if elapsed > 0:
+                sent_kbps = max(0, net.bytes_sent - last_net.bytes_sent) * 8 / 1000 / elapsed
+                recv_kbps = max(0, net.bytes_recv - last_net.bytes_recv) * 8 / 1000 / elapsed
+        self._last_net = (now, net)
+
+        # CPU usage over a few microseconds is noise; only possible right after start()
+        if now - self._primed_at < 0.1:
+            cpu_percent = psutil.cpu_percent(interval=0.1)
+        else:
+            cpu_percent = psutil.cpu_percent(interval=None)
+
+        sample = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'cpu_percent': cpu_percent,
+            'memory_percent': memory.percent,
+            'memory_available_gb': round(memory.available / (1024**3), 2),
+            'disk_percent': disk.percent,
+            'disk_free_gb': round(disk.free / (1024**3), 2),
+            'net_sent_kbps': round(sent_kbps, 2),
+            'net_recv_kbps': round(recv_kbps, 2),
+            'processes': self._process_stats()
+        }
+
+        self.samples.append(sample)
+        window = {}
+        for metric in WINDOW_METRICS:
+            values = sorted(s[metric] for s in self.samples)
+            window[metric] = {
+                **{f'p{pct}': round(percentile(values, pct), 2) for pct in PERCENTILES},
+                'max': round(values[-1], 2)
+            }
+
+        snapshot = {
+            'latest': sample,
+            'window': window,
+            'window_seconds': round(len(self.samples) * self.interval),
+            'samples': len(self.samples)
+        }
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        """Most recent snapshot, or None before the first sample"""
+        with self._lock:
+            return self._snapshot
+
+
+# Create singleton instance
+resource_sampler = ResourceSampler()
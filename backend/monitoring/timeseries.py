@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Rick Jefferson Solutions - Monitoring Time Series
+In-memory ring-buffer history of numeric monitoring metrics with rollups
+
+Every metric (e.g. 'API Health.up', 'Database.response_time_ms') keeps its
+raw samples plus 1 minute, 5 minute and 1 hour rollups (count/sum/min/max).
+Each resolution is a fixed-capacity ring of typed arrays, so appending and
+evicting are O(1) and memory per metric is constant:
+
+    raw   2016 samples  (1 week at 5-minute cycles)
+    1m    1440 buckets  (1 day)
+    5m    2016 buckets  (1 week)
+    1h    1344 buckets  (8 weeks)
+
+About 230 KB per metric; TIMESERIES_MAX_SERIES caps the number of metrics.
+
+Author: Rick Jefferson Architect
+Company: Rick Jefferson Solutions
+Contact: info@rickjeffersonsolutions.com
+"""
+
+import logging
+import os
+import time
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RAW_CAPACITY = 2016
+
+# name -> (bucket seconds, buckets kept), finest first
+ROLLUPS = {
+    '1m': (60, 1440),
+    '5m': (300, 2016),
+    '1h': (3600, 1344)
+}
+
+
+def report_metrics(report: Dict[str, Any]) -> List[Tuple[str, float]]:
+    """(metric, value) pairs recorded for a health report"""
+    metrics = [('platform.health_percentage', float(report.get('health_percentage', 0)))]
+
+    for check in report.get('checks', []):
+        if not isinstance(check, dict):
+            continue
+        service = check.get('service', 'Unknown')
+        metrics.append((f'{service}.up', 1.0 if check.get('status') == 'healthy' else 0.0))
+        if check.get('response_time_ms') is not None:
+            metrics.append((f'{service}.response_time_ms', float(check['response_time_ms'])))
+
+        details = check.get('details')
+        if service == 'System Resources' and isinstance(details, dict):
+            for key in ('cpu_percent', 'memory_percent', 'disk_percent'):
+                if isinstance(details.get(key), (int, float)):
+                    metrics.append((f'{service}.{key}', float(details[key])))
+
+    for route in (report.get('route_latency') or {}).get('routes', []):
+        metrics.append((f"route.{route['route']}.p95_ms", float(route['p95Ms'])))
+    return metrics
+
+
+class RingBuffer:
+    """Fixed-capacity ring of timestamped rows stored column-wise in arrays"""
+
+    def __init__(self, capacity: int, columns: Tuple[str, ...]):
+        self.capacity = capacity
+        self.columns = columns
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.data = {column: array('d', bytes(8 * capacity)) for column in columns}
+        self.start = 0
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _slot(self, index: int) -> int:
+        return (self.start + index) % self.capacity
+
+    def append(self, timestamp: float, *values: float) -> None:
+        """Add a row, overwriting the oldest when full"""
+        if self.size < self.capacity:
+            slot = self._slot(self.size)
+            self.size += 1
+        else:
+            slot = self.start
+            self.start = (self.start + 1) % self.capacity
+        self.timestamps[slot] = timestamp
+        for column, value in zip(self.columns, values):
+            self.data[column][slot] = value
+
+    def oldest(self) -> Optional[float]:
+        return self.timestamps[self.start] if self.size else None
+
+    def newest(self) -> Optional[float]:
+        return self.timestamps[self._slot(self.size - 1)] if self.size else None
+
+    def _first_index(self, timestamp: float) -> int:
+        """Index of the first row at or after timestamp (rows are in time order)"""
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.timestamps[self._slot(middle)] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def rows(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Tuple[float, ...]]:
+        """(timestamp, *columns) rows with start <= timestamp <= end, oldest first"""
+        index = 0 if start is None else self._first_index(start)
+        columns = [self.data[column] for column in self.columns]
+        while index < self.size:
+            slot = self._slot(index)
+            timestamp = self.timestamps[slot]
+            if end is not None and timestamp > end:
+                break
+            yield (timestamp, *(column[slot] for column in columns))
+            index += 1
+
+    def memory_bytes(self) -> int:
+        return self.timestamps.itemsize * self.capacity * (1 + len(self.columns))
+
+
+class Series:
+    """Raw samples and rollups of one metric"""
+
+    def __init__(self):
+        self.raw = RingBuffer(RAW_CAPACITY, ('value',))
+        self.rollups = {
+            name: RingBuffer(capacity, ('count', 'sum', 'min', 'max'))
+            for name, (_, capacity) in ROLLUPS.items()
+        }
+        # Bucket still being filled per rollup: [bucket start, count, sum, min, max]
+        self.open_buckets: Dict[str, Optional[List[float]]] = {name: None for name in ROLLUPS}
+
+    def add(self, timestamp: float, value: float) -> bool:
+        newest = self.raw.newest()
+        if newest is not None and timestamp < newest:
+            return False
+        self.raw.append(timestamp, value)
+
+        for name, (step, _) in ROLLUPS.items():
+            bucket_start = timestamp - timestamp % step
+            bucket = self.open_buckets[name]
+            if bucket is not None and bucket[0] != bucket_start:
+                self.rollups[name].append(*bucket)
+                bucket = None
+            if bucket is None:
+                self.open_buckets[name] = [bucket_start, 1, value, value, value]
+            else:
+                bucket[1] += 1
+                bucket[2] += value
+                bucket[3] = min(bucket[3], value)
+                bucket[4] = max(bucket[4], value)
+        return True
+
+    def buckets(self, resolution: str, start: Optional[float], end: Optional[float]) -> List[Dict[str, Any]]:
+        if resolution == 'raw':
+            return [
+                {'timestamp': timestamp, 'mean': value, 'min': value, 'max': value, 'count': 1}
+                for timestamp, value in self.raw.rows(start, end)
+            ]
+
+        step = ROLLUPS[resolution][0]
+        # A bucket belongs to the range if any part of it does
+        bucket_start = None if start is None else start - start % step
+        rows = list(self.rollups[resolution].rows(bucket_start, end))
+        bucket = self.open_buckets[resolution]
+        if bucket is not None and (bucket_start is None or bucket[0] >= bucket_start) and (end is None or bucket[0] <= end):
+            rows.append(tuple(bucket))
+        return [
+            {'timestamp': timestamp, 'mean': total / count, 'min': low, 'max': high, 'count': int(count)}
+            for timestamp, count, total, low, high in rows
+        ]
+
+    def memory_bytes(self) -> int:
+        return self.raw.memory_bytes() + sum(ring.memory_bytes() for ring in self.rollups.values())
+
+
+class TimeSeriesStore:
+    """Named metric series with a fixed memory budget"""
+
+    def __init__(self, max_series: Optional[int] = None):
+        self.max_series = max_series or int(os.getenv('TIMESERIES_MAX_SERIES', '200'))
+        self.series: Dict[str, Series] = {}
+        self.dropped = 0
+
+    def record(self, metric: str, value: float, timestamp: Optional[float] = None) -> None:
+        """Append a sample (epoch seconds, default now); out-of-order samples are dropped"""
+        series = self.series.get(metric)
+        if series is None:
+            if len(self.series) >= self.max_series:
+                self.dropped += 1
+                if self.dropped == 1:
+                    logger.warning(f"Time series limit of {self.max_series} reached; dropping new metrics")
+                return
+            series = self.series[metric] = Series()
+
+        if not series.add(time.time() if timestamp is None else timestamp, float(value)):
+            self.dropped += 1
+
+    def record_report(self, report: Dict[str, Any], timestamp: Optional[float] = None) -> None:
+        """Record platform health plus each check's availability and response time"""
+        timestamp = time.time() if timestamp is None else timestamp
+        for metric, value in report_metrics(report):
+            self.record(metric, value, timestamp)
+
+    def resolution_for(self, metric: str, start: Optional[float]) -> str:
+        """Finest resolution whose retention still reaches back to start"""
+        series = self.series.get(metric)
+        if series is None or start is None:
+            return 'raw'
+        candidates = [('raw', series.raw)] + list(series.rollups.items())
+        for name, ring in candidates:
+            if len(ring) < ring.capacity or ring.oldest() <= start:
+                return name
+        return '1h'
+
+    def query(self, metric: str, start: Optional[float] = None, end: Optional[float] = None,
+              resolution: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Points of a metric between start and end (epoch seconds).
+
+        resolution is 'raw', '1m', '5m' or '1h'; by default the finest one
+        that covers the whole range is used. Each point has timestamp, mean,
+        min, max and count.
+        """
+        series = self.series.get(metric)
+        if series is None:
+            return []
+        resolution = resolution or self.resolution_for(metric, start)
+        if resolution != 'raw' and resolution not in ROLLUPS:
+            raise ValueError(f"Unknown resolution '{resolution}'")
+        return series.buckets(resolution, start, end)
+
+    def latest(self, metric: str) -> Optional[Tuple[float, float]]:
+        """(timestamp, value) of the newest sample"""
+        series = self.series.get(metric)
+        if series is None or not len(series.raw):
+            return None
+        return next(series.raw.rows(series.raw.newest()))
+
+    def metrics(self) -> List[str]:
+        return sorted(self.series)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'series': len(self.series),
+            'max_series': self.max_series,
+            'memory_bytes': sum(series.memory_bytes() for series in self.series.values()),
+            'dropped_samples': self.dropped
+        }
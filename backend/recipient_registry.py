@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Rick Jefferson Solutions - Canonical Recipient Registry
+Pre-verified dispute recipients (credit bureaus, major furnishers) referenced by id
+
+Recipients live in data/recipients.json (USPS_RECIPIENTS_FILE overrides).
+Their addresses are stored in USPS-standardized form and were verified when
+the file was last refreshed, so letters sent to a registry recipient skip
+address verification. Postage to each recipient is precomputed by
+USPSService from the local rate tables.
+
+Re-verify every recipient against USPS and rewrite the file with:
+    python recipient_registry.py --verify
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import os
+import sys
+import json
+import asyncio
+import logging
+import argparse
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RECIPIENTS_FILE = Path(__file__).parent / 'data' / 'recipients.json'
+
+
+class RecipientRegistry:
+    """Canonical recipients keyed by id"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or os.getenv('USPS_RECIPIENTS_FILE') or DEFAULT_RECIPIENTS_FILE)
+        self.version: Optional[str] = None
+        self.recipients: Dict[str, Dict] = {}
+        self.load()
+
+    def load(self) -> None:
+        if not self.path.exists():
+            logger.warning(f"Recipient registry {self.path} not found")
+            return
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        self.version = snapshot.get('version')
+        self.recipients = {recipient['id']: recipient for recipient in snapshot.get('recipients', [])}
+        logger.info(f"Loaded {len(self.recipients)} registry recipients ({self.version})")
+
+    def save(self) -> None:
+        snapshot = {'version': self.version, 'recipients': list(self.recipients.values())}
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, indent=2)
+            f.write('\n')
+        os.replace(tmp_path, self.path)
+
+    def get(self, recipient_id: str) -> Optional[Dict]:
+        return self.recipients.get(recipient_id)
+
+    def list(self, category: Optional[str] = None) -> List[Dict]:
+        return [
+            recipient for recipient in self.recipients.values()
+            if category is None or recipient.get('category') == category
+        ]
+
+
+async def verify_registry(registry: RecipientRegistry) -> int:
+    """Re-verify every recipient with USPS; returns the number that failed"""
+    from usps_service import USPSAddress, usps_service
+
+    failures = 0
+    await usps_service.start()
+    try:
+        for recipient in registry.list():
+            result = await usps_service.verify_address(USPSAddress(**recipient['address']))
+            if not result.get('success') or not result.get('deliverable', True):
+                failures += 1
+                print(f"❌ {recipient['id']}: {result.get('error') or 'not deliverable'}")
+                continue
+
+            standardized = result.get('standardizedAddress') or {}
+            address = recipient['address']
+            address.update({
+                key: value for key, value in {
+                    'streetAddress': standardized.get('streetAddress'),
+                    'secondaryAddress': standardized.get('secondaryAddress'),
+                    'cityName': standardized.get('city'),
+                    'state': standardized.get('state'),
+                    'zipCode': standardized.get('ZIPCode'),
+                    'zipPlus4': standardized.get('ZIPPlus4')
+                }.items() if value
+            })
+            recipient['verifiedAt'] = date.today().isoformat()
+            print(f"✅ {recipient['id']}: {address['streetAddress']}, {address['cityName']} {address['state']} {address['zipCode']}")
+    finally:
+        await usps_service.close()
+
+    if not failures:
+        registry.version = date.today().isoformat()
+        registry.save()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Canonical dispute recipient registry')
+    parser.add_argument('--verify', action='store_true', help='Re-verify all recipients with USPS and save')
+    args = parser.parse_args()
+
+    registry = RecipientRegistry()
+    if args.verify:
+        return 1 if asyncio.run(verify_registry(registry)) else 0
+
+    for recipient in registry.list():
+        address = recipient['address']
+        print(f"{recipient['id']:<14} {recipient['name']} - {address['streetAddress']}, "
+              f"{address['cityName']} {address['state']} {address['zipCode']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Rick Jefferson Solutions - Shared Redis Client
+Lazily created async Redis connection shared by the API workers
+
+Redis is optional: when REDIS_URL is unset or the redis package is not
+installed, get_redis() returns None and callers fall back to
+process-local state.
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import os
+import logging
+from typing import Optional
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+_client = None
+
+
+def get_redis() -> Optional["aioredis.Redis"]:
+    """Return the shared Redis client, or None when Redis is not configured"""
+    global _client
+
+    redis_url = os.getenv('REDIS_URL')
+    if aioredis is None or not redis_url:
+        return None
+
+    if _client is None:
+        _client = aioredis.from_url(redis_url, decode_responses=True)
+        logger.info("Redis client configured for shared state")
+
+    return _client
+
+
+async def close_redis() -> None:
+    """Close the shared Redis client"""
+    global _client
+
+    if _client is not None:
+        await _client.aclose() if hasattr(_client, 'aclose') else await _client.close()
+        _client = None
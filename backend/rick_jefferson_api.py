@@ -4,12 +4,18 @@ Rick Jefferson AI - Supreme Credit Enforcement Chain™ API
 Simplified FastAPI backend for credit repair platform
 """
 
-from fastapi import FastAPI, HTTPException, status, Depends, Security, Request
+from fastapi import FastAPI, HTTPException, status, Depends, Security, Request, Response, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import asyncio
+import hmac
 import uuid
 import json
 import os
@@ -17,6 +23,18 @@ import jwt
 import bcrypt
 from dotenv import load_dotenv
 from usps_service import usps_service, USPSAddress, USPSPricingRequest, USPSLabelRequest, USPSDisputeMailRequest
+from idempotency import IdempotencyStore, IdempotencyConflictError, IdempotencyInProgressError
+from mailing_jobs import MailingJobManager, MailingJobNotFoundError, MailingJobRunningError
+from tracking_refresher import TrackingRefresher
+from label_store import LabelNotFoundError, iter_file, parse_range
+from letter_store import LetterType
+from zip_database import zip_database
+from usps_rates import FLAT_MAX_WEIGHT_OZ, max_pages
+from redis_client import close_redis
+from latency_histogram import route_latency
+from metrics import (
+    BCRYPT_DURATION, BCRYPT_QUEUE_DEPTH, MetricsMiddleware, external_call, mark_worker_dead, render_metrics
+)
 import stripe
 
 # Load environment variables from parent directory
@@ -25,6 +43,12 @@ load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
 # Initialize Stripe
 stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
 
+# USPS batch limits
+USPS_BATCH_VERIFY_MAX = int(os.getenv('USPS_BATCH_VERIFY_MAX', '5000'))
+USPS_BATCH_MAX_CONCURRENCY = int(os.getenv('USPS_BATCH_MAX_CONCURRENCY', '50'))
+USPS_BATCH_STREAM_THRESHOLD = int(os.getenv('USPS_BATCH_STREAM_THRESHOLD', '200'))
+USPS_MAILING_JOB_MAX_ITEMS = int(os.getenv('USPS_MAILING_JOB_MAX_ITEMS', '50000'))
+
 # JWT Configuration
 JWT_SECRET = os.getenv('JWT_SECRET_KEY', 'rick_jefferson_supreme_secret_2024')
 JWT_ALGORITHM = os.getenv('JWT_ALGORITHM', 'HS256')
@@ -33,13 +57,41 @@ JWT_EXPIRATION_HOURS = int(os.getenv('JWT_EXPIRATION_HOURS', '24'))
 # Security
 security = HTTPBearer()
 
+# Metrics scrape auth (optional bearer token)
+MONITORING_API_KEY = os.getenv('MONITORING_API_KEY')
+
+# bcrypt is CPU-bound; hashing runs on this pool instead of the event loop
+password_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('BCRYPT_WORKERS', '4')),
+    thread_name_prefix='bcrypt'
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open long-lived clients on startup and close them on shutdown"""
+    await usps_service.start()
+    if usps_service.enabled:
+        tracking_refresher.start()
+    route_latency.start()
+    zip_database.start()
+    yield
+    await zip_database.close()
+    await route_latency.close()
+    await tracking_refresher.close()
+    await mailing_jobs.close()
+    await usps_service.close()
+    await close_redis()
+    password_executor.shutdown(wait=False)
+    mark_worker_dead(os.getpid())
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Rick Jefferson Solutions - Credit Repair API",
     description="Your Credit Freedom Starts Here - Complete credit repair automation",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -51,6 +103,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request count/latency metrics per route
+app.add_middleware(MetricsMiddleware)
+
 # Pydantic Models
 class ClientCreate(BaseModel):
     first_name: str
@@ -71,7 +126,11 @@ class ClientResponse(BaseModel):
     last_name: str
     email: str
     phone: Optional[str]
-    credit_score: Optional[int]
+    address: Optional[str] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+    zip_code: Optional[str] = None
+    credit_score: Optional[int] = None
     status: str
     current_enforcement_stage: Optional[str]
     created_at: datetime
@@ -135,15 +194,43 @@ clients_db = {}
 disputes_db = {}
 users_db = {}  # For authentication
 token_blacklist = set()  # For logout functionality
+idempotency_store = IdempotencyStore()  # Replays retried Stripe/USPS POSTs
+mailing_jobs = MailingJobManager(usps_service)  # Bulk dispute-letter mailing
+tracking_refresher = TrackingRefresher(usps_service, mailing_jobs.store)  # Keeps letter_tracking current
 
 # Authentication Helper Functions
-def hash_password(password: str) -> str:
+async def run_password_job(operation: str, func, *args):
+    """Run a bcrypt call on the password executor, tracking queue depth"""
+    queued = {'waiting': True}
+    
+    def leave_queue():
+        # dict.pop is atomic, so exactly one caller decrements
+        if queued.pop('waiting', False):
+            BCRYPT_QUEUE_DEPTH.dec()
+    
+    def run():
+        leave_queue()
+        with BCRYPT_DURATION.labels(operation).time():
+            return func(*args)
+    
+    BCRYPT_QUEUE_DEPTH.inc()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, run)
+    finally:
+        # Cancelled before a thread picked it up
+        leave_queue()
+
+async def hash_password(password: str) -> str:
     """Hash password using bcrypt"""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return await run_password_job(
+        'hash', lambda: bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    )
 
-def verify_password(password: str, hashed: str) -> bool:
+async def verify_password(password: str, hashed: str) -> bool:
     """Verify password against hash"""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    return await run_password_job(
+        'verify', lambda: bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    )
 
 def create_access_token(user_id: str, email: str, role: str) -> str:
     """Create JWT access token"""
@@ -218,6 +305,90 @@ def get_current_user(token_data: Dict[str, Any] = Depends(verify_token)) -> Dict
         )
     return user
 
+async def run_idempotent(scope: str, idempotency_key: Optional[str], payload: Any, response: Response, operation):
+    """Run operation once per Idempotency-Key and replay the stored result for retries"""
+    try:
+        result, replayed = await idempotency_store.run(scope, idempotency_key, payload, operation)
+    except IdempotencyConflictError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except IdempotencyInProgressError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+def pdf_response(path: Optional[Path], chunks, filename: str, range_header: Optional[str]) -> Response:
+    """Stream a PDF, honoring a single byte range when the file is on disk"""
+    headers = {'Content-Disposition': f'inline; filename="{filename}"', 'Accept-Ranges': 'bytes'}
+    
+    if path is None:
+        # Still being assembled, so the length is not known yet
+        headers['Accept-Ranges'] = 'none'
+        return StreamingResponse(chunks, media_type='application/pdf', headers=headers)
+    
+    size = path.stat().st_size
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=416,
+            detail=str(e),
+            headers={'Content-Range': f'bytes */{size}'}
+        )
+    
+    if byte_range is None:
+        headers['Content-Length'] = str(size)
+        return StreamingResponse(iter_file(path), media_type='application/pdf', headers=headers)
+    
+    start, end = byte_range
+    headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    headers['Content-Length'] = str(end - start + 1)
+    return StreamingResponse(
+        iter_file(path, start, end),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type='application/pdf',
+        headers=headers
+    )
+
+def check_recipient(recipient_address: Optional[USPSAddress], recipient_id: Optional[str]) -> None:
+    """A letter needs exactly one of recipientAddress and a known recipientId"""
+    if (recipient_address is None) == (recipient_id is None):
+        raise HTTPException(status_code=422, detail="Provide either recipientAddress or recipientId")
+    if recipient_id is not None and usps_service.recipients.get(recipient_id) is None:
+        raise HTTPException(status_code=422, detail=f"Unknown recipient: {recipient_id}")
+
+async def ensure_label_stored(tracking_number: str) -> None:
+    """Download a mailed letter's label into the label store if it is missing"""
+    label_store = usps_service.label_store
+    if label_store.get_hash(tracking_number) is not None:
+        return
+    
+    for letter in await mailing_jobs.store.get_letters_by_tracking(tracking_number):
+        for event in reversed(await mailing_jobs.store.get_tracking_events(letter['id'])):
+            label_url = (event.get('metadata') or {}).get('labelUrl')
+            if label_url:
+                await usps_service.fetch_label(tracking_number, label_url)
+                return
+
+async def print_labels_response(tracking_numbers: List[str], filename: str, range_header: Optional[str]) -> Response:
+    """One PDF with the labels of tracking_numbers, in order"""
+    if usps_service.label_store is None:
+        raise HTTPException(status_code=404, detail="Label store is disabled")
+    
+    try:
+        for tracking_number in tracking_numbers:
+            await ensure_label_stored(tracking_number)
+        path, chunks = usps_service.label_store.iter_print_pdf(tracking_numbers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LabelNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    
+    return pdf_response(path, chunks, filename, range_header)
+
 def require_role(required_roles: List[str]):
     """Decorator to require specific roles"""
     def role_checker(current_user: Dict[str, Any] = Depends(get_current_user)):
@@ -237,6 +408,10 @@ class AddressVerificationRequest(BaseModel):
     state: str
     zipCode: str
 
+class BatchAddressVerificationRequest(BaseModel):
+    addresses: List[AddressVerificationRequest]
+    concurrency: Optional[int] = None
+
 class PricingRequest(BaseModel):
     originZipCode: str
     destinationZipCode: str
@@ -254,12 +429,44 @@ class LabelCreationRequest(BaseModel):
     specialServices: Optional[List[str]] = None
     customerReference: Optional[str] = None
 
+class PostageQuoteItem(BaseModel):
+    # Past LETTER_MAX_WEIGHT_OZ (20 pages) a letter is priced as a flat, up to the flat weight limit
+    pageCount: int = Field(1, ge=1, le=max_pages(FLAT_MAX_WEIGHT_OZ))
+    quantity: int = Field(1, ge=1)
+    specialServices: Optional[List[str]] = None
+
+class PostageQuoteRequest(BaseModel):
+    items: List[PostageQuoteItem]
+
 class DisputeMailRequest(BaseModel):
     clientId: str
     disputeId: str
-    recipientAddress: USPSAddress
+    recipientAddress: Optional[USPSAddress] = None
+    recipientId: Optional[str] = None  # Registry recipient, see GET /api/v1/usps/recipients
     letterType: str
     specialServices: Optional[List[str]] = None
+    pageCount: Optional[int] = None
+
+class MailingJobItem(BaseModel):
+    clientId: str
+    disputeId: str
+    recipientAddress: Optional[USPSAddress] = None
+    recipientId: Optional[str] = None
+    letterType: LetterType
+    recipientName: Optional[str] = None
+    subject: Optional[str] = None
+    content: Optional[str] = None
+    specialServices: Optional[List[str]] = None
+    pageCount: int = 1
+
+class MailingJobRequest(BaseModel):
+    items: List[MailingJobItem]
+    concurrency: Optional[int] = None
+    verifyAddresses: bool = True
+    consolidate: Optional[bool] = None  # One envelope per client and recipient
+
+class LabelPrintRequest(BaseModel):
+    trackingNumbers: List[str]
 
 # Stripe Payment Models
 class CreateCustomerRequest(BaseModel):
@@ -301,6 +508,26 @@ async def root():
         "sms": "Text 'credit repair' to 945-308-8003"
     }
 
+def verify_monitoring_key(authorization: Optional[str] = Header(None)) -> None:
+    """Require MONITORING_API_KEY as a bearer token when it is configured"""
+    if MONITORING_API_KEY and not hmac.compare_digest(authorization or '', f"Bearer {MONITORING_API_KEY}"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid monitoring API key",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(verify_monitoring_key)])
+async def metrics():
+    """Prometheus metrics, aggregated across API workers"""
+    body, content_type = await asyncio.to_thread(render_metrics)
+    return Response(content=body, media_type=content_type)
+
+@app.get("/api/v1/admin/latency", dependencies=[Depends(verify_monitoring_key)])
+async def route_latency_percentiles(route: Optional[str] = None):
+    """p50/p95/p99 latency per route over the recent window, slowest first"""
+    return await route_latency.report(route)
+
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint"""
@@ -325,7 +552,7 @@ async def register_user(user_data: UserRegister):
     
     # Create new user
     user_id = str(uuid.uuid4())
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await hash_password(user_data.password)
     
     user = {
         "id": user_id,
@@ -361,7 +588,7 @@ async def login_user(user_credentials: UserLogin):
             user = u
             break
     
-    if not user or not verify_password(user_credentials.password, user["password_hash"]):
+    if not user or not await verify_password(user_credentials.password, user["password_hash"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -436,6 +663,15 @@ async def auth_health_check():
 @app.post("/api/v1/clients", response_model=ClientResponse, status_code=status.HTTP_201_CREATED)
 async def create_client(client: ClientCreate):
     """Create a new client"""
+    city, state = client.city, client.state
+    if client.zip_code:
+        # Reject impossible ZIP/state combinations and correct or fill in the state and city
+        check = zip_database.prevalidate({'cityName': city, 'state': state, 'zipCode': client.zip_code})
+        if not check['valid']:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=check['error'])
+        city = check['corrections'].get('cityName', city)
+        state = check['corrections'].get('state', state)
+    
     client_id = str(uuid.uuid4())
     now = datetime.now()
     
@@ -445,6 +681,10 @@ async def create_client(client: ClientCreate):
         last_name=client.last_name,
         email=client.email,
         phone=client.phone,
+        address=client.address,
+        city=city,
+        state=state.upper() if state else state,
+        zip_code=client.zip_code,
         credit_score=client.credit_score,
         status="active",
         current_enforcement_stage="Step 1: Credit Report Analysis",
@@ -562,6 +802,39 @@ async def verify_address(request: AddressVerificationRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/v1/usps/address/verify/batch")
+async def verify_address_batch(request: BatchAddressVerificationRequest, stream: Optional[bool] = None):
+    """
+    Verify a batch of addresses using USPS API
+    
+    Results are returned in input order. Large batches (or stream=true) are
+    streamed as NDJSON lines of {"index": ..., "result": ...}.
+    """
+    if not request.addresses:
+        raise HTTPException(status_code=400, detail="At least one address is required")
+    
+    if len(request.addresses) > USPS_BATCH_VERIFY_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds the maximum of {USPS_BATCH_VERIFY_MAX} addresses"
+        )
+    
+    addresses = [USPSAddress(**address.dict()) for address in request.addresses]
+    concurrency = min(request.concurrency or usps_service.batch_concurrency, USPS_BATCH_MAX_CONCURRENCY)
+    
+    if stream or (stream is None and len(addresses) > USPS_BATCH_STREAM_THRESHOLD):
+        async def result_lines():
+            async for index, result in usps_service.iter_verify_addresses(addresses, max(concurrency, 1)):
+                yield json.dumps({"index": index, "result": result}) + "\n"
+        
+        return StreamingResponse(result_lines(), media_type="application/x-ndjson")
+    
+    try:
+        return await usps_service.verify_addresses(addresses, max(concurrency, 1))
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/v1/usps/pricing")
 async def get_pricing(request: PricingRequest):
     """Get shipping pricing for different service types"""
@@ -602,29 +875,72 @@ async def find_locations(zip_code: str, radius: int = 10):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/v1/usps/recipients")
+async def list_recipients(category: Optional[str] = None):
+    """Canonical, pre-verified dispute recipients that letters can reference by id"""
+    return {
+        'version': usps_service.recipients.version,
+        'recipients': usps_service.recipients.list(category)
+    }
+
 @app.post("/api/v1/usps/labels")
-async def create_label(request: LabelCreationRequest):
+async def create_label(
+    request: LabelCreationRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """Create shipping label with tracking"""
+    async def create():
+        try:
+            label_request = USPSLabelRequest(
+                fromAddress=request.fromAddress,
+                toAddress=request.toAddress,
+                weight=request.weight,
+                mailClass=request.mailClass,
+                specialServices=request.specialServices,
+                customerReference=request.customerReference
+            )
+            
+            result = await usps_service.create_label(label_request)
+            return result
+            
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    return await run_idempotent("usps.labels", idempotency_key, request.dict(), response, create)
+
+@app.get("/api/v1/usps/labels/{tracking_number}/pdf")
+async def download_label(tracking_number: str, range_header: Optional[str] = Header(None, alias="Range")):
+    """Stored label PDF (fetched from USPS at most once); supports Range requests"""
+    if usps_service.label_store is None:
+        raise HTTPException(status_code=404, detail="Label store is disabled")
+    
     try:
-        label_request = USPSLabelRequest(
-            fromAddress=request.fromAddress,
-            toAddress=request.toAddress,
-            weight=request.weight,
-            mailClass=request.mailClass,
-            specialServices=request.specialServices,
-            customerReference=request.customerReference
-        )
-        
-        result = await usps_service.create_label(label_request)
-        return result
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        await ensure_label_stored(tracking_number)
+        path = usps_service.label_store.label_path(tracking_number)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LabelNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    return pdf_response(path, None, f"{tracking_number}.pdf", range_header)
+
+@app.post("/api/v1/usps/labels/print")
+async def print_labels(request: LabelPrintRequest, range_header: Optional[str] = Header(None, alias="Range")):
+    """Multi-label print PDF for a list of tracking numbers"""
+    if not request.trackingNumbers:
+        raise HTTPException(status_code=422, detail="At least one tracking number is required")
+    return await print_labels_response(request.trackingNumbers, "labels.pdf", range_header)
 
 @app.get("/api/v1/usps/tracking/{tracking_number}")
-async def track_package(tracking_number: str):
-    """Track a package using tracking number"""
+async def track_package(tracking_number: str, refresh: bool = False):
+    """Track a package; dispute letters are served from stored tracking state unless refresh=true"""
     try:
+        if not refresh:
+            stored = await tracking_refresher.get_stored(tracking_number)
+            if stored is not None:
+                return stored
+        
         result = await usps_service.track_package(tracking_number)
         return result
         
@@ -632,28 +948,130 @@ async def track_package(tracking_number: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/v1/usps/dispute-letters")
-async def send_dispute_letter(request: DisputeMailRequest):
+async def send_dispute_letter(
+    request: DisputeMailRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """Send dispute letter via USPS with tracking"""
-    try:
-        dispute_request = USPSDisputeMailRequest(
-            clientId=request.clientId,
-            disputeId=request.disputeId,
-            recipientAddress=request.recipientAddress,
-            letterType=request.letterType,
-            specialServices=request.specialServices
+    check_recipient(request.recipientAddress, request.recipientId)
+    
+    async def send():
+        try:
+            dispute_request = USPSDisputeMailRequest(
+                clientId=request.clientId,
+                disputeId=request.disputeId,
+                recipientAddress=request.recipientAddress,
+                recipientId=request.recipientId,
+                letterType=request.letterType,
+                specialServices=request.specialServices,
+                pageCount=request.pageCount
+            )
+            
+            result = await usps_service.send_dispute_letter(dispute_request)
+            return result
+            
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    return await run_idempotent("usps.dispute_letters", idempotency_key, request.dict(), response, send)
+
+@app.post("/api/v1/usps/dispute-letters/quote")
+async def quote_dispute_letters(request: PostageQuoteRequest):
+    """Quote postage for a batch of dispute letters from the local rate tables"""
+    result = usps_service.quote_dispute_letters([item.dict() for item in request.items])
+    if not result['success']:
+        raise HTTPException(status_code=422, detail=result['error'])
+    return result
+
+@app.post("/api/v1/usps/mailing-jobs", status_code=status.HTTP_202_ACCEPTED)
+async def create_mailing_job(
+    request: MailingJobRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """Start a bulk dispute-letter mailing job; poll its progress with GET"""
+    if not request.items:
+        raise HTTPException(status_code=422, detail="At least one letter is required")
+    
+    if len(request.items) > USPS_MAILING_JOB_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A mailing job is limited to {USPS_MAILING_JOB_MAX_ITEMS} letters"
         )
-        
-        result = await usps_service.send_dispute_letter(dispute_request)
-        return result
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    
+    for item in request.items:
+        check_recipient(item.recipientAddress, item.recipientId)
+    
+    concurrency = min(request.concurrency or mailing_jobs.default_concurrency, USPS_BATCH_MAX_CONCURRENCY)
+    
+    async def create():
+        return await mailing_jobs.create_job(
+            [item.dict() for item in request.items],
+            concurrency=max(concurrency, 1),
+            verify_addresses=request.verifyAddresses,
+            consolidate=request.consolidate
+        )
+    
+    return await run_idempotent("usps.mailing_jobs", idempotency_key, request.dict(), response, create)
+
+@app.get("/api/v1/usps/mailing-jobs/{job_id}")
+async def get_mailing_job(job_id: str):
+    """Progress of a mailing job"""
+    progress = await mailing_jobs.get_progress(job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Mailing job not found")
+    return progress
+
+@app.get("/api/v1/usps/mailing-jobs/{job_id}/items")
+async def get_mailing_job_items(job_id: str, status: Optional[str] = None):
+    """Per-letter status of a mailing job (e.g. status=failed)"""
+    try:
+        return await mailing_jobs.get_items(job_id, status)
+    except MailingJobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/api/v1/usps/mailing-jobs/{job_id}/labels")
+async def print_mailing_job_labels(job_id: str, range_header: Optional[str] = Header(None, alias="Range")):
+    """Print PDF with one label per envelope mailed by the job"""
+    try:
+        items = await mailing_jobs.get_items(job_id)
+    except MailingJobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    tracking_numbers = list(dict.fromkeys(item['trackingNumber'] for item in items if item['trackingNumber']))
+    if not tracking_numbers:
+        raise HTTPException(status_code=404, detail="No labels have been created for this job")
+    
+    return await print_labels_response(tracking_numbers, f"mailing-job-{job_id}-labels.pdf", range_header)
+
+@app.post("/api/v1/usps/mailing-jobs/{job_id}/resume", status_code=status.HTTP_202_ACCEPTED)
+async def resume_mailing_job(job_id: str, force: bool = False):
+    """Retry letters that were not sent; force also retries unconfirmed labels"""
+    try:
+        return await mailing_jobs.resume_job(job_id, force=force)
+    except MailingJobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except MailingJobRunningError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/api/v1/usps/mailing-jobs/{job_id}/cancel")
+async def cancel_mailing_job(job_id: str, response: Response):
+    """Stop a running mailing job (202 while another worker is still stopping it)"""
+    try:
+        progress = await mailing_jobs.cancel_job(job_id)
+    except MailingJobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if progress['cancelRequested']:
+        response.status_code = status.HTTP_202_ACCEPTED
+    return progress
 
 @app.get("/api/v1/usps/health")
 async def usps_health():
     """Check USPS service health"""
     try:
         result = await usps_service.health_check()
+        result['trackingRefresher'] = tracking_refresher.stats()
         return result
         
     except Exception as e:
@@ -671,7 +1089,8 @@ async def stripe_health():
             }
         
         # Test Stripe connection
-        account = stripe.Account.retrieve()
+        with external_call('stripe', 'account.retrieve'):
+            account = stripe.Account.retrieve()
         
         return {
             "healthy": True,
@@ -755,7 +1174,8 @@ async def create_customer(request: CreateCustomerRequest):
         if request.address:
             customer_data["address"] = request.address
             
-        customer = stripe.Customer.create(**customer_data)
+        with external_call('stripe', 'customer.create'):
+            customer = stripe.Customer.create(**customer_data)
         
         return {
             "success": True,
@@ -770,61 +1190,80 @@ async def create_customer(request: CreateCustomerRequest):
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/api/v1/stripe/payment-intent")
-async def create_payment_intent(request: PaymentIntentRequest):
+async def create_payment_intent(
+    request: PaymentIntentRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """Create a payment intent for one-time payments"""
-    try:
-        intent_data = {
-            "amount": request.amount,
-            "currency": request.currency,
-            "automatic_payment_methods": {"enabled": True}
-        }
-        
-        if request.customer_id:
-            intent_data["customer"] = request.customer_id
+    async def create():
+        try:
+            intent_data = {
+                "amount": request.amount,
+                "currency": request.currency,
+                "automatic_payment_methods": {"enabled": True}
+            }
             
-        if request.description:
-            intent_data["description"] = request.description
+            if request.customer_id:
+                intent_data["customer"] = request.customer_id
+                
+            if request.description:
+                intent_data["description"] = request.description
+                
+            # Forward the key so Stripe also deduplicates on its side
+            with external_call('stripe', 'payment_intent.create'):
+                intent = stripe.PaymentIntent.create(idempotency_key=idempotency_key, **intent_data)
             
-        intent = stripe.PaymentIntent.create(**intent_data)
-        
-        return {
-            "success": True,
-            "client_secret": intent.client_secret,
-            "payment_intent_id": intent.id
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+            return {
+                "success": True,
+                "client_secret": intent.client_secret,
+                "payment_intent_id": intent.id
+            }
+            
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    return await run_idempotent("stripe.payment_intent", idempotency_key, request.dict(), response, create)
 
 @app.post("/api/v1/stripe/subscriptions")
-async def create_subscription(request: CreateSubscriptionRequest):
+async def create_subscription(
+    request: CreateSubscriptionRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """Create a new subscription"""
-    try:
-        subscription = stripe.Subscription.create(
-            customer=request.customer_id,
-            items=[{"price": request.price_id}],
-            default_payment_method=request.payment_method_id,
-            expand=["latest_invoice.payment_intent"]
-        )
-        
-        return {
-            "success": True,
-            "subscription": {
-                "id": subscription.id,
-                "status": subscription.status,
-                "current_period_start": subscription.current_period_start,
-                "current_period_end": subscription.current_period_end
+    async def create():
+        try:
+            with external_call('stripe', 'subscription.create'):
+                subscription = stripe.Subscription.create(
+                    customer=request.customer_id,
+                    items=[{"price": request.price_id}],
+                    default_payment_method=request.payment_method_id,
+                    expand=["latest_invoice.payment_intent"],
+                    idempotency_key=idempotency_key
+                )
+            
+            return {
+                "success": True,
+                "subscription": {
+                    "id": subscription.id,
+                    "status": subscription.status,
+                    "current_period_start": subscription.current_period_start,
+                    "current_period_end": subscription.current_period_end
+                }
             }
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+            
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    return await run_idempotent("stripe.subscriptions", idempotency_key, request.dict(), response, create)
 
 @app.get("/api/v1/stripe/customers/{customer_id}/subscriptions")
 async def get_customer_subscriptions(customer_id: str):
     """Get all subscriptions for a customer"""
     try:
-        subscriptions = stripe.Subscription.list(customer=customer_id)
+        with external_call('stripe', 'subscription.list'):
+            subscriptions = stripe.Subscription.list(customer=customer_id)
         
         return {
             "success": True,
@@ -844,10 +1283,11 @@ async def get_customer_subscriptions(customer_id: str):
 async def cancel_subscription(subscription_id: str):
     """Cancel a subscription"""
     try:
-        subscription = stripe.Subscription.modify(
-            subscription_id,
-            cancel_at_period_end=True
-        )
+        with external_call('stripe', 'subscription.modify'):
+            subscription = stripe.Subscription.modify(
+                subscription_id,
+                cancel_at_period_end=True
+            )
         
         return {
             "success": True,
@@ -34,6 +34,9 @@ class APITester:
         self.base_url = base_url
         self.session = requests.Session()
         self.test_results = []
+        # True when the API is wired to the local USPS stand-in (usps_standin.py),
+        # so USPS calls must actually succeed
+        self.usps_standin = False
         
     def log_test(self, test_name: str, success: bool, details: str = ""):
         """Log test results"""
@@ -69,7 +72,11 @@ class APITester:
                 data = response.json()
                 healthy = data.get('healthy', False)
                 message = data.get('message', 'No message')
-                self.log_test("USPS Health Check", True, f"Healthy: {healthy}, Message: {message}")
+                self.usps_standin = data.get('environment') == 'standin'
+                if self.usps_standin and not healthy:
+                    self.log_test("USPS Health Check", False, f"Stand-in not healthy: {message}")
+                else:
+                    self.log_test("USPS Health Check", True, f"Healthy: {healthy}, Message: {message}")
             else:
                 self.log_test("USPS Health Check", False, f"Status code: {response.status_code}")
         except Exception as e:
@@ -197,7 +204,11 @@ class APITester:
                 f"{self.base_url}/api/{API_VERSION}/usps/address/verify",
                 json=test_address
             )
-            if response.status_code == 200:
+            if response.status_code == 200 and self.usps_standin:
+                data = response.json()
+                verified = data.get('success') and data.get('verified') and data.get('standardizedAddress')
+                self.log_test("USPS Address Verification", bool(verified), f"Stand-in verification: {data}")
+            elif response.status_code == 200:
                 self.log_test("USPS Address Verification", True, "Address verification endpoint responding")
             else:
                 data = response.json() if response.headers.get('content-type') == 'application/json' else {}
@@ -217,7 +228,10 @@ class APITester:
                 f"{self.base_url}/api/{API_VERSION}/usps/pricing",
                 json=pricing_request
             )
-            if response.status_code == 200:
+            if response.status_code == 200 and self.usps_standin:
+                data = response.json()
+                self.log_test("USPS Pricing", bool(data.get('success') and data.get('pricing')), f"Stand-in pricing: {data}")
+            elif response.status_code == 200:
                 self.log_test("USPS Pricing", True, "Pricing endpoint responding")
             else:
                 data = response.json() if response.headers.get('content-type') == 'application/json' else {}
@@ -18,6 +18,9 @@ class DisputeWorkflowTester:
         self.client_id = None
         self.dispute_id = None
         self.letter_id = None
+        # True when the API is wired to the local USPS stand-in (usps_standin.py),
+        # so mailing must actually succeed
+        self.usps_standin = False
         
     def log_test(self, test_name, passed, details=""):
         """Log test result"""
@@ -226,25 +229,35 @@ Test Client
             "clientId": self.client_id,
             "disputeId": self.dispute_id,
             "recipientAddress": {
-                "name": "Experian Consumer Assistance",
-                "address1": "P.O. Box 4500",
-                "city": "Allen",
+                "streetAddress": "P.O. Box 4500",
+                "cityName": "Allen",
                 "state": "TX",
-                "zip": "75013"
+                "zipCode": "75013"
             },
             "letterType": "dispute_letter",
-            "specialServices": ["certified_mail", "return_receipt"]
+            "specialServices": ["CERTIFIED_MAIL", "RETURN_RECEIPT"]
         }
         
         try:
+            health = self.session.get(f"{self.base_url}/api/v1/usps/health")
+            if health.status_code == 200:
+                self.usps_standin = health.json().get('environment') == 'standin'
+            
             response = self.session.post(
                 f"{self.base_url}/api/v1/usps/dispute-letters",
                 json=mail_request
             )
             
-            if response.status_code == 200:
+            if self.usps_standin:
+                # The stand-in accepts any credentials, so anything but a label is a failure
+                mail_data = response.json() if response.status_code == 200 else {}
+                tracking_number = mail_data.get('trackingNumber')
+                passed = bool(mail_data.get('success') and tracking_number and mail_data.get('labelSha256'))
+                self.log_test("USPS Mailing", passed, f"Stand-in mailing: {response.status_code}, Tracking: {tracking_number}")
+                return passed
+            elif response.status_code == 200:
                 mail_data = response.json()
-                tracking_number = mail_data.get('tracking_number', 'N/A')
+                tracking_number = mail_data.get('trackingNumber', 'N/A')
                 self.log_test("USPS Mailing", True, f"Mail sent, Tracking: {tracking_number}")
                 return True
             else:
@@ -207,10 +207,9 @@ class MonitoringSystemTest:
                 )
                 return False
             
-            monitor = HealthMonitor()
-            
-            # Run health checks
-            health_report = await monitor.run_all_checks()
+            # Run health checks (closing the monitor's HTTP session afterwards)
+            async with HealthMonitor() as monitor:
+                health_report = await monitor.run_all_checks()
             
             if not health_report:
                 self.log_test_result(
@@ -418,7 +417,7 @@ class MonitoringSystemTest:
             )
             return False
     
-    def test_report_generation(self) -> bool:
+    async def test_report_generation(self) -> bool:
         """Test report generation and file operations"""
         try:
             if HealthMonitor is None:
@@ -441,7 +440,7 @@ class MonitoringSystemTest:
             }
             
             # Save report
-            report_file = monitor.save_report(mock_report, 'test_monitoring_report.json')
+            report_file = await monitor.save_report(mock_report, 'test_monitoring_report.json')
             
             # Verify file was created
             report_path = Path(report_file)
@@ -0,0 +1,75 @@
+"""
+Rick Jefferson Solutions - Backend Unit Test Configuration
+Shared fixtures for the backend unit tests (no live services required)
+
+The backend modules import each other by module name, so the backend
+directory (and the monitoring directory after it) is put on sys.path.
+Redis is disabled unless a test installs a fake client.
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import os
+import sys
+
+import pytest
+import pytest_asyncio
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+MONITORING_DIR = os.path.join(BACKEND_DIR, 'monitoring')
+if MONITORING_DIR not in sys.path:
+    sys.path.append(MONITORING_DIR)
+
+
+@pytest.fixture(autouse=True)
+def no_shared_redis(monkeypatch):
+    """Keep tests on process-local state"""
+    import redis_client
+    monkeypatch.delenv('REDIS_URL', raising=False)
+    monkeypatch.setattr(redis_client, '_client', None)
+
+
+@pytest.fixture
+def usps_env(monkeypatch, tmp_path):
+    """USPSService settings for the in-process USPS stand-in"""
+    for name, value in {
+        'USPS_BASE_URL': 'http://usps-standin',
+        'USPS_ENVIRONMENT': 'standin',
+        'USPS_CONSUMER_KEY': 'standin',
+        'USPS_CONSUMER_SECRET': 'standin',
+        'USPS_ADDRESS_CACHE_PERSISTENT': 'false',
+        'USPS_LABEL_STORE_DIR': str(tmp_path / 'labels'),
+        'USPS_LOCATIONS_FILE': str(tmp_path / 'usps_locations.json'),
+        'USPS_LOCATIONS_REFRESH_HOURS': '0',
+        'USPS_TRACKING_REFRESH_ENABLED': 'false',
+        'USPS_QUOTA_PER_HOUR': '0',
+        'MAILING_JOB_STORE': 'memory'
+    }.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.delenv('WEB_CONCURRENCY', raising=False)
+    return tmp_path
+
+
+@pytest_asyncio.fixture
+async def standin_service(usps_env):
+    """
+    USPSService talking to usps_standin through an in-process ASGI transport.
+
+    Yields (service, standin_app); fault profiles can be changed through
+    PUT /__standin/profile on the service's client.
+    """
+    import httpx
+    from usps_standin import create_standin_app
+    from usps_service import USPSService
+
+    app = create_standin_app()
+    service = USPSService()
+    service._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), timeout=service.http_timeout)
+    try:
+        yield service, app
+    finally:
+        await service.close()
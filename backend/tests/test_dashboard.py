@@ -0,0 +1,85 @@
+"""
+Rick Jefferson Solutions - Monitoring Dashboard Tests
+Closing the health monitor's HTTP session on every exit path
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def dashboard(monkeypatch, tmp_path):
+    # The monitoring modules' logging setup opens log files in the working directory
+    monkeypatch.chdir(tmp_path)
+    import dashboard as dashboard_module
+    monkeypatch.setattr(dashboard_module.history_store, 'load_into', lambda store, since: 0)
+    dashboard = dashboard_module.MonitoringDashboard()
+    monkeypatch.setattr(dashboard.health_monitor, 'start', lambda: None)
+
+    async def live_start():
+        pass
+
+    async def live_stop():
+        pass
+
+    monkeypatch.setattr(dashboard.live, 'start', live_start)
+    monkeypatch.setattr(dashboard.live, 'stop', live_stop)
+    return dashboard
+
+
+def open_session_cycle(dashboard, sessions):
+    async def run_monitoring_cycle():
+        sessions.append(dashboard.health_monitor._get_session())
+        return {}
+    return run_monitoring_cycle
+
+
+@pytest.mark.asyncio
+async def test_stopping_continuous_monitoring_closes_the_session(dashboard):
+    sessions = []
+    dashboard.run_monitoring_cycle = open_session_cycle(dashboard, sessions)
+
+    task = asyncio.create_task(dashboard.run_continuous_monitoring(interval_minutes=60))
+    while not sessions:
+        await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert sessions[0].closed
+
+
+@pytest.mark.asyncio
+async def test_session_is_closed_when_the_live_dashboard_fails(dashboard, monkeypatch):
+    sessions = []
+    dashboard.run_monitoring_cycle = open_session_cycle(dashboard, sessions)
+
+    async def failing_stop():
+        raise RuntimeError('runner cleanup failed')
+
+    monkeypatch.setattr(dashboard.live, 'stop', failing_stop)
+    task = asyncio.create_task(dashboard.run_continuous_monitoring(interval_minutes=60))
+    while not sessions:
+        await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(RuntimeError):
+        await task
+
+    assert sessions[0].closed
+
+
+@pytest.mark.asyncio
+async def test_single_run_closes_the_session(dashboard, monkeypatch, capsys):
+    import dashboard as dashboard_module
+    sessions = []
+    dashboard.run_monitoring_cycle = open_session_cycle(dashboard, sessions)
+    monkeypatch.setattr(dashboard_module, 'MonitoringDashboard', lambda: dashboard)
+
+    await dashboard_module.main()
+
+    assert sessions[0].closed
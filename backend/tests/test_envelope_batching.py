@@ -0,0 +1,66 @@
+"""
+Rick Jefferson Solutions - Envelope Batching Tests
+Grouping letters by client, recipient and services within the window and weight limit
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+from datetime import datetime, timedelta
+
+from envelope_batching import envelope_letter_types, envelope_weight_oz, group_envelopes
+
+CREATED = datetime(2024, 6, 3, 9, 0)
+RECIPIENT = {'streetAddress': '100 Main St', 'cityName': 'Dallas', 'state': 'TX', 'zipCode': '75201'}
+
+
+def letter(number: int, client_id: str = 'client-1', hours: float = 0, pages: int = 1,
+           letter_type: str = 'initial', address: dict = RECIPIENT) -> dict:
+    return {
+        'id': f"letter-{number}",
+        'client_id': client_id,
+        'recipient_address': address,
+        'special_services': None,
+        'page_count': pages,
+        'letter_type': letter_type,
+        'created_at': CREATED + timedelta(hours=hours)
+    }
+
+
+def ids(envelopes):
+    return [[item['id'] for item in envelope] for envelope in envelopes]
+
+
+def test_same_client_and_recipient_share_an_envelope():
+    other_address = {**RECIPIENT, 'streetAddress': '200 Elm St'}
+    letters = [letter(1), letter(2, client_id='client-2'), letter(3), letter(4, address=other_address)]
+
+    assert ids(group_envelopes(letters)) == [['letter-1', 'letter-3'], ['letter-2'], ['letter-4']]
+
+
+def test_address_formatting_does_not_split_envelopes():
+    shouting = {key: value.upper() for key, value in RECIPIENT.items()}
+
+    assert ids(group_envelopes([letter(1), letter(2, address=shouting)])) == [['letter-1', 'letter-2']]
+
+
+def test_letters_outside_the_window_open_a_new_envelope():
+    letters = [letter(1), letter(2, hours=23), letter(3, hours=25)]
+
+    assert ids(group_envelopes(letters, window_hours=24)) == [['letter-1', 'letter-2'], ['letter-3']]
+
+
+def test_envelope_closes_before_the_weight_limit():
+    letters = [letter(1, pages=30), letter(2, pages=30), letter(3, pages=30)]
+
+    envelopes = group_envelopes(letters, max_weight_oz=13)
+
+    assert ids(envelopes) == [['letter-1', 'letter-2'], ['letter-3']]
+    assert all(envelope_weight_oz(envelope) <= 13 for envelope in envelopes)
+
+
+def test_every_letter_type_is_listed_once():
+    letters = [letter(1), letter(2, letter_type='follow_up'), letter(3)]
+
+    assert envelope_letter_types(letters) == ['initial', 'follow_up']
@@ -0,0 +1,142 @@
+"""
+Rick Jefferson Solutions - Health Check Tests
+Resource sampler lifecycle, the cycle deadline, and keeping psutil and SQLite off the event loop
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import time
+import asyncio
+import threading
+
+import pytest
+
+
+class FakeSampler:
+    """Resource sampler that records the thread each sample ran on"""
+
+    def __init__(self, snapshot=None):
+        self._snapshot = snapshot
+        self.running = False
+        self.sample_threads = []
+
+    def start(self):
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+    def snapshot(self):
+        return self._snapshot
+
+    def sample(self):
+        self.sample_threads.append(threading.current_thread())
+        latest = {
+            'timestamp': '2024-06-03T09:00:00+00:00', 'cpu_percent': 12.0, 'memory_percent': 40.0,
+            'memory_available_gb': 8.0, 'disk_percent': 50.0, 'disk_free_gb': 100.0,
+            'net_sent_kbps': 1.0, 'net_recv_kbps': 2.0, 'processes': []
+        }
+        window = {
+            metric: {'p50': latest[metric], 'p95': latest[metric], 'p99': latest[metric], 'max': latest[metric]}
+            for metric in ('cpu_percent', 'memory_percent', 'disk_percent', 'net_sent_kbps', 'net_recv_kbps')
+        }
+        self._snapshot = {'latest': latest, 'window': window, 'window_seconds': 5, 'samples': 1}
+        return self._snapshot
+
+
+@pytest.fixture
+def health_checks(monkeypatch, tmp_path):
+    # The module's logging setup opens health_monitoring.log in the working directory
+    monkeypatch.chdir(tmp_path)
+    import health_checks
+    sampler = FakeSampler()
+    monkeypatch.setattr(health_checks, 'resource_sampler', sampler)
+    return health_checks
+
+
+def test_creating_a_monitor_does_not_start_the_sampler(health_checks):
+    health_checks.HealthMonitor()
+
+    assert not health_checks.resource_sampler.running
+
+
+@pytest.mark.asyncio
+async def test_sampler_runs_for_the_monitor_lifetime(health_checks):
+    async with health_checks.HealthMonitor():
+        assert health_checks.resource_sampler.running
+
+    assert not health_checks.resource_sampler.running
+
+
+@pytest.mark.asyncio
+async def test_first_sample_is_taken_off_the_event_loop(health_checks):
+    monitor = health_checks.HealthMonitor()
+
+    result = await monitor.check_system_resources()
+    assert result['status'] == 'healthy'
+    assert result['details']['cpu_percent'] == 12.0
+
+    # Later checks read the published snapshot without sampling
+    await monitor.check_system_resources()
+    assert len(health_checks.resource_sampler.sample_threads) == 1
+    assert health_checks.resource_sampler.sample_threads[0] is not threading.main_thread()
+
+
+@pytest.mark.asyncio
+async def test_report_is_stored_off_the_event_loop(health_checks, monkeypatch):
+    threads = []
+
+    def append_report(report):
+        threads.append(threading.current_thread())
+        return 1_717_200_000
+
+    monkeypatch.setattr(health_checks.history_store, 'append_report', append_report)
+
+    location = await health_checks.HealthMonitor().save_report({'overall_status': 'healthy'})
+
+    assert location.endswith('(report 1717200000)')
+    assert threads and threads[0] is not threading.main_thread()
+
+
+@pytest.mark.asyncio
+async def test_hanging_check_times_out_at_the_cycle_deadline(health_checks, monkeypatch):
+    monitor = health_checks.HealthMonitor()
+    monitor.cycle_deadline = 0.2
+    cancelled = []
+
+    def healthy(service):
+        async def check():
+            return {'service': service, 'status': 'healthy', 'response_time_ms': 1.0}
+        return check
+
+    async def hanging_check():
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.append('Database')
+            raise
+
+    async def no_route_latency():
+        return None
+
+    for method, service in [('check_api_health', 'API Health'), ('check_stripe_integration', 'Stripe Integration'),
+                            ('check_auth_system', 'Authentication System'),
+                            ('check_frontend_health', 'Frontend (Angular)')]:
+        monkeypatch.setattr(monitor, method, healthy(service))
+    monkeypatch.setattr(monitor, 'check_database_health', hanging_check)
+    monkeypatch.setattr(monitor, 'fetch_route_latency', no_route_latency)
+
+    started = time.monotonic()
+    report = await asyncio.wait_for(monitor.run_all_checks(), timeout=2)
+    elapsed = time.monotonic() - started
+
+    assert 0.2 <= elapsed < 1.0
+    checks = {check['service']: check for check in report['checks']}
+    assert checks['Database']['status'] == 'timeout'
+    assert checks['Database']['error'] == 'No response within 0.2s'
+    assert checks['API Health']['status'] == 'healthy'
+    assert report['summary']['database_status'] == 'timeout'
+    await asyncio.sleep(0)
+    assert cancelled == ['Database']
@@ -0,0 +1,68 @@
+"""
+Rick Jefferson Solutions - Monitoring History Store Tests
+Samples, hourly rollups and re-appended reports in SQLite
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import time
+
+import pytest
+
+from history_store import HistoryStore
+from timeseries import TimeSeriesStore
+
+# An hour boundary a day ago, well within retention
+T0 = int(time.time()) // 3600 * 3600 - 86400
+
+
+def report(response_time_ms: float, status: str = 'healthy') -> dict:
+    return {
+        'overall_status': status,
+        'health_percentage': 100.0 if status == 'healthy' else 0.0,
+        'checks': [{'service': 'API Health', 'status': status, 'response_time_ms': response_time_ms}]
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(f"sqlite:///{tmp_path / 'monitoring.db'}")
+    yield store
+    store.close()
+
+
+def test_rollups_aggregate_samples_per_hour(store):
+    for index, response_time in enumerate([10.0, 20.0, 30.0]):
+        store.append_report(report(response_time), T0 + index * 300)
+    store.append_report(report(50.0), T0 + 3600)
+
+    raw = store.query('API Health.response_time_ms', T0, resolution='raw')
+    assert [point['mean'] for point in raw] == [10.0, 20.0, 30.0, 50.0]
+
+    hourly = store.query('API Health.response_time_ms', T0, resolution='1h')
+    assert hourly == [
+        {'timestamp': T0, 'mean': 20.0, 'min': 10.0, 'max': 30.0, 'count': 3},
+        {'timestamp': T0 + 3600, 'mean': 50.0, 'min': 50.0, 'max': 50.0, 'count': 1}
+    ]
+
+
+def test_reappending_the_same_second_counts_each_sample_once(store):
+    store.append_report(report(10.0), T0)
+    store.append_report(report(90.0, 'unhealthy'), T0 + 0.5)
+
+    hourly = store.query('API Health.response_time_ms', T0, resolution='1h')
+    assert hourly == [{'timestamp': T0, 'mean': 10.0, 'min': 10.0, 'max': 10.0, 'count': 1}]
+    assert store.query('API Health.response_time_ms', T0, resolution='raw')[0]['mean'] == 10.0
+    assert store.stats()['reports'] == 1
+    assert store.latest_report()['overall_status'] == 'unhealthy'
+
+
+def test_load_into_replays_raw_samples(store):
+    for index in range(3):
+        store.append_report(report(10.0 * index), T0 + index * 300)
+    history = TimeSeriesStore()
+
+    assert store.load_into(history, T0 + 300) == 6
+    assert history.latest('API Health.response_time_ms') == (T0 + 600, 20.0)
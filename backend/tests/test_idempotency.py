@@ -0,0 +1,189 @@
+"""
+Rick Jefferson Solutions - Idempotency Store Tests
+Replay, conflict and cross-worker behaviour of IdempotencyStore
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import asyncio
+
+import pytest
+
+import idempotency
+from idempotency import IdempotencyConflictError, IdempotencyInProgressError, IdempotencyStore
+from usps_service import USPSLabelRequest
+
+
+def counting_operation(result):
+    calls = []
+
+    async def operation():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return result
+
+    return operation, calls
+
+
+@pytest.mark.asyncio
+async def test_retry_replays_stored_result():
+    store = IdempotencyStore()
+    operation, calls = counting_operation({'success': True, 'id': 'pi_1'})
+
+    first = await store.run('stripe.payment_intent', 'key-1', {'amount': 100}, operation)
+    second = await store.run('stripe.payment_intent', 'key-1', {'amount': 100}, operation)
+
+    assert first == ({'success': True, 'id': 'pi_1'}, False)
+    assert second == ({'success': True, 'id': 'pi_1'}, True)
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_wait_for_first_request():
+    store = IdempotencyStore()
+    operation, calls = counting_operation({'success': True})
+
+    results = await asyncio.gather(*[
+        store.run('usps.labels', 'key-2', {'zip': '75201'}, operation) for _ in range(5)
+    ])
+
+    assert len(calls) == 1
+    assert sorted(replayed for _, replayed in results) == [False, True, True, True, True]
+    assert store.stats['waited'] == 4
+
+
+@pytest.mark.asyncio
+async def test_key_reused_with_different_payload_conflicts():
+    store = IdempotencyStore()
+    operation, _ = counting_operation({'success': True})
+
+    await store.run('usps.labels', 'key-3', {'zip': '75201'}, operation)
+    with pytest.raises(IdempotencyConflictError):
+        await store.run('usps.labels', 'key-3', {'zip': '10001'}, operation)
+
+
+@pytest.mark.asyncio
+async def test_failures_are_not_replayed():
+    store = IdempotencyStore()
+    operation, calls = counting_operation({'success': False, 'error': 'USPS unavailable'})
+
+    await store.run('usps.labels', 'key-4', {}, operation)
+    _, replayed = await store.run('usps.labels', 'key-4', {}, operation)
+
+    assert replayed is False
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_ambiguous_failures_are_replayed():
+    store = IdempotencyStore()
+    operation, calls = counting_operation({'success': False, 'error': 'timed out', 'outcomeUnknown': True})
+
+    await store.run('usps.labels', 'key-8', {}, operation)
+    result, replayed = await store.run('usps.labels', 'key-8', {}, operation)
+
+    assert replayed is True
+    assert result['outcomeUnknown'] is True
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_retry_after_ambiguous_label_failure_does_not_call_usps(standin_service):
+    service, _ = standin_service
+    store = IdempotencyStore()
+    response = await service._get_client().put(
+        f"{service.base_url}/__standin/profile", json={'labels': {'errorRate': 1.0}}
+    )
+    response.raise_for_status()
+    request = {
+        'fromAddress': {'streetAddress': '100 Main St', 'cityName': 'Dallas', 'state': 'TX', 'zipCode': '75201'},
+        'toAddress': {'streetAddress': '1 Broadway', 'cityName': 'New York', 'state': 'NY', 'zipCode': '10004'},
+        'weight': 0.5
+    }
+
+    async def create():
+        return await service.create_label(USPSLabelRequest(**request))
+
+    first, _ = await store.run('usps.labels', 'key-9', request, create)
+    # USPS recovers, but the first request may already have bought the label
+    await service._get_client().put(f"{service.base_url}/__standin/profile", json={'labels': {'errorRate': 0.0}})
+    retry, replayed = await store.run('usps.labels', 'key-9', request, create)
+
+    stats = (await service._get_client().get(f"{service.base_url}/__standin/stats")).json()
+    assert first['outcomeUnknown'] is True
+    assert (retry, replayed) == (first, True)
+    assert stats['families']['labels']['requests'] == 1
+
+
+@pytest.mark.asyncio
+async def test_exception_releases_key():
+    store = IdempotencyStore()
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError('boom')
+        return {'success': True}
+
+    with pytest.raises(RuntimeError):
+        await store.run('usps.labels', 'key-5', {}, flaky)
+    assert await store.run('usps.labels', 'key-5', {}, flaky) == ({'success': True}, False)
+
+
+@pytest.mark.asyncio
+async def test_requests_without_key_always_run():
+    store = IdempotencyStore()
+    operation, calls = counting_operation({'success': True})
+
+    await store.run('usps.labels', None, {}, operation)
+    await store.run('usps.labels', None, {}, operation)
+
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_shared_result_from_other_worker_is_replayed(monkeypatch):
+    fakeredis = pytest.importorskip('fakeredis')
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(idempotency, 'get_redis', lambda: redis)
+
+    operation, calls = counting_operation({'success': True, 'id': 'label-1'})
+    worker_a, worker_b = IdempotencyStore(), IdempotencyStore()
+
+    await worker_a.run('usps.labels', 'key-6', {'zip': '75201'}, operation)
+    result, replayed = await worker_b.run('usps.labels', 'key-6', {'zip': '75201'}, operation)
+
+    assert (result, replayed) == ({'success': True, 'id': 'label-1'}, True)
+    assert len(calls) == 1
+
+
+class VanishingKeyRedis:
+    """Redis whose key always expires between SET NX and GET"""
+
+    def __init__(self):
+        self.gets = 0
+
+    async def set(self, *args, **kwargs):
+        return False
+
+    async def get(self, key):
+        self.gets += 1
+        return None
+
+
+@pytest.mark.asyncio
+async def test_vanishing_shared_key_backs_off_until_deadline(monkeypatch):
+    redis = VanishingKeyRedis()
+    monkeypatch.setattr(idempotency, 'get_redis', lambda: redis)
+    store = IdempotencyStore(wait_timeout_seconds=0.3)
+    operation, calls = counting_operation({'success': True})
+
+    with pytest.raises(IdempotencyInProgressError):
+        await store.run('usps.labels', 'key-7', {}, operation)
+
+    # Polled at poll_interval_seconds, not in a tight loop
+    assert redis.gets <= 0.3 / store.poll_interval_seconds + 2
+    assert calls == []
@@ -0,0 +1,85 @@
+"""
+Rick Jefferson Solutions - Label Store Tests
+Content-addressed label blobs, byte ranges and streamed multi-label PDFs
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import io
+
+import pytest
+
+from label_store import LabelNotFoundError, LabelStore, iter_merged_pdf, parse_range
+from usps_standin import label_pdf
+
+pypdf = pytest.importorskip('pypdf')
+
+
+def compressed_label(tracking_number: str) -> bytes:
+    """Stand-in label rewritten with a FlateDecode content stream"""
+    writer = pypdf.PdfWriter()
+    writer.add_page(pypdf.PdfReader(io.BytesIO(label_pdf(tracking_number))).pages[0])
+    writer.pages[0].compress_content_streams()
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LabelStore(tmp_path / 'labels')
+
+
+@pytest.mark.asyncio
+async def test_identical_labels_are_stored_once(store):
+    first = await store.put_bytes('9400111', label_pdf('9400111'))
+    again = await store.put_bytes('9400222', label_pdf('9400111'))
+
+    assert first == again
+    assert store.label_path('9400222') == store.blob_path(first)
+    assert store.stats_counters == {'stored': 1, 'deduplicated': 1}
+    with pytest.raises(LabelNotFoundError):
+        store.label_path('9400333')
+
+
+def test_parse_range():
+    assert parse_range(None, 1000) is None
+    assert parse_range('bytes=0-99', 1000) == (0, 99)
+    assert parse_range('bytes=900-', 1000) == (900, 999)
+    assert parse_range('bytes=-100', 1000) == (900, 999)
+
+
+def test_merged_pdf_keeps_every_page_and_stream(tmp_path):
+    numbers = ['9400111', '9400222', '9400333']
+    paths = []
+    for number, data in zip(numbers, [label_pdf(numbers[0]), compressed_label(numbers[1]), label_pdf(numbers[2])]):
+        path = tmp_path / f"{number}.pdf"
+        path.write_bytes(data)
+        paths.append(path)
+
+    merged = pypdf.PdfReader(io.BytesIO(b''.join(iter_merged_pdf(paths))), strict=True)
+
+    assert len(merged.pages) == 3
+    for page, number, path in zip(merged.pages, numbers, paths):
+        source = pypdf.PdfReader(str(path)).pages[0]
+        assert number in page.extract_text()
+        assert page.get_contents().get_data() == source.get_contents().get_data()
+        assert page.mediabox == source.mediabox
+    # The compressed label's stream is copied still encoded
+    assert merged.pages[1]['/Contents'].get_object()['/Filter'] == '/FlateDecode'
+
+
+@pytest.mark.asyncio
+async def test_print_file_is_cached_after_first_assembly(store):
+    for number in ('9400111', '9400222'):
+        await store.put_bytes(number, label_pdf(number))
+
+    path, chunks = store.iter_print_pdf(['9400111', '9400222'])
+    assert path is None
+    assembled = b''.join(chunks)
+
+    path, chunks = store.iter_print_pdf(['9400111', '9400222'])
+    assert path is not None
+    assert b''.join(chunks) == assembled
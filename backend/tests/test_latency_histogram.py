@@ -0,0 +1,132 @@
+"""
+Rick Jefferson Solutions - Route Latency Histogram Tests
+Bucket bounds, percentiles, window expiry and merging across workers
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import json
+
+import pytest
+
+import latency_histogram
+from latency_histogram import (
+    BUCKET_COUNT, LINEAR_LIMIT, MAX_MICROSECONDS, LatencyHistogram, RouteLatencyRecorder, bucket_bounds
+)
+
+
+class FakeClock:
+    """Stands in for the time module's perf_counter"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def perf_counter(self) -> float:
+        return self.now
+
+
+def recorded_bucket(microseconds: int) -> int:
+    histogram = LatencyHistogram()
+    histogram.record(microseconds / 1_000_000)
+    return next(index for index, count in enumerate(histogram.counts) if count)
+
+
+def test_buckets_are_contiguous_and_narrow():
+    assert bucket_bounds(0) == (0, 1)
+    assert bucket_bounds(LINEAR_LIMIT - 1) == (LINEAR_LIMIT - 1, LINEAR_LIMIT)
+    for index in range(1, BUCKET_COUNT):
+        low, high = bucket_bounds(index)
+        assert low == bucket_bounds(index - 1)[1]
+        if index >= LINEAR_LIMIT:
+            assert (high - low) / low <= 1 / 32
+    assert bucket_bounds(BUCKET_COUNT - 1)[1] == MAX_MICROSECONDS + 1
+
+
+@pytest.mark.parametrize('microseconds', [0, 1, 63, 64, 65, 1000, 12_345, 999_999, 10 ** 9, MAX_MICROSECONDS])
+def test_values_land_in_their_bucket(microseconds):
+    low, high = bucket_bounds(recorded_bucket(microseconds))
+
+    assert low <= microseconds < high
+
+
+def test_out_of_range_values_are_clamped():
+    assert recorded_bucket(-5) == 0
+    assert recorded_bucket(MAX_MICROSECONDS * 4) == BUCKET_COUNT - 1
+
+
+def test_percentiles_of_a_uniform_distribution():
+    histogram = LatencyHistogram()
+    for milliseconds in range(1, 1001):
+        histogram.record(milliseconds / 1000)
+
+    summary = histogram.summary()
+    assert summary['count'] == 1000
+    assert summary['maxMs'] == 1000.0
+    assert summary['meanMs'] == pytest.approx(500.5, rel=0.01)
+    for pct, expected in [(50, 500), (90, 900), (95, 950), (99, 990)]:
+        assert histogram.percentile(pct) == pytest.approx(expected, rel=1 / 32)
+    # Midpoints never report more than the slowest request
+    assert histogram.percentile(100) == 1000.0
+    assert LatencyHistogram().summary()['p99Ms'] == 0.0
+
+
+def test_slots_expire_from_the_window(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(latency_histogram, 'time', clock)
+    monkeypatch.setenv('LATENCY_SLOT_SECONDS', '60')
+    monkeypatch.setenv('LATENCY_WINDOW_SLOTS', '5')
+    recorder = RouteLatencyRecorder()
+
+    recorder.record('GET /api/v1/clients', 0.010, clock.now)
+    recorder.record('GET /api/v1/clients', 0.020, clock.now + 100)
+    clock.now += 100
+    assert recorder.window()['GET /api/v1/clients'].count == 2
+
+    # Five slots later the first slot has rotated out
+    clock.now = 1000 + 5 * 60
+    assert recorder.window()['GET /api/v1/clients'].count == 1
+
+    # A long idle gap empties the window
+    clock.now += 3600
+    assert recorder.window() == {}
+    recorder.record('GET /api/v1/clients', 0.030, clock.now)
+    assert recorder.window()['GET /api/v1/clients'].count == 1
+
+
+def test_to_dict_round_trip_merges_exactly():
+    first, second, combined = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for index in range(200):
+        seconds = (index % 37 + 1) / 1000
+        (first if index % 2 else second).record(seconds)
+        combined.record(seconds)
+    second.record(2.5)
+    combined.record(2.5)
+
+    restored = [LatencyHistogram.from_dict(json.loads(json.dumps(histogram.to_dict())))
+                for histogram in (first, second)]
+    merged = LatencyHistogram().merge(restored[0]).merge(restored[1])
+
+    assert merged.counts == combined.counts
+    assert merged.max_us == combined.max_us == 2_500_000
+    assert merged.summary() == combined.summary()
+
+
+@pytest.mark.asyncio
+async def test_workers_are_merged_through_redis(monkeypatch):
+    fakeredis = pytest.importorskip('fakeredis')
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(latency_histogram, 'get_redis', lambda: redis)
+    workers = [RouteLatencyRecorder(), RouteLatencyRecorder()]
+    for number, worker in enumerate(workers):
+        worker.worker_id = f"host:{number}"
+        worker.record('GET /api/v1/clients', 0.010 * (number + 1), latency_histogram.time.perf_counter())
+    await workers[1]._publish()
+
+    report = await workers[0].report()
+
+    assert report['workers'] == ['host:0', 'host:1']
+    [route] = report['routes']
+    assert route['count'] == 2
+    assert route['maxMs'] == 20.0
@@ -0,0 +1,207 @@
+"""
+Rick Jefferson Solutions - Mailing Job Tests
+Bulk mailing against the USPS stand-in: label outcomes, resume and job store selection
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import asyncio
+import time
+
+import pytest
+from pydantic import ValidationError
+
+from letter_store import InMemoryLetterStore, LetterStore, SQLLetterStore, create_letter_store
+from mailing_jobs import MailingJobManager
+
+RECIPIENT = {'streetAddress': '100 Main St', 'cityName': 'Dallas', 'state': 'TX', 'zipCode': '75201'}
+
+
+def item(position: int = 0, letter_type: str = 'initial') -> dict:
+    return {
+        'clientId': f"client-{position}",
+        'disputeId': f"dispute-{position}",
+        'recipientAddress': RECIPIENT,
+        'letterType': letter_type
+    }
+
+
+async def run_job(manager: MailingJobManager, job_id: str = None, force: bool = False, items=None,
+                  consolidate: bool = True) -> dict:
+    if job_id is None:
+        job_id = (await manager.create_job(items or [item()], verify_addresses=False, consolidate=consolidate))['jobId']
+    else:
+        await manager.resume_job(job_id, force=force)
+    await manager._tasks[job_id]
+    return await manager.get_progress(job_id)
+
+
+async def set_label_errors(service, error_rate: float) -> None:
+    response = await service._get_client().put(
+        f"{service.base_url}/__standin/profile", json={'labels': {'errorRate': error_rate}}
+    )
+    response.raise_for_status()
+
+
+async def label_requests(service) -> int:
+    response = await service._get_client().get(f"{service.base_url}/__standin/stats")
+    return response.json()['families'].get('labels', {}).get('requests', 0)
+
+
+@pytest.mark.asyncio
+async def test_job_mails_every_letter(standin_service):
+    service, _ = standin_service
+    manager = MailingJobManager(service, store=InMemoryLetterStore())
+
+    progress = await run_job(manager, items=[item(0), item(1)])
+
+    assert progress['status'] == 'completed'
+    assert progress['sent'] == 2
+    assert all(letter['trackingNumber'] for letter in await manager.get_items(progress['jobId']))
+
+
+@pytest.mark.asyncio
+async def test_ambiguous_label_failure_is_not_resubmitted(standin_service):
+    service, _ = standin_service
+    manager = MailingJobManager(service, store=InMemoryLetterStore())
+    await set_label_errors(service, 1.0)
+
+    progress = await run_job(manager)
+    [letter] = await manager.get_items(progress['jobId'])
+
+    # A 503 may have created the label
+    assert progress['status'] == 'completed_with_errors'
+    assert progress['unconfirmed'] == 1
+    assert letter['status'] == 'generated'
+    assert letter['lastEvent'] == 'label_unconfirmed'
+
+    await set_label_errors(service, 0.0)
+    requests = await label_requests(service)
+    progress = await run_job(manager, progress['jobId'])
+
+    assert await label_requests(service) == requests
+    assert progress['sent'] == 0
+    assert progress['unconfirmed'] == 1
+
+    progress = await run_job(manager, progress['jobId'], force=True)
+
+    assert progress['status'] == 'completed'
+    assert progress['unconfirmed'] == 0
+
+
+@pytest.mark.asyncio
+async def test_unsent_label_failure_is_retried_on_resume(standin_service):
+    service, _ = standin_service
+    manager = MailingJobManager(service, store=InMemoryLetterStore())
+    breaker = service._circuit_breaker('/labels/v3/label')
+    breaker.state, breaker.opened_at = 'open', time.monotonic()
+
+    progress = await run_job(manager)
+    [letter] = await manager.get_items(progress['jobId'])
+
+    # The open circuit rejected the request before it left the process
+    assert letter['status'] == 'failed'
+    assert letter['lastEvent'] == 'label_failed'
+    assert progress['unconfirmed'] == 0
+
+    breaker.state = 'closed'
+    progress = await run_job(manager, progress['jobId'])
+
+    assert progress['status'] == 'completed'
+    assert progress['sent'] == 1
+
+
+def test_letter_type_must_match_schema():
+    from rick_jefferson_api import MailingJobItem
+
+    assert MailingJobItem(**item(letter_type='follow_up')).letterType == 'follow_up'
+    with pytest.raises(ValidationError):
+        MailingJobItem(**item(letter_type='dispute_letter'))
+
+
+def test_memory_store_is_refused_with_several_workers(monkeypatch):
+    monkeypatch.setenv('MAILING_JOB_STORE', 'memory')
+    monkeypatch.setenv('WEB_CONCURRENCY', '4')
+    with pytest.raises(ValueError, match='MAILING_JOB_STORE=database'):
+        create_letter_store()
+
+    monkeypatch.setenv('WEB_CONCURRENCY', '1')
+    assert isinstance(create_letter_store(), InMemoryLetterStore)
+
+
+def test_stores_implement_the_whole_interface():
+    class PartialStore(LetterStore):
+        async def create_job(self, job):
+            return job
+
+    with pytest.raises(TypeError, match='abstract'):
+        PartialStore()
+    assert not InMemoryLetterStore.__abstractmethods__
+    assert not SQLLetterStore.__abstractmethods__
+
+@pytest.mark.asyncio
+async def test_later_job_mails_unsent_letters_of_earlier_jobs(standin_service):
+    service, _ = standin_service
+    manager = MailingJobManager(service, store=InMemoryLetterStore())
+    breaker = service._circuit_breaker('/labels/v3/label')
+    breaker.state, breaker.opened_at = 'open', time.monotonic()
+
+    first = await run_job(manager, items=[item(0)])
+    assert first['status'] == 'completed_with_errors'
+
+    breaker.state = 'closed'
+    second = await run_job(manager, items=[{**item(0), 'disputeId': 'dispute-9', 'letterType': 'follow_up'}])
+
+    [earlier] = await manager.get_items(first['jobId'])
+    [later] = await manager.get_items(second['jobId'])
+    events = await manager.store.get_tracking_events(later['letterId'])
+
+    assert second['envelopes'] == 1
+    assert earlier['status'] == later['status'] == 'sent'
+    assert earlier['trackingNumber'] == later['trackingNumber']
+    assert events[-1]['metadata']['letterTypes'] == ['initial', 'follow_up']
+    assert (await manager.get_progress(first['jobId']))['status'] == 'completed'
+
+
+@pytest.mark.asyncio
+async def test_cancelled_and_running_jobs_keep_their_letters(standin_service):
+    service, _ = standin_service
+    store = InMemoryLetterStore()
+    manager = MailingJobManager(service, store=store)
+    cancelled = await store.create_job({'status': 'cancelled', 'total_items': 1, 'concurrency': 1,
+                                        'verify_addresses': False, 'options': {'consolidate': True}})
+    await store.create_letters([manager._letter_row(cancelled['id'], 0, item(0))])
+
+    progress = await run_job(manager, items=[item(0)])
+
+    [letter] = await manager.get_items(cancelled['id'])
+    assert progress['envelopes'] == 1
+    assert letter['status'] == 'generated'
+    assert (await store.get_job(cancelled['id']))['status'] == 'cancelled'
+
+
+@pytest.mark.asyncio
+async def test_cancel_from_another_worker_stops_the_job(standin_service):
+    service, _ = standin_service
+    store = InMemoryLetterStore()
+    running = MailingJobManager(service, store=store)
+    other = MailingJobManager(service, store=store)
+    job_id = (await running.create_job([item(position) for position in range(20)], concurrency=1,
+                                       verify_addresses=False, consolidate=False))['jobId']
+    while (await running.get_progress(job_id))['sent'] == 0:
+        await asyncio.sleep(0.01)
+
+    requested = await other.cancel_job(job_id)
+    assert requested['status'] == 'running' and requested['cancelRequested']
+
+    await running._tasks[job_id]
+    progress = await running.get_progress(job_id)
+    assert progress['status'] == 'cancelled' and not progress['cancelRequested']
+    assert 0 < progress['sent'] < 20
+    assert progress['pending'] == 20 - progress['sent']
+
+    # Resuming clears the request and mails the rest
+    progress = await run_job(running, job_id)
+    assert progress['status'] == 'completed' and progress['sent'] == 20
@@ -0,0 +1,109 @@
+"""
+Rick Jefferson Solutions - Monitoring Time Series Tests
+Ring-buffer eviction, rollup buckets and resolution selection
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import pytest
+
+from timeseries import RAW_CAPACITY, RingBuffer, TimeSeriesStore, report_metrics
+
+T0 = 1_717_200_000.0  # on an hour boundary
+
+
+def test_ring_buffer_evicts_the_oldest_rows():
+    ring = RingBuffer(3, ('value',))
+    for index in range(5):
+        ring.append(T0 + index, float(index))
+
+    assert len(ring) == 3
+    assert ring.oldest() == T0 + 2 and ring.newest() == T0 + 4
+    assert list(ring.rows()) == [(T0 + 2, 2.0), (T0 + 3, 3.0), (T0 + 4, 4.0)]
+    assert list(ring.rows(T0 + 2.5, T0 + 3)) == [(T0 + 3, 3.0)]
+
+
+def test_rollups_aggregate_per_bucket():
+    store = TimeSeriesStore()
+    # Every 30 s for 10 minutes: values 0..19
+    for index in range(20):
+        store.record('API Health.response_time_ms', float(index), T0 + index * 30)
+
+    minutes = store.query('API Health.response_time_ms', resolution='1m')
+    assert len(minutes) == 10
+    assert minutes[0] == {'timestamp': T0, 'mean': 0.5, 'min': 0.0, 'max': 1.0, 'count': 2}
+    # The bucket still being filled is included
+    assert minutes[-1] == {'timestamp': T0 + 540, 'mean': 18.5, 'min': 18.0, 'max': 19.0, 'count': 2}
+
+    five = store.query('API Health.response_time_ms', resolution='5m')
+    assert [(point['count'], point['mean']) for point in five] == [(10, 4.5), (10, 14.5)]
+
+    hour = store.query('API Health.response_time_ms', resolution='1h')
+    assert hour == [{'timestamp': T0, 'mean': 9.5, 'min': 0.0, 'max': 19.0, 'count': 20}]
+
+
+def test_range_includes_a_partly_covered_bucket():
+    store = TimeSeriesStore()
+    for index in range(20):
+        store.record('cpu', float(index), T0 + index * 30)
+
+    points = store.query('cpu', start=T0 + 330, end=T0 + 420, resolution='1m')
+
+    assert [point['timestamp'] for point in points] == [T0 + 300, T0 + 360, T0 + 420]
+
+
+def test_out_of_order_samples_are_dropped():
+    store = TimeSeriesStore()
+    store.record('cpu', 10.0, T0 + 60)
+    store.record('cpu', 99.0, T0)
+
+    assert store.latest('cpu') == (T0 + 60, 10.0)
+    assert store.stats()['dropped_samples'] == 1
+
+
+def test_query_falls_back_to_rollups_once_raw_samples_are_evicted():
+    store = TimeSeriesStore()
+    # One sample per 5-minute bucket; the first has just been evicted from raw
+    for index in range(RAW_CAPACITY + 1):
+        store.record('cpu', 1.0, T0 + index * 300)
+
+    assert store.resolution_for('cpu', T0 + 300) == 'raw'
+    assert store.resolution_for('cpu', T0) == '5m'
+    assert store.query('cpu', start=T0)[0]['timestamp'] == T0
+    assert len(store.query('cpu', resolution='raw')) == RAW_CAPACITY
+
+    store.record('cpu', 1.0, T0 + (RAW_CAPACITY + 1) * 300)
+    assert store.resolution_for('cpu', T0) == '1h'
+
+
+def test_series_limit_drops_new_metrics():
+    store = TimeSeriesStore(max_series=2)
+    for metric in ('a', 'b', 'c'):
+        store.record(metric, 1.0, T0)
+
+    assert store.metrics() == ['a', 'b']
+    assert store.stats()['dropped_samples'] == 1
+
+
+def test_report_metrics():
+    report = {
+        'health_percentage': 83.33,
+        'checks': [
+            {'service': 'API Health', 'status': 'healthy', 'response_time_ms': 12.5},
+            {'service': 'Database', 'status': 'timeout', 'response_time_ms': None},
+            {'service': 'System Resources', 'status': 'warning', 'details': {'cpu_percent': 91.0, 'disk_percent': 'n/a'}}
+        ],
+        'route_latency': {'routes': [{'route': 'GET /api/v1/clients', 'p95Ms': 40}]}
+    }
+
+    assert report_metrics(report) == [
+        ('platform.health_percentage', pytest.approx(83.33)),
+        ('API Health.up', 1.0),
+        ('API Health.response_time_ms', 12.5),
+        ('Database.up', 0.0),
+        ('System Resources.up', 0.0),
+        ('System Resources.cpu_percent', 91.0),
+        ('route.GET /api/v1/clients.p95_ms', 40.0)
+    ]
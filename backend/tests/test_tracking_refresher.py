@@ -0,0 +1,109 @@
+"""
+Rick Jefferson Solutions - Tracking Refresher Tests
+Per-number error isolation, delivery detection and the leader lease
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import tracking_refresher
+from letter_store import InMemoryLetterStore, SQLLetterStore
+from tracking_refresher import TrackingRefresher, is_delivered
+
+NOW = datetime(2024, 6, 3, 9, 0)
+
+
+class FakeTrackingService:
+    """track_package reports one event (ACCEPTED unless given); numbers in failing raise"""
+
+    batch_concurrency = 4
+
+    def __init__(self, failing=(), status='In Transit', event=None):
+        self.failing = set(failing)
+        self.status = status
+        self.event = event or {'eventType': 'ACCEPTED'}
+        self.calls = []
+
+    async def track_package(self, tracking_number: str):
+        self.calls.append(tracking_number)
+        if tracking_number in self.failing:
+            raise RuntimeError('malformed tracking response')
+        return {
+            'success': True,
+            'trackingNumber': tracking_number,
+            'status': self.status,
+            'trackingEvents': [{'eventTimestamp': '2024-06-02T10:00:00', 'eventZIP': '75034', **self.event}]
+        }
+
+
+async def mailed_store(*tracking_numbers: str) -> InMemoryLetterStore:
+    store = InMemoryLetterStore()
+    letters = await store.create_letters([
+        {'client_id': 'client-1', 'dispute_id': f"dispute-{number}", 'letter_type': 'initial', 'status': 'generated'}
+        for number in tracking_numbers
+    ])
+    for letter, number in zip(letters, tracking_numbers):
+        await store.update_letter(letter['id'], status='sent', tracking_number=number, sent_at=NOW - timedelta(days=1))
+    return store
+
+
+@pytest.mark.asyncio
+async def test_failing_number_does_not_stop_the_batch():
+    store = await mailed_store('9400-good-1', '9400-bad', '9400-good-2')
+    refresher = TrackingRefresher(FakeTrackingService(failing={'9400-bad'}), store)
+
+    result = await refresher.refresh_due(NOW)
+
+    assert result == {'inTransit': 3, 'polled': 3}
+    assert refresher.stats_counters['errors'] == 1
+    assert refresher.stats_counters['eventsWritten'] == 2
+    assert refresher._schedule['9400-bad']['next_poll_at'] == NOW + refresher.near_interval
+    assert refresher._schedule['9400-good-1']['next_poll_at'] == NOW + refresher.default_interval
+
+
+@pytest.mark.parametrize('status, event, delivered', [
+    ('Delivered', {'eventType': 'Delivered, In/At Mailbox', 'eventCode': '01'}, True),
+    ('In Transit', {'eventType': 'Delivered, Front Door/Porch'}, True),
+    ('In Transit', {'eventType': 'Delivery status update', 'eventCode': '01'}, True),
+    ('Undelivered', {'eventType': 'Undelivered, Returned to Sender', 'eventCode': '09'}, False),
+    ('Alert', {'eventType': 'Not Delivered, Notice Left', 'eventCode': '02'}, False)
+])
+def test_is_delivered(status, event, delivered):
+    assert is_delivered({'status': status, 'trackingEvents': [event]}) is delivered
+
+
+@pytest.mark.asyncio
+async def test_undelivered_letter_stays_in_transit():
+    store = await mailed_store('9400-returned')
+    service = FakeTrackingService(status='Undelivered',
+                                  event={'eventType': 'Undelivered, Returned to Sender', 'eventCode': '09'})
+    refresher = TrackingRefresher(service, store)
+
+    await refresher.refresh_due(NOW)
+
+    [letter] = await store.get_letters_by_tracking('9400-returned')
+    assert letter['status'] == 'sent' and letter.get('delivered_at') is None
+    assert [event['status'] for event in await store.get_tracking_events(letter['id'])] == ['in_transit']
+    assert refresher._schedule['9400-returned']['next_poll_at'] == NOW + refresher.default_interval
+@pytest.mark.asyncio
+async def test_lease_is_only_taken_for_the_shared_store(monkeypatch):
+    fakeredis = pytest.importorskip('fakeredis')
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(tracking_refresher, 'get_redis', lambda: redis)
+    service = FakeTrackingService()
+
+    # Each worker's in-memory store holds only its own letters
+    for _ in range(2):
+        assert await TrackingRefresher(service, InMemoryLetterStore())._hold_lease()
+    assert await redis.get(tracking_refresher.LEADER_KEY) is None
+
+    shared = SQLLetterStore.__new__(SQLLetterStore)  # no engine needed to take the lease
+    leader, follower = TrackingRefresher(service, shared), TrackingRefresher(service, shared)
+    assert await leader._hold_lease()
+    assert not await follower._hold_lease()
+    assert await leader._hold_lease()
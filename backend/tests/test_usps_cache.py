@@ -0,0 +1,138 @@
+"""
+Rick Jefferson Solutions - USPS Cache Tests
+Address normalization, the LRU/TTL cache, cached verification results and
+the ZIP3 lane caches
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import pytest
+
+import usps_cache
+from usps_cache import AddressVerificationCache, LaneCache, LRUTTLCache, lane_key, normalize_address, weight_band
+
+VERIFIED = {
+    'success': True,
+    'verified': True,
+    'address': {'streetAddress': '123 MAIN ST', 'cityName': 'DALLAS', 'state': 'TX', 'zipCode': '75201'}
+}
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(usps_cache.time, 'time', clock.time)
+    return clock
+
+
+def test_equivalent_addresses_share_a_key():
+    written = {'streetAddress': '123 Main Street', 'secondaryAddress': 'Suite 4', 'cityName': 'Saint Louis',
+               'state': 'mo', 'zipCode': '63101-1234'}
+    abbreviated = {'streetAddress': '123 MAIN ST STE 4', 'cityName': 'St. Louis', 'state': 'MO', 'zipCode': '63101'}
+
+    assert normalize_address(written) == normalize_address(abbreviated)
+    assert normalize_address({'streetAddress': 'P.O. Box 12', 'cityName': 'Dallas', 'state': 'TX', 'zipCode': '75201'}) \
+        == 'PO BOX 12|DALLAS|TX|75201'
+
+
+def test_lru_evicts_least_recently_used(clock):
+    cache = LRUTTLCache(max_entries=2, ttl_seconds=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = LRUTTLCache(max_entries=10, ttl_seconds=60)
+    cache.set('a', 1)
+    cache.set('b', 2, expires_at=clock.now + 10)
+
+    clock.now += 30
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+
+    clock.now += 31
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_cache_hits_do_not_share_nested_data(monkeypatch):
+    monkeypatch.setenv('USPS_ADDRESS_CACHE_PERSISTENT', 'false')
+    cache = AddressVerificationCache()
+    stored = {**VERIFIED, 'address': dict(VERIFIED['address'])}
+    await cache.set(VERIFIED['address'], stored)
+
+    # Neither the stored dict nor a hit may alias the cached entry
+    stored['address']['cityName'] = 'CHANGED BY CALLER'
+    first = await cache.get(VERIFIED['address'])
+    first['address']['cityName'] = 'CHANGED BY HIT'
+    second = await cache.get(VERIFIED['address'])
+
+    assert second['address']['cityName'] == 'DALLAS'
+    assert cache.stats()['hitsMemory'] == 2
+
+
+@pytest.mark.asyncio
+async def test_service_cache_hit_returns_independent_copy(usps_env):
+    from usps_service import USPSAddress, USPSService
+
+    service = USPSService()
+    address = USPSAddress(**VERIFIED['address'])
+    await service.address_cache.set(address, VERIFIED)
+
+    first = await service.verify_address(address)
+    first['address']['streetAddress'] = 'mutated'
+    second = await service.verify_address(address)
+
+    assert first['cached'] and second['cached']
+    assert second['address']['streetAddress'] == '123 MAIN ST'
+
+
+@pytest.mark.parametrize('weight, band', [(0.2, 0.5), (1.0, 1.0), (1.1, 1.5), (3.5, 3.5), (15.9, 16.0), (16.5, 32.0)])
+def test_weight_bands_follow_price_breaks(weight, band):
+    assert weight_band(weight) == band
+
+
+def test_zips_in_the_same_zip3_areas_share_a_lane():
+    assert lane_key('75201', '10001', 'FIRST_CLASS_MAIL', 1.2) == lane_key('75299-1234', '10099', 'FIRST_CLASS_MAIL', 1.4)
+    assert lane_key('75201', '10001', 'FIRST_CLASS_MAIL', 1.2) != lane_key('75201', '10101', 'FIRST_CLASS_MAIL', 1.2)
+    assert lane_key('75201', '10001', 'FIRST_CLASS_MAIL', 1.2) != lane_key('75201', '10001', 'FIRST_CLASS_MAIL', 1.6)
+
+
+def test_lane_entries_never_outlive_a_rate_change(clock):
+    cache = LaneCache('pricing', ttl_seconds=86400, rate_change_dates=[clock.now + 3600])
+    key = lane_key('75201', '10001', 'FIRST_CLASS_MAIL', 1.0)
+    cache.set(key, {'totalPrice': 0.73})
+
+    clock.now += 3599
+    assert cache.get(key) == {'totalPrice': 0.73}
+
+    clock.now += 2
+    assert cache.get(key) is None
+    assert cache.stats() == {'entries': 0, 'hits': 1, 'misses': 1, 'hitRate': 0.5}
+
+
+def test_lane_entries_after_last_rate_change_use_ttl(clock):
+    cache = LaneCache('service-standards', ttl_seconds=60, rate_change_dates=[clock.now - 10])
+    cache.set(('752', '100'), {'days': 3})
+
+    clock.now += 59
+    assert cache.get(('752', '100')) == {'days': 3}
+    clock.now += 2
+    assert cache.get(('752', '100')) is None
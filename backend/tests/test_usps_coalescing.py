@@ -0,0 +1,91 @@
+"""
+Rick Jefferson Solutions - USPS Request Coalescing Tests
+Shared upstream calls, per-caller copies and the quota priority of shared calls
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import asyncio
+
+import pytest
+
+from usps_quota import QuotaManager, background_work
+
+ADDRESS_ENDPOINT = '/addresses/v3/address'
+ADDRESS = {'streetAddress': '100 Main St', 'cityName': 'Dallas', 'state': 'TX', 'zipCode': '75201'}
+
+
+async def address_requests(service) -> int:
+    response = await service._get_client().get(f"{service.base_url}/__standin/stats")
+    return response.json()['families'].get('addresses', {}).get('requests', 0)
+
+
+def scarce_quota() -> QuotaManager:
+    """
+    Bucket an interactive address lookup may take from right away, while a
+    background one has to wait for its extra reserve to refill (0.15 s).
+    """
+    quota = QuotaManager(per_hour=36000, burst=10)
+    quota.tokens = 2.5
+    return quota
+
+
+async def background_lookup(service):
+    with background_work():
+        return await service.make_request(ADDRESS_ENDPOINT, 'POST', ADDRESS)
+
+
+@pytest.mark.asyncio
+async def test_identical_calls_share_one_request(standin_service):
+    service, _ = standin_service
+
+    first, second = await asyncio.gather(
+        service.make_request(ADDRESS_ENDPOINT, 'POST', ADDRESS),
+        service.make_request(ADDRESS_ENDPOINT, 'POST', ADDRESS)
+    )
+
+    assert await address_requests(service) == 1
+    assert service.coalescing_counters == {'requests': 2, 'coalesced': 1}
+    first['address']['city'] = 'CHANGED'
+    assert second['address']['city'] == 'DALLAS'
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_the_shared_call(standin_service):
+    service, _ = standin_service
+
+    first = asyncio.create_task(service.make_request(ADDRESS_ENDPOINT, 'POST', ADDRESS))
+    second = asyncio.create_task(service.make_request(ADDRESS_ENDPOINT, 'POST', ADDRESS))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert (await second)['deliverable'] is True
+    assert first.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_interactive_caller_promotes_a_waiting_background_call(standin_service):
+    service, _ = standin_service
+    service.quota = scarce_quota()
+
+    shared = asyncio.create_task(background_lookup(service))
+    await asyncio.sleep(0.05)  # the background call is now waiting for quota
+    interactive = await service.make_request(ADDRESS_ENDPOINT, 'POST', ADDRESS)
+
+    assert interactive == await shared
+    assert service.coalescing_counters['coalesced'] == 1
+    assert service.quota.counters['address']['background'] == 0
+
+
+@pytest.mark.asyncio
+async def test_background_only_calls_stay_background(standin_service):
+    service, _ = standin_service
+    service.quota = scarce_quota()
+
+    await asyncio.gather(background_lookup(service), background_lookup(service))
+
+    assert service.quota.counters['address']['granted'] == 1
+    assert service.quota.counters['address']['background'] == 1
+    assert service.quota.counters['address']['waited'] == 1
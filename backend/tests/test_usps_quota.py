@@ -0,0 +1,145 @@
+"""
+Rick Jefferson Solutions - USPS Quota Tests
+Token bucket refill, class floors, the background reserve and 429 back-off
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import pytest
+
+import usps_quota
+from usps_quota import QuotaExceededError, QuotaManager, background_work
+from usps_resilience import request_unsent
+
+
+class Clock:
+    def __init__(self, now=1_000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(usps_quota.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(usps_quota.asyncio, 'sleep', clock.sleep)
+    return clock
+
+
+def quota(tokens: float) -> QuotaManager:
+    """One token per second, ten tokens of burst"""
+    manager = QuotaManager(per_hour=3600, burst=10)
+    manager.tokens = tokens
+    return manager
+
+
+def test_class_floors_and_background_reserve(clock):
+    manager = quota(10)
+
+    assert manager.floor_tokens('label', background=False) == 0
+    assert manager.floor_tokens('address', background=False) == pytest.approx(1)
+    assert manager.floor_tokens('tracking', background=False) == pytest.approx(4)
+    assert manager.floor_tokens('tracking', background=True) == pytest.approx(6)
+    assert manager.request_class('/service-standards/v3/estimates') == 'pricing'
+    assert manager.request_class('/unknown/v1') == 'tracking'
+
+
+def test_lower_classes_wait_first_as_the_bucket_runs_low(clock):
+    manager = quota(3)
+
+    assert manager._take_local(manager.floor_tokens('tracking', background=False)) == (False, pytest.approx(2))
+    assert manager._take_local(manager.floor_tokens('label', background=False)) == (True, 0.0)
+    assert manager.tokens == pytest.approx(2)
+
+    # Refill is capped at the burst size
+    clock.now += 3600
+    manager._take_local(0)
+    assert manager.tokens == pytest.approx(9)
+
+
+@pytest.mark.asyncio
+async def test_acquire_waits_for_a_token(clock):
+    manager = quota(0)
+
+    await manager.acquire('/labels/v3/label')
+
+    assert manager.counters['label']['granted'] == 1
+    assert manager.counters['label']['waited'] == 1
+    assert manager.counters['label']['waitSeconds'] == pytest.approx(1)
+
+
+@pytest.mark.asyncio
+async def test_background_work_keeps_the_reserve_free(clock):
+    manager = quota(2)
+
+    with background_work():
+        await manager.acquire('/labels/v3/label')
+    await manager.acquire('/labels/v3/label')
+
+    assert manager.counters['label'] == {
+        'granted': 2, 'waited': 1, 'waitSeconds': pytest.approx(1), 'rejected': 0, 'background': 1
+    }
+
+
+@pytest.mark.asyncio
+async def test_wait_beyond_the_limit_is_rejected_unsent(clock):
+    manager = quota(-10)
+    manager.max_wait = 5
+
+    with pytest.raises(QuotaExceededError) as rejected:
+        await manager.acquire('/labels/v3/label')
+
+    assert request_unsent(rejected.value)
+    assert rejected.value.retry_after == pytest.approx(11)
+    assert manager.counters['label']['rejected'] == 1
+
+
+@pytest.mark.asyncio
+async def test_throttled_drains_the_bucket_for_retry_after(clock):
+    manager = quota(10)
+
+    await manager.throttled(30)
+    allowed, wait = manager._take_local(0)
+
+    assert not allowed
+    assert wait == pytest.approx(31)
+
+
+@pytest.mark.asyncio
+async def test_disabled_quota_never_waits(clock):
+    manager = QuotaManager(per_hour=0)
+    manager.tokens = -100
+
+    await manager.acquire('/labels/v3/label')
+    await manager.throttled(60)
+
+    assert manager.counters == {}
+    assert manager.stats()['localTokens'] is None
+
+
+@pytest.mark.asyncio
+async def test_shared_bucket_falls_back_to_local_when_redis_fails(clock, monkeypatch):
+    fakeredis = pytest.importorskip('fakeredis')
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(usps_quota, 'get_redis', lambda: redis)
+    manager = quota(3)
+
+    async def unavailable(*args):
+        raise ConnectionError('redis down')
+
+    monkeypatch.setattr(redis, 'eval', unavailable)
+    await manager.acquire('/labels/v3/label')
+    assert manager.tokens == pytest.approx(2)
+
+    # A 429 drains the shared bucket for every worker
+    await manager.throttled(30)
+    bucket = await redis.hgetall(usps_quota.BUCKET_KEY)
+    assert float(bucket['tokens']) == pytest.approx(-30)
+    assert manager.tokens == pytest.approx(2)
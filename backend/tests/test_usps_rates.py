@@ -0,0 +1,65 @@
+"""
+Rick Jefferson Solutions - Offline Postage Tests
+Letter weights, rate-table pricing and the dispute-letter quote endpoint
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from usps_rates import FLAT_MAX_WEIGHT_OZ, LETTER_MAX_WEIGHT_OZ, letter_weight_oz, load_rate_table, max_pages
+
+QUOTE_URL = '/api/v1/usps/dispute-letters/quote'
+
+
+@pytest.fixture(scope='module')
+def api_client():
+    import rick_jefferson_api
+    # No lifespan: the quote endpoint only reads the local rate tables
+    return TestClient(rick_jefferson_api.app)
+
+
+def test_page_limits_match_letter_weights():
+    assert max_pages(LETTER_MAX_WEIGHT_OZ) == 20
+    assert max_pages(FLAT_MAX_WEIGHT_OZ) == 80
+    assert letter_weight_oz(20) <= LETTER_MAX_WEIGHT_OZ < letter_weight_oz(21)
+    assert letter_weight_oz(80) <= FLAT_MAX_WEIGHT_OZ < letter_weight_oz(81)
+
+
+def test_heavy_letters_are_priced_as_flats():
+    table = load_rate_table()
+
+    letter = table.price('FIRST_CLASS_MAIL', letter_weight_oz(20))
+    flat = table.price('FIRST_CLASS_MAIL', letter_weight_oz(21))
+
+    assert letter['processingCategory'] == 'LETTERS'
+    assert flat['processingCategory'] == 'FLATS'
+    assert table.price('FIRST_CLASS_MAIL', letter_weight_oz(81)) is None
+
+
+def test_quote_totals_quantities(api_client):
+    response = api_client.post(QUOTE_URL, json={'items': [
+        {'pageCount': 2, 'quantity': 3},
+        {'pageCount': 30, 'quantity': 1}
+    ]})
+
+    assert response.status_code == 200
+    quote = response.json()
+    assert quote['letters'] == 4
+    assert [line['processingCategory'] for line in quote['lines']] == ['LETTERS', 'FLATS']
+    assert quote['totalPostage'] == pytest.approx(sum(line['subtotal'] for line in quote['lines']))
+    assert quote['totalPostage'] > 0
+
+
+@pytest.mark.parametrize('item', [
+    {'pageCount': 0},
+    {'pageCount': -3},
+    {'pageCount': 81},
+    {'pageCount': 1, 'quantity': 0},
+    {'pageCount': 1, 'quantity': -5}
+])
+def test_quote_rejects_out_of_range_items(api_client, item):
+    assert api_client.post(QUOTE_URL, json={'items': [item]}).status_code == 422
@@ -0,0 +1,175 @@
+"""
+Rick Jefferson Solutions - USPS Resilience Tests
+Circuit breaker state machine, retry policies and the breaker/quota order
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import httpx
+import pytest
+
+import usps_resilience
+from usps_resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, default_retry_policies, request_unsent
+
+
+class Clock:
+    def __init__(self, now=1_000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(usps_resilience.time, 'monotonic', clock.monotonic)
+    return clock
+
+
+def opened_breaker(clock) -> CircuitBreaker:
+    breaker = CircuitBreaker('labels', failure_threshold=3, reset_timeout=30)
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    return breaker
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker('labels', failure_threshold=3, reset_timeout=30)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+
+    breaker = opened_breaker(clock)
+    assert breaker.state == 'open'
+    assert breaker.times_opened == 1
+
+
+def test_open_breaker_fails_fast_until_reset(clock):
+    breaker = opened_breaker(clock)
+    clock.now += 10
+
+    with pytest.raises(CircuitOpenError) as rejected:
+        breaker.before_call()
+
+    assert rejected.value.retry_after == pytest.approx(20)
+    assert request_unsent(rejected.value)
+    assert breaker.rejected == 1
+
+
+def test_half_open_allows_a_single_probe(clock):
+    breaker = opened_breaker(clock)
+    clock.now += 30
+
+    breaker.before_call()
+    assert breaker.state == 'half_open'
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    # A probe that ended without an outcome hands over to the next caller
+    breaker.release_probe()
+    breaker.before_call()
+
+
+def test_probe_outcome_closes_or_reopens(clock):
+    breaker = opened_breaker(clock)
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.consecutive_failures == 0
+
+    breaker = opened_breaker(clock)
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert breaker.retry_in() == pytest.approx(30)
+
+
+def test_label_policy_only_retries_unsent_requests():
+    labels = default_retry_policies()['/labels/']
+    reads = default_retry_policies()['/addresses/']
+
+    assert labels.retries_status(429) and not labels.retries_status(503)
+    assert reads.retries_status(503)
+    assert labels.retries_transport_error(httpx.ConnectError('refused'))
+    assert not labels.retries_transport_error(httpx.ReadTimeout('slow'))
+    assert reads.retries_transport_error(httpx.ReadTimeout('slow'))
+
+
+def test_retry_after_beyond_limit_stops_retrying():
+    policy = RetryPolicy(max_retry_after=30)
+
+    assert policy.delay(1, retry_after=5) >= 5
+    assert policy.delay(1, retry_after=60) is None
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_does_not_spend_quota(standin_service):
+    service, _ = standin_service
+    acquired = []
+
+    async def acquire(endpoint):
+        acquired.append(endpoint)
+
+    service.quota.acquire = acquire
+    breaker = service._circuit_breaker('/labels/v3/label')
+    breaker.state, breaker.opened_at = 'open', usps_resilience.time.monotonic()
+
+    with pytest.raises(CircuitOpenError):
+        await service.make_request('/labels/v3/label', 'POST', {})
+
+    assert acquired == []
+
+
+@pytest.fixture
+def fast_retries(standin_service, monkeypatch):
+    service, _ = standin_service
+    monkeypatch.setenv('USPS_RETRY_BASE_DELAY_SECONDS', '0.001')
+    service.retry_policies = default_retry_policies()
+    return service
+
+
+async def set_errors(service, family: str, error_rate: float) -> None:
+    response = await service._get_client().put(
+        f"{service.base_url}/__standin/profile", json={family: {'errorRate': error_rate}}
+    )
+    response.raise_for_status()
+
+
+@pytest.mark.asyncio
+async def test_retry_outcomes_are_counted_per_family(fast_retries, monkeypatch):
+    import usps_standin
+    service = fast_retries
+    address = {'streetAddress': '100 Main St', 'cityName': 'Dallas', 'state': 'TX', 'zipCode': '75201'}
+
+    # Fail, then succeed: recovered on the first retry
+    await service.get_access_token()
+    outcomes = iter([0.0, 0.9])
+    await set_errors(service, 'addresses', 0.5)
+    with monkeypatch.context() as patch:
+        patch.setattr(usps_standin.random, 'random', lambda: next(outcomes))
+        await service.make_request('/addresses/v3/address', 'POST', address)
+
+    # Every attempt fails
+    await set_errors(service, 'addresses', 1.0)
+    with pytest.raises(usps_resilience.USPSAPIError):
+        await service.make_request('/addresses/v3/address', 'POST', {**address, 'zipCode': '75202'})
+
+    # A label 5xx is never retried
+    await set_errors(service, 'labels', 1.0)
+    with pytest.raises(usps_resilience.USPSAPIError) as failed:
+        await service.make_request('/labels/v3/label', 'POST', {})
+    assert not request_unsent(failed.value)
+
+    stats = service.retry_stats()
+    assert stats['byFamily']['addresses'] == {'retries': 3, 'recovered': 1, 'exhausted': 1, 'notRetried': 0}
+    assert stats['byFamily']['labels'] == {'retries': 0, 'recovered': 0, 'exhausted': 0, 'notRetried': 1}
+    assert stats['total'] == 3
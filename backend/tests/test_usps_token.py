@@ -0,0 +1,80 @@
+"""
+Rick Jefferson Solutions - USPS OAuth Token Tests
+Token lifetime skew and single-flight refresh in USPSService
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import asyncio
+
+import pytest
+
+import usps_service as usps_module
+
+
+class TokenResponse:
+    status_code = 200
+    text = ''
+
+    def __init__(self, expires_in):
+        self.expires_in = expires_in
+
+    def json(self):
+        return {'access_token': f'token-{self.expires_in}', 'expires_in': self.expires_in}
+
+
+def token_service(usps_env, expires_in, calls=None):
+    service = usps_module.USPSService()
+
+    async def send(method, url, operation='api', **kwargs):
+        if calls is not None:
+            calls.append(url)
+        await asyncio.sleep(0.01)
+        return TokenResponse(expires_in)
+
+    service._send = send
+    return service
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('expires_in, lifetime', [(3600, 3300), (600, 300), (300, 150), (120, 60)])
+async def test_short_lived_tokens_stay_usable(usps_env, expires_in, lifetime):
+    service = token_service(usps_env, expires_in)
+
+    await service._fetch_access_token()
+
+    assert service.token_lifetime_seconds == lifetime
+    assert service._token_valid()
+    assert service._refresh_ahead_seconds() == min(120, lifetime / 2)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_token_fetch(usps_env):
+    calls = []
+    service = token_service(usps_env, 3600, calls)
+
+    tokens = await asyncio.gather(*[service.get_access_token() for _ in range(10)])
+
+    assert set(tokens) == {'token-3600'}
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_refresh_loop_sleeps_until_refresh_ahead_margin(usps_env, monkeypatch):
+    service = token_service(usps_env, 120)
+    delays = []
+
+    async def sleep(delay):
+        # Stop at the loop's own sleep
+        if delay >= 1:
+            delays.append(delay)
+            raise asyncio.CancelledError
+
+    monkeypatch.setattr(usps_module.asyncio, 'sleep', sleep)
+    with pytest.raises(asyncio.CancelledError):
+        await service._token_refresh_loop()
+
+    # 60s usable lifetime refreshed 30s ahead, not every 5s
+    assert 29 <= delays[0] <= 30
@@ -0,0 +1,162 @@
+"""
+Rick Jefferson Solutions - ZIP Database Tests
+Binary ZIP lookups, address pre-validation, the file reload check and the dataset refresh
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import os
+
+import pytest
+
+from zip_database import MAGIC, ZipDatabase, build_database
+
+ENTRIES = [
+    {'zip_code': '75201', 'city': 'Dallas', 'state': 'TX', 'lat': 32.79, 'long': -96.80},
+    {'zip_code': '10001', 'city': 'New York', 'state': 'NY', 'lat': 40.75, 'long': -73.99,
+     'acceptable_cities': ['Manhattan']},
+    {'zip_code': '30374', 'city': 'Atlanta', 'state': 'GA', 'lat': 33.74, 'long': -84.38,
+     'zip_code_type': 'UNIQUE', 'active': False}
+]
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / 'zipdb.bin'
+    path.write_bytes(build_database(ENTRIES, '2024-06-01'))
+    return ZipDatabase(path)
+
+
+def test_lookup(database):
+    assert database.lookup('10001-1234') == {
+        'zipCode': '10001',
+        'city': 'NEW YORK',
+        'state': 'NY',
+        'acceptableCities': ['MANHATTAN'],
+        'type': 'STANDARD',
+        'active': True,
+        'latitude': pytest.approx(40.75),
+        'longitude': pytest.approx(-73.99)
+    }
+    assert database.lookup('99999') is None
+    assert database.version == '2024-06-01'
+
+
+def test_impossible_zips_are_rejected(database):
+    assert database.prevalidate({'zipCode': '7520'}) == {'valid': False, 'error': "ZIP Code '7520' is not a 5-digit ZIP"}
+    assert database.prevalidate({'cityName': 'Frisco', 'state': 'TX', 'zipCode': '75036'}) == {
+        'valid': False, 'error': 'ZIP Code 75036 does not exist'
+    }
+    assert database.prevalidate({'cityName': 'Tulsa', 'state': 'OK', 'zipCode': '75201'}) == {
+        'valid': False, 'error': 'ZIP Code 75201 is in TX, not OK'
+    }
+
+
+def test_wrong_state_is_corrected_when_the_city_matches(database):
+    check = database.prevalidate({'cityName': 'Manhattan', 'state': 'NJ', 'zipCode': '10001'})
+    assert check == {'valid': True, 'corrections': {'state': 'NY'}, 'warnings': []}
+
+
+def test_stale_dataset_only_warns_when_not_strict(database, monkeypatch):
+    monkeypatch.setattr(database, 'strict', False)
+
+    unknown = database.prevalidate({'cityName': 'Frisco', 'state': 'TX', 'zipCode': '75036'})
+    assert unknown == {'valid': True, 'corrections': {}, 'warnings': ['ZIP Code 75036 does not exist']}
+
+    mismatch = database.prevalidate({'cityName': 'Tulsa', 'state': 'OK', 'zipCode': '75201'})
+    assert mismatch['valid'] and mismatch['corrections'] == {}
+    assert mismatch['warnings'][0] == 'ZIP Code 75201 is in TX, not OK'
+
+
+def test_missing_city_and_state_are_filled_in(database):
+    check = database.prevalidate({'cityName': '', 'state': '', 'zipCode': '75201'})
+    assert check == {'valid': True, 'corrections': {'state': 'TX', 'cityName': 'DALLAS'}, 'warnings': []}
+
+    assert database.prevalidate({'cityName': 'Manhattan', 'state': 'NY', 'zipCode': '10001'})['warnings'] == []
+    assert database.prevalidate({'cityName': 'Atlanta', 'state': 'GA', 'zipCode': '30374'})['warnings'] == [
+        'ZIP Code 30374 is no longer active'
+    ]
+
+
+def test_rebuilt_file_is_picked_up_on_the_next_check(database, monkeypatch):
+    monkeypatch.setattr(database, 'recheck_seconds', 0)
+    assert database.lookup('75036') is None
+
+    database.path.write_bytes(build_database(
+        [*ENTRIES, {'zip_code': '75036', 'city': 'Frisco', 'state': 'TX', 'lat': 33.1, 'long': -96.8}], '2024-07-01'
+    ))
+    stat = database.path.stat()
+    os.utime(database.path, (stat.st_atime, stat.st_mtime + 10))
+
+    assert database.lookup('75036')['city'] == 'FRISCO'
+    assert database.version == '2024-07-01'
+
+
+@pytest.mark.asyncio
+async def test_refresh_swaps_in_a_downloaded_csv(database, monkeypatch):
+    downloads = []
+
+    async def download(url):
+        downloads.append(url)
+        return b"zip_code,city,state,lat,long\n75036,Frisco,TX,33.1,-96.8\n"
+
+    monkeypatch.setattr(database, '_download', download)
+    monkeypatch.setattr(database, 'refresh_url', 'https://example.test/zips.csv')
+    monkeypatch.setattr(database, 'refresh_hours', 24)
+    assert not database.refresh_due()
+
+    result = await database.refresh()
+
+    assert downloads == ['https://example.test/zips.csv']
+    assert result['zips'] == 1
+    assert database.lookup('75036')['city'] == 'FRISCO'
+    assert database.lookup('75201') is None
+    assert not database.path.with_suffix('.tmp').exists()
+
+
+@pytest.mark.asyncio
+async def test_refresh_keeps_the_current_file_on_a_bad_download(database, monkeypatch):
+    async def download(url):
+        return MAGIC + bytes(24)  # a valid header with no ZIPs
+
+    monkeypatch.setattr(database, '_download', download)
+
+    with pytest.raises(ValueError, match='empty'):
+        await database.refresh('https://example.test/zipdb.bin')
+    assert database.lookup('75201')['city'] == 'DALLAS'
+
+
+async def address_requests(service) -> int:
+    response = await service._get_client().get(f"{service.base_url}/__standin/stats")
+    return response.json()['families'].get('addresses', {}).get('requests', 0)
+
+
+@pytest.mark.asyncio
+async def test_impossible_addresses_are_rejected_without_calling_usps(standin_service):
+    from usps_service import USPSAddress
+    service, _ = standin_service
+
+    for city, state, zip_code in [('Dallas', 'TX', '99999'), ('Tulsa', 'OK', '75201')]:
+        result = await service.verify_address(
+            USPSAddress(streetAddress='100 Main St', cityName=city, state=state, zipCode=zip_code)
+        )
+        assert not result['success'] and result['source'] == 'local'
+
+    assert await address_requests(service) == 0
+    assert service.prevalidation_counters['rejected'] == 2
+
+
+@pytest.mark.asyncio
+async def test_corrected_state_is_sent_to_usps(standin_service):
+    from usps_service import USPSAddress
+    service, _ = standin_service
+
+    result = await service.verify_address(
+        USPSAddress(streetAddress='100 Main St', cityName='Dallas', state='OK', zipCode='75201')
+    )
+
+    assert result['success'] and result['standardizedAddress']['state'] == 'TX'
+    assert await address_requests(service) == 1
+    assert service.prevalidation_counters == {'rejected': 0, 'corrected': 1, 'warned': 0}
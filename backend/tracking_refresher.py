@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Rick Jefferson Solutions - USPS Tracking Refresher
+Background poller that keeps letter_tracking current for mailed dispute letters
+
+Every tick the refresher loads the letters that are sent but not delivered,
+picks the tracking numbers that are due and polls them in batches. Polling
+is adaptive:
+- daily once nothing has changed for USPS_TRACKING_STALE_DAYS
+- hourly once the expected delivery date is close (or has passed)
+- every few hours otherwise
+- never again after delivery or USPS_TRACKING_MAX_AGE_DAYS
+
+Only events not already stored are written to letter_tracking, and
+letters.delivered_at is set on delivery. The portal reads this stored state
+instead of calling USPS on every page view. With the database letter store
+and Redis configured only one API worker (the lease holder) polls; with the
+in-memory store every worker polls the letters it mailed itself.
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from letter_store import LetterStore, SQLLetterStore
+from redis_client import get_redis
+from usps_quota import is_background
+from usps_service import USPSService
+
+logger = logging.getLogger(__name__)
+
+LEADER_KEY = 'usps:tracking_refresher:leader'
+
+# USPS tracking event code of a delivered item
+DELIVERED_EVENT_CODES = {'01'}
+
+
+def _parse_time(value) -> Optional[datetime]:
+    """Naive local datetime from a USPS timestamp or date string"""
+    if isinstance(value, datetime):
+        return value
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo else parsed
+
+
+def event_key(event: Dict) -> str:
+    """Identity of a USPS tracking event"""
+    return '|'.join(str(event.get(field) or '') for field in ('eventTimestamp', 'eventCode', 'eventType', 'eventZIP'))
+
+
+def _says_delivered(text) -> bool:
+    # 'Delivered' or 'Delivered, In/At Mailbox', but not 'Undelivered' or 'Not Delivered'
+    return str(text or '').strip().upper().startswith('DELIVERED')
+
+
+def is_delivery_event(event: Dict) -> bool:
+    return event.get('eventCode') in DELIVERED_EVENT_CODES or _says_delivered(event.get('eventType'))
+
+
+def is_delivered(result: Dict) -> bool:
+    return _says_delivered(result.get('status')) or any(
+        is_delivery_event(event) for event in result.get('trackingEvents') or []
+    )
+
+
+class TrackingRefresher:
+    """Adaptive batch poller for in-transit tracking numbers"""
+
+    def __init__(self, service: USPSService, store: LetterStore):
+        self.service = service
+        self.store = store
+        self.enabled = os.getenv('USPS_TRACKING_REFRESH_ENABLED', 'true').lower() == 'true'
+        self.tick_seconds = float(os.getenv('USPS_TRACKING_TICK_SECONDS', '60'))
+        self.batch_size = int(os.getenv('USPS_TRACKING_BATCH_SIZE', '100'))
+        self.near_interval = timedelta(minutes=float(os.getenv('USPS_TRACKING_NEAR_INTERVAL_MINUTES', '60')))
+        self.default_interval = timedelta(hours=float(os.getenv('USPS_TRACKING_INTERVAL_HOURS', '6')))
+        self.stale_interval = timedelta(hours=float(os.getenv('USPS_TRACKING_STALE_INTERVAL_HOURS', '24')))
+        self.stale_after = timedelta(days=float(os.getenv('USPS_TRACKING_STALE_DAYS', '7')))
+        self.max_age = timedelta(days=float(os.getenv('USPS_TRACKING_MAX_AGE_DAYS', '90')))
+        self.worker_id = f"{os.getpid()}-{id(self)}"
+
+        # tracking number -> {'next_poll_at', 'last_change_at', 'expected_delivery', 'seen', 'sent_at'}
+        self._schedule: Dict[str, Dict] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.stats_counters = {'polls': 0, 'eventsWritten': 0, 'delivered': 0, 'errors': 0, 'lastRunAt': None}
+
+    # ========== LIFECYCLE ==========
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        is_background.set(True)
+        while True:
+            try:
+                if await self._hold_lease():
+                    await self.refresh_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning(f"Tracking refresh failed: {str(error)}")
+
+            await asyncio.sleep(self.tick_seconds)
+
+    async def _hold_lease(self) -> bool:
+        """Acquire or renew the Redis leader lease; always True without Redis or a shared store"""
+        redis = get_redis()
+        if redis is None or not isinstance(self.store, SQLLetterStore):
+            return True
+
+        ttl = max(int(self.tick_seconds * 3), 30)
+        try:
+            if await redis.set(LEADER_KEY, self.worker_id, nx=True, ex=ttl):
+                return True
+            if await redis.get(LEADER_KEY) == self.worker_id:
+                await redis.expire(LEADER_KEY, ttl)
+                return True
+            return False
+        except Exception as error:
+            logger.warning(f"Tracking refresher lease unavailable: {str(error)}")
+            return True
+
+    # ========== SCHEDULING ==========
+
+    def next_poll_at(self, state: Dict, now: datetime) -> Optional[datetime]:
+        """When to poll a tracking number next, or None to stop"""
+        if now - (state['sent_at'] or now) > self.max_age:
+            return None
+
+        if now - state['last_change_at'] > self.stale_after:
+            return now + self.stale_interval
+
+        expected = state.get('expected_delivery')
+        if expected is not None and expected - now <= timedelta(days=1):
+            return now + self.near_interval
+
+        return now + self.default_interval
+
+    async def refresh_due(self, now: Optional[datetime] = None) -> Dict:
+        """Poll every in-transit tracking number that is due"""
+        now = now or datetime.now()
+        by_tracking: Dict[str, List[Dict]] = {}
+        for letter in await self.store.get_letters_in_transit():
+            by_tracking.setdefault(letter['tracking_number'], []).append(letter)
+
+        for tracking_number in list(self._schedule):
+            if tracking_number not in by_tracking:
+                del self._schedule[tracking_number]
+
+        due = []
+        for tracking_number, letters in by_tracking.items():
+            state = self._schedule.get(tracking_number)
+            if state is None:
+                sent_at = _parse_time(min((letter['sent_at'] for letter in letters if letter['sent_at']), default=None))
+                state = self._schedule[tracking_number] = {
+                    'next_poll_at': now,
+                    'last_change_at': sent_at or now,
+                    'sent_at': sent_at,
+                    'expected_delivery': None,
+                    'seen': None
+                }
+            if state['next_poll_at'] is not None and state['next_poll_at'] <= now:
+                due.append(tracking_number)
+
+        semaphore = asyncio.Semaphore(self.service.batch_concurrency)
+
+        async def refresh(tracking_number: str) -> None:
+            async with semaphore:
+                try:
+                    await self._refresh(tracking_number, by_tracking[tracking_number], now)
+                except Exception as error:
+                    # One bad tracking number must not stop the rest of the batch
+                    logger.warning(f"Tracking refresh for {tracking_number} failed: {str(error)}")
+                    self.stats_counters['errors'] += 1
+                    if tracking_number in self._schedule:
+                        self._schedule[tracking_number]['next_poll_at'] = now + self.near_interval
+
+        for start in range(0, len(due), self.batch_size):
+            await asyncio.gather(*(refresh(number) for number in due[start:start + self.batch_size]))
+
+        self.stats_counters['lastRunAt'] = now.isoformat()
+        return {'inTransit': len(by_tracking), 'polled': len(due)}
+
+    async def _refresh(self, tracking_number: str, letters: List[Dict], now: datetime) -> None:
+        """Poll one tracking number and store what changed"""
+        state = self._schedule[tracking_number]
+        self.stats_counters['polls'] += 1
+
+        result = await self.service.track_package(tracking_number)
+        if not result.get('success'):
+            self.stats_counters['errors'] += 1
+            state['next_poll_at'] = now + self.near_interval
+            return
+
+        if state['seen'] is None:
+            stored = await self.store.get_tracking_events(letters[0]['id'])
+            state['seen'] = {(event.get('metadata') or {}).get('eventKey') for event in stored}
+
+        new_events = [event for event in result.get('trackingEvents') or [] if event_key(event) not in state['seen']]
+        new_events.sort(key=lambda event: str(event.get('eventTimestamp') or ''))
+
+        for event in new_events:
+            key = event_key(event)
+            status = 'delivered' if is_delivery_event(event) else 'in_transit'
+            for letter in letters:
+                await self.store.add_tracking_event(
+                    letter['id'],
+                    status,
+                    event.get('eventType'),
+                    {'trackingNumber': tracking_number, 'eventKey': key, 'event': event}
+                )
+            state['seen'].add(key)
+            self.stats_counters['eventsWritten'] += len(letters)
+
+        if new_events:
+            state['last_change_at'] = now
+        state['expected_delivery'] = _parse_time(result.get('expectedDeliveryDate')) or state['expected_delivery']
+
+        if is_delivered(result):
+            delivered_at = (
+                _parse_time(result.get('deliveryDate'))
+                or _parse_time(new_events[-1].get('eventTimestamp') if new_events else None)
+                or now
+            )
+            for letter in letters:
+                await self.store.update_letter(letter['id'], status='delivered', delivered_at=delivered_at)
+            self.stats_counters['delivered'] += 1
+            del self._schedule[tracking_number]
+            return
+
+        state['next_poll_at'] = self.next_poll_at(state, now)
+
+    # ========== STORED STATE ==========
+
+    async def get_stored(self, tracking_number: str) -> Optional[Dict]:
+        """Tracking state from letter_tracking, in the shape of track_package"""
+        letters = await self.store.get_letters_by_tracking(tracking_number)
+        if not letters:
+            return None
+
+        letter = letters[0]
+        stored = [
+            event for event in await self.store.get_tracking_events(letter['id'])
+            if (event.get('metadata') or {}).get('eventKey')
+        ]
+        state = self._schedule.get(tracking_number, {})
+
+        return {
+            'success': True,
+            'trackingNumber': tracking_number,
+            'status': stored[-1]['status'] if stored else letter['status'],
+            'trackingEvents': [event['metadata']['event'] for event in reversed(stored)],
+            'deliveryDate': letter['delivered_at'].isoformat() if letter.get('delivered_at') else None,
+            'nextRefreshAt': state['next_poll_at'].isoformat() if state.get('next_poll_at') else None,
+            'lastUpdate': stored[-1]['created_at'].isoformat() if stored else None,
+            'source': 'stored'
+        }
+
+    def stats(self) -> Dict:
+        return {
+            'enabled': self.enabled,
+            'running': self._task is not None,
+            'scheduled': len(self._schedule),
+            **self.stats_counters
+        }
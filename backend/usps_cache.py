@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Rick Jefferson Solutions - USPS Response Caches
+Caching layers that let USPSService answer repeat lookups without a network call
+
+Features:
+- Canonical address normalization (case, whitespace, suffixes, units, ZIP5)
+- In-memory LRU cache with per-entry TTL
+- Address verification cache with an optional persistent (Redis) tier
+- Pricing and service-standards memoization keyed by ZIP3 lanes
+
+Cached results are nested dicts, so they are deep-copied on the way in and
+on every hit; callers may modify what they get back without changing the
+cached entry.
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import os
+import re
+import json
+import math
+import time
+import copy
+import bisect
+import hashlib
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from metrics import record_cache_lookup
+from redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# USPS Publication 28 street suffix abbreviations (most common forms)
+STREET_SUFFIXES = {
+    'ALLEY': 'ALY', 'AVENUE': 'AVE', 'AV': 'AVE', 'BOULEVARD': 'BLVD', 'BOULV': 'BLVD',
+    'CIRCLE': 'CIR', 'COURT': 'CT', 'COVE': 'CV', 'CROSSING': 'XING', 'DRIVE': 'DR',
+    'EXPRESSWAY': 'EXPY', 'FREEWAY': 'FWY', 'HIGHWAY': 'HWY', 'LANE': 'LN', 'LOOP': 'LOOP',
+    'PARKWAY': 'PKWY', 'PARKWY': 'PKWY', 'PKY': 'PKWY', 'PLACE': 'PL', 'PLAZA': 'PLZ',
+    'POINT': 'PT', 'ROAD': 'RD', 'ROUTE': 'RTE', 'SQUARE': 'SQ', 'STREET': 'ST', 'STR': 'ST',
+    'TERRACE': 'TER', 'TRAIL': 'TRL', 'TURNPIKE': 'TPKE', 'WAY': 'WAY'
+}
+
+DIRECTIONALS = {
+    'NORTH': 'N', 'SOUTH': 'S', 'EAST': 'E', 'WEST': 'W',
+    'NORTHEAST': 'NE', 'NORTHWEST': 'NW', 'SOUTHEAST': 'SE', 'SOUTHWEST': 'SW'
+}
+
+# USPS Publication 28 secondary unit designators
+UNIT_DESIGNATORS = {
+    'APARTMENT': 'APT', 'BUILDING': 'BLDG', 'DEPARTMENT': 'DEPT', 'FLOOR': 'FL',
+    'OFFICE': 'OFC', 'ROOM': 'RM', 'SPACE': 'SPC', 'SUITE': 'STE', 'TRAILER': 'TRLR',
+    'UNIT': 'UNIT', 'NUMBER': '#'
+}
+
+CITY_WORDS = {'SAINT': 'ST', 'FORT': 'FT', 'MOUNT': 'MT'}
+
+STREET_TOKENS = {**STREET_SUFFIXES, **DIRECTIONALS, **UNIT_DESIGNATORS}
+
+_PO_BOX = re.compile(r'\b(?:P\s*O|POST\s+OFFICE)\s+BOX\b')
+_TOKEN = re.compile(r'[A-Z0-9/\-]+|#')
+
+
+def _normalize_text(text: Optional[str], table: Dict[str, str]) -> str:
+    """Uppercase, strip punctuation and abbreviate tokens using table"""
+    if not text:
+        return ''
+    text = text.upper().replace('.', ' ').replace(',', ' ')
+    text = _PO_BOX.sub('PO BOX', text)
+    return ' '.join(table.get(token, token) for token in _TOKEN.findall(text))
+
+
+def normalize_address(address: Union[Dict[str, Any], Any]) -> str:
+    """
+    Canonical form of an address for use as a cache key.
+
+    Street and secondary lines are merged so that a unit written on either
+    line produces the same key. Accepts a USPSAddress or an address dict.
+    """
+    fields = address if isinstance(address, dict) else address.dict()
+
+    street_line = f"{fields.get('streetAddress') or ''} {fields.get('secondaryAddress') or ''}"
+    zip_digits = re.sub(r'\D', '', fields.get('zipCode') or '')
+
+    return '|'.join([
+        _normalize_text(street_line, STREET_TOKENS),
+        _normalize_text(fields.get('cityName'), CITY_WORDS),
+        (fields.get('state') or '').strip().upper(),
+        zip_digits[:5]
+    ])
+
+
+class LRUTTLCache:
+    """Bounded in-memory LRU cache whose entries expire after a TTL"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return default
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Any, value: Any, expires_at: Optional[float] = None) -> None:
+        if expires_at is None:
+            expires_at = time.time() + self.ttl_seconds
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class AddressVerificationCache:
+    """Two-tier cache of successful USPS address verifications"""
+
+    def __init__(self):
+        self.ttl_seconds = int(os.getenv('USPS_ADDRESS_CACHE_TTL_SECONDS', '604800'))
+        self.persistent_enabled = os.getenv('USPS_ADDRESS_CACHE_PERSISTENT', 'true').lower() == 'true'
+        self.memory = LRUTTLCache(
+            max_entries=int(os.getenv('USPS_ADDRESS_CACHE_SIZE', '50000')),
+            ttl_seconds=self.ttl_seconds
+        )
+        self.hits_memory = 0
+        self.hits_persistent = 0
+        self.misses = 0
+        self.stores = 0
+
+    @staticmethod
+    def _persistent_key(key: str) -> str:
+        return f"usps:address:{hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]}"
+
+    async def get(self, address: Any) -> Optional[Dict]:
+        """Cached verification result for address, or None"""
+        key = normalize_address(address)
+
+        result = self.memory.get(key)
+        if result is not None:
+            self.hits_memory += 1
+            record_cache_lookup('usps_address', True)
+            return copy.deepcopy(result)
+
+        redis = get_redis() if self.persistent_enabled else None
+        if redis is not None:
+            try:
+                raw = await redis.get(self._persistent_key(key))
+                if raw:
+                    result = json.loads(raw)
+                    self.memory.set(key, copy.deepcopy(result))
+                    self.hits_persistent += 1
+                    record_cache_lookup('usps_address', True)
+                    return result
+            except Exception as error:
+                logger.warning(f"Persistent address cache unavailable: {str(error)}")
+
+        self.misses += 1
+        record_cache_lookup('usps_address', False)
+        return None
+
+    async def set(self, address: Any, result: Dict) -> None:
+        """Store a successful verification result"""
+        key = normalize_address(address)
+        self.memory.set(key, copy.deepcopy(result))
+        self.stores += 1
+
+        redis = get_redis() if self.persistent_enabled else None
+        if redis is not None:
+            try:
+                await redis.set(self._persistent_key(key), json.dumps(result), ex=self.ttl_seconds)
+            except Exception as error:
+                logger.warning(f"Failed to persist address verification: {str(error)}")
+
+    def stats(self) -> Dict:
+        """Hit/miss metrics for the cache"""
+        lookups = self.hits_memory + self.hits_persistent + self.misses
+        return {
+            'entries': len(self.memory),
+            'hitsMemory': self.hits_memory,
+            'hitsPersistent': self.hits_persistent,
+            'misses': self.misses,
+            'stores': self.stores,
+            'hitRate': round((self.hits_memory + self.hits_persistent) / lookups, 4) if lookups else None
+        }
+
+
+def weight_band(weight_oz: float) -> float:
+    """
+    Price band for a weight in ounces.
+
+    Half ounces below one pound (USPS letter, flat and Ground Advantage
+    price breaks all fall on whole ounces or 3.5 oz), whole pounds above.
+    """
+    if weight_oz < 16:
+        return max(math.ceil(weight_oz * 2) / 2, 0.5)
+    return math.ceil(weight_oz / 16) * 16.0
+
+
+def dimensions_bucket(length: Optional[float], width: Optional[float],
+                      height: Optional[float]) -> Optional[Tuple[float, ...]]:
+    """Dimensions rounded up to the eighth inch, longest side first"""
+    if not any((length, width, height)):
+        return None
+    return tuple(sorted((math.ceil((d or 0) * 8) / 8 for d in (length, width, height)), reverse=True))
+
+
+def lane_key(origin_zip: str, destination_zip: str, mail_class: Optional[str],
+             weight_oz: Optional[float] = None, length: Optional[float] = None,
+             width: Optional[float] = None, height: Optional[float] = None) -> Tuple:
+    """
+    Cache key for a mailing lane.
+
+    USPS zones and service standards are defined between 3-digit ZIP
+    prefixes, so every ZIP in the same pair of ZIP3 areas shares a price.
+    """
+    return (
+        re.sub(r'\D', '', origin_zip or '')[:3],
+        re.sub(r'\D', '', destination_zip or '')[:3],
+        weight_band(weight_oz) if weight_oz is not None else None,
+        mail_class,
+        dimensions_bucket(length, width, height)
+    )
+
+
+def parse_rate_change_dates(value: Optional[str]) -> List[float]:
+    """Parse comma-separated ISO dates (local midnight) into sorted timestamps"""
+    dates = []
+    for item in (value or '').split(','):
+        item = item.strip()
+        if item:
+            dates.append(datetime.fromisoformat(item).timestamp())
+    return sorted(dates)
+
+
+class LaneCache:
+    """
+    Memoized USPS lookups keyed by lane.
+
+    Entries expire after a TTL and never outlive the next USPS rate-change
+    date, so cached prices are dropped the moment new rates take effect.
+    """
+
+    def __init__(self, name: str, ttl_seconds: Optional[int] = None, rate_change_dates: Optional[List[float]] = None):
+        self.name = name
+        self.ttl_seconds = ttl_seconds or int(os.getenv('USPS_LANE_CACHE_TTL_SECONDS', '86400'))
+        self.rate_change_dates = (
+            rate_change_dates if rate_change_dates is not None
+            else parse_rate_change_dates(os.getenv('USPS_RATE_CHANGE_DATES'))
+        )
+        self.memory = LRUTTLCache(
+            max_entries=int(os.getenv('USPS_LANE_CACHE_SIZE', '10000')),
+            ttl_seconds=self.ttl_seconds
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def _expires_at(self, now: float) -> float:
+        expires_at = now + self.ttl_seconds
+        next_change = bisect.bisect_right(self.rate_change_dates, now)
+        if next_change < len(self.rate_change_dates):
+            expires_at = min(expires_at, self.rate_change_dates[next_change])
+        return expires_at
+
+    def get(self, key: Tuple) -> Optional[Dict]:
+        result = self.memory.get(key)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        record_cache_lookup(f"usps_{self.name.replace('-', '_')}", result is not None)
+        return copy.deepcopy(result)
+
+    def set(self, key: Tuple, result: Dict) -> None:
+        self.memory.set(key, copy.deepcopy(result), expires_at=self._expires_at(time.time()))
+
+    def invalidate(self) -> None:
+        """Drop every cached lane (e.g. after loading new rate tables)"""
+        self.memory.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.memory),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hitRate': round(self.hits / lookups, 4) if lookups else None
+        }
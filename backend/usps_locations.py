@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Rick Jefferson Solutions - Offline Post-Office Locator
+Local, spatially indexed copy of USPS post-office locations
+
+Post offices returned by /locations/v3/post-offices are kept in a grid
+index over latitude/longitude and persisted to data/usps_locations.json.
+Each live lookup also records the circle it covered (ZIP centroid plus
+radius). A later radius query is answered locally when its circle lies
+inside a fresh covered circle, or always once a complete national dataset
+has been loaded. Anything else falls back to the live API, which then adds
+coverage. Covered circles are refreshed in the background before they go
+stale, and offices USPS no longer returns are dropped.
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import os
+import json
+import math
+import time
+import logging
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from zip_database import zip5, zip_database
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE_LATITUDE = 69.0
+
+DEFAULT_LOCATIONS_FILE = Path(__file__).parent / 'data' / 'usps_locations.json'
+
+
+def haversine_miles(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in miles"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(a)))
+
+
+def location_coordinates(location: Dict) -> Optional[Tuple[float, float]]:
+    """(latitude, longitude) of a USPS location record"""
+    for source in (location, location.get('geoLocation') or {}, location.get('coordinates') or {}):
+        latitude = source.get('latitude', source.get('lat'))
+        longitude = source.get('longitude', source.get('lng', source.get('long')))
+        if latitude is not None and longitude is not None:
+            try:
+                return float(latitude), float(longitude)
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+def location_zip(location: Dict) -> Optional[str]:
+    address = location.get('address') or {}
+    return zip5(location.get('ZIPCode') or location.get('zipCode') or location.get('ZIP5')
+                or address.get('ZIPCode') or address.get('zipCode'))
+
+
+def location_id(location: Dict) -> str:
+    """Stable identity of a USPS location record"""
+    for key in ('locationID', 'locationId', 'facilityID', 'id'):
+        if location.get(key):
+            return str(location[key])
+    coordinates = location_coordinates(location) or (0.0, 0.0)
+    name = location.get('locationName') or location.get('name') or ''
+    return f"{name}|{location_zip(location)}|{coordinates[0]:.5f},{coordinates[1]:.5f}"
+
+
+class GridIndex:
+    """Uniform latitude/longitude grid for radius queries"""
+
+    def __init__(self, cell_degrees: float = 0.25):
+        self.cell_degrees = cell_degrees
+        self._cells: Dict[Tuple[int, int], List[str]] = defaultdict(list)
+        self._points: Dict[str, Tuple[float, float, Any]] = {}
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return math.floor(latitude / self.cell_degrees), math.floor(longitude / self.cell_degrees)
+
+    def add(self, key: str, latitude: float, longitude: float, value: Any) -> None:
+        self.remove(key)
+        self._points[key] = (latitude, longitude, value)
+        self._cells[self._cell(latitude, longitude)].append(key)
+
+    def remove(self, key: str) -> None:
+        point = self._points.pop(key, None)
+        if point is not None:
+            cell = self._cells[self._cell(point[0], point[1])]
+            cell.remove(key)
+
+    def query(self, latitude: float, longitude: float, radius_miles: float) -> List[Tuple[float, str, Any]]:
+        """(distance, key, value) for every point within radius, nearest first"""
+        dlat = radius_miles / MILES_PER_DEGREE_LATITUDE
+        dlon = radius_miles / (MILES_PER_DEGREE_LATITUDE * max(math.cos(math.radians(latitude)), 0.01))
+        min_i, min_j = self._cell(latitude - dlat, longitude - dlon)
+        max_i, max_j = self._cell(latitude + dlat, longitude + dlon)
+
+        results = []
+        for i in range(min_i, max_i + 1):
+            for j in range(min_j, max_j + 1):
+                for key in self._cells.get((i, j), ()):
+                    point_lat, point_lon, value = self._points[key]
+                    distance = haversine_miles(latitude, longitude, point_lat, point_lon)
+                    if distance <= radius_miles:
+                        results.append((distance, key, value))
+
+        results.sort(key=lambda result: result[0])
+        return results
+
+    def values(self):
+        return (value for _, _, value in self._points.values())
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+
+class LocationDirectory:
+    """Local post-office dataset with coverage tracking"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or os.getenv('USPS_LOCATIONS_FILE') or DEFAULT_LOCATIONS_FILE)
+        self.max_age_seconds = float(os.getenv('USPS_LOCATIONS_MAX_AGE_DAYS', '30')) * 86400
+        self.save_interval_seconds = 60.0
+
+        self.locations = GridIndex()
+        # ZIP -> covered circle {'zip', 'latitude', 'longitude', 'radius', 'fetchedAt'}
+        self.coverage = GridIndex()
+        self.max_coverage_radius = 0.0
+        self.complete_at: Optional[float] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self._saved_at = 0.0
+        self._load()
+
+    # ========== PERSISTENCE ==========
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as error:
+            logger.warning(f"Could not load post-office dataset {self.path}: {str(error)}")
+            return
+
+        self.complete_at = snapshot.get('completeAt')
+        for location in snapshot.get('locations', []):
+            self._add_location(location)
+        for circle in snapshot.get('coverage', []):
+            self._add_coverage(circle)
+        logger.info(f"Loaded {len(self.locations)} post offices and {len(self.coverage)} covered areas")
+
+    def snapshot(self) -> Dict:
+        """Serializable copy of the dataset; clears the unsaved-changes flag"""
+        self.dirty = False
+        return {
+            'completeAt': self.complete_at,
+            'locations': list(self.locations.values()),
+            'coverage': list(self.coverage.values())
+        }
+
+    def save(self, snapshot: Optional[Dict] = None) -> None:
+        """Write the dataset (or a snapshot taken earlier) to disk atomically"""
+        snapshot = snapshot or self.snapshot()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self.path)
+        self._saved_at = time.time()
+
+    def save_due(self) -> bool:
+        """True when there are unsaved changes and the last save is a while ago"""
+        return self.dirty and time.time() - self._saved_at >= self.save_interval_seconds
+
+    # ========== INDEX ==========
+
+    def _add_location(self, location: Dict) -> Optional[Tuple[float, float]]:
+        coordinates = location_coordinates(location)
+        if coordinates is None:
+            return None
+        location = {key: value for key, value in location.items() if key != 'distance'}
+        self.locations.add(location_id(location), coordinates[0], coordinates[1], location)
+        return coordinates
+
+    def _add_coverage(self, circle: Dict) -> None:
+        self.coverage.add(circle['zip'], circle['latitude'], circle['longitude'], circle)
+        self.max_coverage_radius = max(self.max_coverage_radius, circle['radius'])
+
+    def _fresh(self, fetched_at: Optional[float], now: float) -> bool:
+        return fetched_at is not None and now - fetched_at < self.max_age_seconds
+
+    def covers(self, latitude: float, longitude: float, radius: float, now: Optional[float] = None) -> bool:
+        """True when every office within radius is known to be in the dataset"""
+        now = now or time.time()
+        if self._fresh(self.complete_at, now):
+            return True
+
+        for distance, _, circle in self.coverage.query(latitude, longitude, self.max_coverage_radius):
+            if distance + radius <= circle['radius'] and self._fresh(circle['fetchedAt'], now):
+                return True
+        return False
+
+    # ========== QUERIES ==========
+
+    def lookup(self, zip_code: str, radius: float) -> Optional[List[Dict]]:
+        """Offices within radius miles of a ZIP, nearest first, or None on a miss"""
+        centroid = zip_database.centroid(zip_code)
+        if centroid is None or not self.covers(centroid[0], centroid[1], radius):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return [
+            {**location, 'distance': round(distance, 2)}
+            for distance, _, location in self.locations.query(centroid[0], centroid[1], radius)
+        ]
+
+    def ingest(self, zip_code: str, radius: float, locations: List[Dict]) -> None:
+        """Record a live API answer for (zip_code, radius) and the area it covers"""
+        for location in locations:
+            coordinates = self._add_location(location)
+            if coordinates is not None:
+                zip_database.learn_centroid(location_zip(location), *coordinates)
+
+        centroid = zip_database.centroid(zip_code)
+        if centroid is None:
+            return
+
+        # Offices inside the covered circle that USPS no longer returns are gone
+        returned = {location_id(location) for location in locations}
+        for _, key, _ in self.locations.query(centroid[0], centroid[1], radius):
+            if key not in returned:
+                self.locations.remove(key)
+
+        existing = self.coverage.query(centroid[0], centroid[1], 0)
+        if not any(circle['zip'] == zip5(zip_code) and circle['radius'] > radius for _, _, circle in existing):
+            self._add_coverage({
+                'zip': zip5(zip_code),
+                'latitude': centroid[0],
+                'longitude': centroid[1],
+                'radius': radius,
+                'fetchedAt': time.time()
+            })
+
+        self.dirty = True
+
+    def due_for_refresh(self, limit: int, now: Optional[float] = None) -> List[Dict]:
+        """Covered areas that will go stale within a day, oldest first"""
+        now = now or time.time()
+        refresh_before = now - self.max_age_seconds + 86400
+        due = [circle for circle in self.coverage.values() if circle['fetchedAt'] <= refresh_before]
+        due.sort(key=lambda circle: circle['fetchedAt'])
+        return due[:limit]
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'locations': len(self.locations),
+            'coveredAreas': len(self.coverage),
+            'complete': self._fresh(self.complete_at, time.time()),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hitRate': round(self.hits / lookups, 4) if lookups else None
+        }
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Rick Jefferson Solutions - USPS Quota Manager
+Client-side token bucket in front of every USPS API call
+
+One bucket holds the account's request quota (USPS_QUOTA_PER_HOUR, with
+USPS_QUOTA_BURST tokens of headroom). Each request class may only take a
+token while the bucket is above its floor, so as the quota runs low the
+lower classes wait first:
+
+    label creation > address verification > pricing > tracking
+
+Requests made by background work (mailing jobs, tracking refresh, dataset
+refreshes) keep an extra reserve free for interactive traffic. Code marks
+itself as background with `with background_work():` or by setting
+`is_background` at the start of a task. A waiting request re-reads the flag,
+so clearing it in the request's context (as request coalescing does when an
+interactive caller joins) promotes it.
+
+With Redis configured the bucket lives in Redis (updated by a Lua script
+using the Redis clock) and is shared by every API worker; otherwise it is
+process-local.
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import os
+import time
+import asyncio
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from redis_client import get_redis
+from usps_resilience import USPSAPIError
+
+logger = logging.getLogger(__name__)
+
+BUCKET_KEY = 'usps:quota:bucket'
+
+# Request class per endpoint path prefix, highest priority first
+REQUEST_CLASSES = {
+    '/labels/': 'label',
+    '/addresses/': 'address',
+    '/prices/': 'pricing',
+    '/service-standards/': 'pricing',
+    '/tracking/': 'tracking',
+    '/locations/': 'tracking'
+}
+
+# Share of the bucket each class leaves for the classes above it
+DEFAULT_FLOORS = {'label': 0.0, 'address': 0.1, 'pricing': 0.25, 'tracking': 0.4}
+
+is_background: ContextVar[bool] = ContextVar('usps_background_work', default=False)
+
+
+@contextmanager
+def background_work():
+    """Mark USPS calls made inside the block as background work"""
+    token = is_background.set(True)
+    try:
+        yield
+    finally:
+        is_background.reset(token)
+
+
+class QuotaExceededError(USPSAPIError):
+    """Raised when a request would wait longer than the allowed maximum for quota"""
+
+
+# KEYS[1] bucket hash; ARGV rate/s, capacity, floor tokens, initial tokens
+# Returns {1, 0} when a token was taken, else {0, milliseconds until one may be}
+TAKE_TOKEN_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local floor = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or tonumber(ARGV[4])
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+local wait_ms = 0
+if tokens - 1 >= floor then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait_ms = math.ceil((floor + 1 - tokens) / rate * 1000)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return {allowed, wait_ms}
+"""
+
+
+class QuotaManager:
+    """Token bucket with per-class priority floors"""
+
+    def __init__(self, per_hour: Optional[float] = None, burst: Optional[float] = None):
+        self.per_hour = per_hour if per_hour is not None else float(os.getenv('USPS_QUOTA_PER_HOUR', '6000'))
+        self.enabled = self.per_hour > 0
+        self.rate = self.per_hour / 3600
+        self.capacity = burst or float(os.getenv('USPS_QUOTA_BURST', '100'))
+        self.background_reserve = float(os.getenv('USPS_QUOTA_BACKGROUND_RESERVE', '0.2'))
+        self.max_wait = float(os.getenv('USPS_QUOTA_MAX_WAIT_SECONDS', '60'))
+        self.floors = DEFAULT_FLOORS
+
+        # Process-local bucket used without Redis
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+        self.counters: Dict[str, Dict] = {}
+
+    def request_class(self, endpoint: str) -> str:
+        for prefix, request_class in REQUEST_CLASSES.items():
+            if endpoint.startswith(prefix):
+                return request_class
+        return 'tracking'
+
+    def floor_tokens(self, request_class: str, background: bool) -> float:
+        """Tokens that must stay in the bucket after this class takes one"""
+        share = self.floors.get(request_class, max(self.floors.values()))
+        if background:
+            share += self.background_reserve
+        return min(share, 0.95) * self.capacity
+
+    def _take_local(self, floor: float) -> Tuple[bool, float]:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens - 1 >= floor:
+            self.tokens -= 1
+            return True, 0.0
+        return False, (floor + 1 - self.tokens) / self.rate
+
+    async def _take(self, floor: float) -> Tuple[bool, float]:
+        redis = get_redis()
+        if redis is not None:
+            try:
+                allowed, wait_ms = await redis.eval(
+                    TAKE_TOKEN_SCRIPT, 1, BUCKET_KEY, self.rate, self.capacity, floor, self.capacity
+                )
+                return bool(int(allowed)), int(wait_ms) / 1000
+            except Exception as error:
+                logger.warning(f"Shared USPS quota unavailable, using local bucket: {str(error)}")
+        return self._take_local(floor)
+
+    async def acquire(self, endpoint: str) -> None:
+        """Wait until endpoint's class may make a request, or raise QuotaExceededError"""
+        if not self.enabled:
+            return
+
+        request_class = self.request_class(endpoint)
+        counters = self.counters.setdefault(request_class, {
+            'granted': 0, 'waited': 0, 'waitSeconds': 0.0, 'rejected': 0, 'background': 0
+        })
+
+        started = time.monotonic()
+        waited = False
+        while True:
+            background = is_background.get()
+            allowed, wait = await self._take(self.floor_tokens(request_class, background))
+            if allowed:
+                break
+
+            elapsed = time.monotonic() - started
+            if elapsed + wait > self.max_wait:
+                counters['rejected'] += 1
+                raise QuotaExceededError(
+                    f"USPS request quota exhausted for {request_class} requests",
+                    retry_after=wait,
+                    endpoint=endpoint,
+                    unsent=True
+                )
+
+            waited = True
+            # Re-check often: higher classes may drain the bucket meanwhile
+            await asyncio.sleep(min(wait, 1.0))
+
+        counters['granted'] += 1
+        counters['background'] += int(background)
+        if waited:
+            counters['waited'] += 1
+            counters['waitSeconds'] += time.monotonic() - started
+
+    async def throttled(self, retry_after: Optional[float]) -> None:
+        """USPS answered 429: empty the bucket so every worker backs off"""
+        if not self.enabled:
+            return
+
+        drained_tokens = -(retry_after or 0) * self.rate
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await redis.hset(BUCKET_KEY, mapping={'tokens': drained_tokens, 'updated': (await redis.time())[0]})
+                return
+            except Exception as error:
+                logger.warning(f"Shared USPS quota unavailable: {str(error)}")
+        self.tokens = drained_tokens
+        self.updated = time.monotonic()
+
+    def stats(self) -> Dict:
+        return {
+            'enabled': self.enabled,
+            'perHour': self.per_hour,
+            'burst': self.capacity,
+            'shared': get_redis() is not None,
+            'localTokens': round(min(self.capacity, self.tokens + (time.monotonic() - self.updated) * self.rate), 2)
+            if self.enabled else None,
+            'classes': {
+                request_class: {**counters, 'waitSeconds': round(counters['waitSeconds'], 3)}
+                for request_class, counters in self.counters.items()
+            }
+        }
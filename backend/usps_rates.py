@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Rick Jefferson Solutions - Offline USPS Rate Tables
+Computes postage locally from versioned snapshots of the USPS price lists
+
+Snapshots live in data/usps_rates/<effective-date>.json. The newest
+snapshot whose effective date has passed is the active one, so dropping in
+the next price list ahead of a rate change switches over automatically.
+
+Features:
+- First-Class Mail letter and flat prices by weight
+- Zone charts and zoned prices for mail classes that have them
+- Special-service fees (CERTIFIED_MAIL, RETURN_RECEIPT, ...)
+- Letter weight estimate from page count
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import os
+import json
+import math
+import logging
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE_TABLE_DIR = Path(__file__).parent / 'data' / 'usps_rates'
+
+# 20 lb bond letter sheet and a #10 business envelope
+SHEET_WEIGHT_OZ = 0.16
+ENVELOPE_WEIGHT_OZ = 0.2
+
+
+# First-Class Mail weight limits: letters to 3.5 oz, flats (large envelopes) to 13 oz
+LETTER_MAX_WEIGHT_OZ = 3.5
+FLAT_MAX_WEIGHT_OZ = 13.0
+
+
+def max_pages(max_weight_oz: float) -> int:
+    """Most simplex pages whose estimated letter weight stays within max_weight_oz"""
+    return int(round((max_weight_oz - ENVELOPE_WEIGHT_OZ) / SHEET_WEIGHT_OZ, 6))
+
+
+def letter_weight_oz(page_count: int, duplex: bool = False) -> float:
+    """Estimated weight of a mailed letter with page_count printed pages"""
+    sheets = math.ceil(page_count / 2) if duplex else page_count
+    return round(ENVELOPE_WEIGHT_OZ + SHEET_WEIGHT_OZ * max(sheets, 1), 2)
+
+
+def _money(value) -> Decimal:
+    return Decimal(str(value)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+class RateTable:
+    """One versioned USPS price list snapshot"""
+
+    def __init__(self, snapshot: Dict):
+        self.version = snapshot['version']
+        self.effective_date = date.fromisoformat(snapshot['effectiveDate'])
+        self.currency = snapshot.get('currency', 'USD')
+        self.source = snapshot.get('source')
+        self.mail_classes = snapshot.get('mailClasses', {})
+        self.special_services = {name: _money(fee) for name, fee in snapshot.get('specialServices', {}).items()}
+        self.zoned_prices = snapshot.get('zonedPrices', {})
+
+        # origin ZIP3 -> sorted [(dest ZIP3 start, dest ZIP3 end, zone)]
+        self.zone_charts = {
+            origin: sorted((int(start), int(end), int(zone)) for start, end, zone in ranges)
+            for origin, ranges in snapshot.get('zoneCharts', {}).items()
+        }
+
+    @classmethod
+    def load(cls, path: Path) -> 'RateTable':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def zone(self, origin_zip: str, destination_zip: str) -> Optional[int]:
+        """USPS zone between two ZIPs, or None when the chart is not loaded"""
+        ranges = self.zone_charts.get((origin_zip or '')[:3])
+        if not ranges or not (destination_zip or '')[:3].isdigit():
+            return None
+
+        destination = int(destination_zip[:3])
+        for start, end, zone in ranges:
+            if start <= destination <= end:
+                return zone
+        return None
+
+    def _shape(self, mail_class: str, weight_oz: float, length: Optional[float],
+               width: Optional[float], height: Optional[float]) -> Optional[str]:
+        """Pick the first processing category (letters, flats, ...) whose limits fit"""
+        dimensions = sorted((d for d in (length, width, height) if d), reverse=True)
+        for shape, limits in self.mail_classes.get(mail_class, {}).items():
+            if weight_oz > limits['maxWeightOz']:
+                continue
+            maximums = limits.get('maxDimensionsIn')
+            if dimensions and maximums and any(d > m for d, m in zip(dimensions, maximums)):
+                continue
+            return shape
+        return None
+
+    def price(self, mail_class: str, weight_oz: float, origin_zip: Optional[str] = None,
+              destination_zip: Optional[str] = None, length: Optional[float] = None,
+              width: Optional[float] = None, height: Optional[float] = None,
+              special_services: Optional[List[str]] = None) -> Optional[Dict]:
+        """
+        Postage for one piece, or None when this snapshot cannot price it
+        (unknown mail class, zone chart not loaded, unknown extra service).
+        """
+        zone = None
+        shape = self._shape(mail_class, weight_oz, length, width, height)
+
+        if shape is not None:
+            limits = self.mail_classes[mail_class][shape]
+            ounces = max(math.ceil(weight_oz), 1)
+            base = _money(limits['firstOunce']) + _money(limits['additionalOunce']) * (ounces - 1)
+        elif mail_class in self.zoned_prices:
+            zone = self.zone(origin_zip, destination_zip)
+            if zone is None:
+                return None
+            bands = self.zoned_prices[mail_class]
+            band = next((b for b in bands['weightBandsOz'] if weight_oz <= b), None)
+            if band is None:
+                return None
+            base = _money(bands['prices'][str(band)][zone - 1])
+        else:
+            return None
+
+        fees = []
+        for service in special_services or []:
+            if service not in self.special_services:
+                return None
+            fees.append({'name': service, 'price': float(self.special_services[service])})
+
+        total = base + sum((_money(fee['price']) for fee in fees), Decimal('0'))
+
+        return {
+            'mailClass': mail_class,
+            'processingCategory': shape.upper() if shape else None,
+            'zone': zone,
+            'weight': weight_oz,
+            'price': float(base),
+            'fees': fees,
+            'totalPrice': float(total),
+            'rateTableVersion': self.version,
+            'startDate': self.effective_date.isoformat()
+        }
+
+
+def load_rate_table(directory: Optional[Path] = None, on_date: Optional[date] = None) -> Optional[RateTable]:
+    """Load the newest snapshot in effect on on_date (default today)"""
+    directory = Path(directory or os.getenv('USPS_RATE_TABLE_DIR') or DEFAULT_RATE_TABLE_DIR)
+    on_date = on_date or date.today()
+
+    candidates = []
+    for path in directory.glob('*.json'):
+        try:
+            effective = date.fromisoformat(path.stem)
+        except ValueError:
+            continue
+        if effective <= on_date:
+            candidates.append((effective, path))
+
+    if not candidates:
+        logger.warning(f"No USPS rate table in effect found in {directory}")
+        return None
+
+    _, path = max(candidates)
+    table = RateTable.load(path)
+    logger.info(f"Loaded USPS rate table {table.version} from {path.name}")
+    return table
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Rick Jefferson Solutions - USPS API Resilience
+Retry policies and circuit breakers used by USPSService.make_request
+
+Features:
+- Typed USPSAPIError with status code, Retry-After and retryability
+- Per-endpoint retry policies with exponential backoff and full jitter
+- Retry-After honored for 429 and 503 responses
+- Label creation retried only when USPS cannot have processed the request
+- Circuit breaker per USPS API family that fails fast while USPS is down
+  and half-opens to probe recovery
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import os
+import time
+import random
+import logging
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Dict, FrozenSet, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Transport errors raised before the request reached USPS
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class USPSAPIError(Exception):
+    """
+    A failed USPS API call.
+
+    unsent is True only when the request certainly never reached USPS
+    processing (rejected locally, not connected, or answered with a 4xx),
+    so repeating it cannot create a second label.
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None,
+                 retryable: bool = False, endpoint: Optional[str] = None, unsent: bool = False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.retryable = retryable
+        self.endpoint = endpoint
+        self.unsent = unsent
+
+
+class CircuitOpenError(USPSAPIError):
+    """Raised without calling USPS while the circuit breaker is open"""
+
+
+def request_unsent(error: BaseException) -> bool:
+    """True when a failed USPS call provably had no effect at USPS"""
+    return isinstance(error, USPSAPIError) and error.unsent
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((retry_at - datetime.now(retry_at.tzinfo)).total_seconds(), 0.0)
+
+
+class RetryPolicy:
+    """How often and when a USPS endpoint is retried"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 max_retry_after: float = 30.0,
+                 retry_statuses: FrozenSet[int] = frozenset({429, 500, 502, 503, 504}),
+                 retry_unsent_only: bool = False):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.retry_statuses = retry_statuses
+        self.retry_unsent_only = retry_unsent_only
+
+    def retries_status(self, status_code: int) -> bool:
+        if self.retry_unsent_only:
+            # 429 is a rejection before processing; a 5xx may have created the label
+            return status_code == 429
+        return status_code in self.retry_statuses
+
+    def retries_transport_error(self, error: Exception) -> bool:
+        if self.retry_unsent_only:
+            return isinstance(error, NOT_SENT_ERRORS)
+        return isinstance(error, httpx.TransportError)
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """
+        Seconds to sleep before retry number attempt (1-based).
+
+        Exponential backoff with full jitter, never shorter than Retry-After.
+        None when Retry-After asks for longer than max_retry_after.
+        """
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if retry_after is None:
+            return backoff
+        if retry_after > self.max_retry_after:
+            return None
+        return max(retry_after, backoff)
+
+
+def default_retry_policies() -> Dict[str, RetryPolicy]:
+    """Retry policy per endpoint path prefix"""
+    max_attempts = int(os.getenv('USPS_RETRY_MAX_ATTEMPTS', '3'))
+    base_delay = float(os.getenv('USPS_RETRY_BASE_DELAY_SECONDS', '0.5'))
+    max_delay = float(os.getenv('USPS_RETRY_MAX_DELAY_SECONDS', '8'))
+    max_retry_after = float(os.getenv('USPS_RETRY_AFTER_MAX_SECONDS', '30'))
+
+    read = RetryPolicy(max_attempts, base_delay, max_delay, max_retry_after)
+    return {
+        '/addresses/': read,
+        '/prices/': read,
+        '/service-standards/': read,
+        '/locations/': read,
+        '/tracking/': RetryPolicy(2, base_delay, max_delay, max_retry_after),
+        '/labels/': RetryPolicy(max_attempts, base_delay, max_delay, max_retry_after, retry_unsent_only=True)
+    }
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after failure_threshold consecutive failures; open fails
+    fast for reset_timeout seconds, then half-open lets a single probe
+    through. A successful probe closes the circuit, a failed one reopens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or int(os.getenv('USPS_BREAKER_FAILURE_THRESHOLD', '5'))
+        self.reset_timeout = reset_timeout or float(os.getenv('USPS_BREAKER_RESET_SECONDS', '30'))
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go through now"""
+        if self.state == 'closed':
+            return
+
+        if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = 'half_open'
+            self.probe_in_flight = False
+            logger.info(f"USPS circuit '{self.name}' half-open, probing recovery")
+
+        if self.state == 'half_open' and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return
+
+        self.rejected += 1
+        raise CircuitOpenError(
+            f"USPS API request failed: circuit '{self.name}' is open",
+            retry_after=self.retry_in(),
+            endpoint=self.name,
+            unsent=True
+        )
+
+    def record_success(self) -> None:
+        if self.state != 'closed':
+            logger.info(f"USPS circuit '{self.name}' closed")
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == 'half_open' or self.consecutive_failures >= self.failure_threshold:
+            if self.state != 'open':
+                self.times_opened += 1
+                logger.warning(f"USPS circuit '{self.name}' opened after {self.consecutive_failures} failures")
+            self.state = 'open'
+            self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Let another caller probe when the probe call ended without an outcome"""
+        if self.state == 'half_open':
+            self.probe_in_flight = False
+
+    def retry_in(self) -> Optional[float]:
+        """Seconds until the next probe is allowed"""
+        if self.state != 'open':
+            return None
+        return max(self.reset_timeout - (time.monotonic() - self.opened_at), 0.0)
+
+    def stats(self) -> Dict:
+        return {
+            'state': self.state,
+            'consecutiveFailures': self.consecutive_failures,
+            'timesOpened': self.times_opened,
+            'rejected': self.rejected,
+            'retryInSeconds': round(self.retry_in(), 1) if self.retry_in() is not None else None
+        }
@@ -11,6 +11,15 @@ Features:
 - Label generation and printing
 - Package tracking
 - Location finder
+- Pooled keep-alive HTTP client (HTTP/2 when available)
+- Single-flight OAuth token refresh shared across workers
+- Address verification cache keyed on normalized addresses
+- Batch address verification with bounded concurrency
+- Pricing and service-standards memoization by ZIP3 lane
+- Offline postage from versioned USPS rate tables
+- Consolidated envelopes for several disputes to one recipient
+- Per-endpoint retries with backoff and a circuit breaker
+- Content-addressed local label store
 
 @author Rick Jefferson Solutions Development Team
 @version 1.0.0
@@ -20,12 +29,38 @@ Features:
 import os
 import httpx
 import json
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+import asyncio
+import base64
+import copy
+import hashlib
+import time
+import contextvars
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Any, Tuple
 from pydantic import BaseModel
 import logging
 from uuid import uuid4
 from dotenv import load_dotenv
+from metrics import record_external_call
+from redis_client import get_redis
+from label_store import LabelStore
+from usps_cache import AddressVerificationCache, LaneCache, lane_key, normalize_address
+from recipient_registry import RecipientRegistry
+from usps_locations import LocationDirectory
+from usps_quota import QuotaManager, is_background
+from usps_rates import RateTable, letter_weight_oz, load_rate_table
+from usps_resilience import (
+    CircuitBreaker, NOT_SENT_ERRORS, RetryPolicy, USPSAPIError,
+    default_retry_policies, parse_retry_after, request_unsent
+)
+from zip_database import zip_database
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 # Load environment variables from parent directory
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
@@ -66,9 +101,30 @@ class USPSDisputeMailRequest(BaseModel):
     """USPS Dispute letter mailing request model"""
     clientId: str
     disputeId: str
-    recipientAddress: USPSAddress
+    recipientAddress: Optional[USPSAddress] = None
+    recipientId: Optional[str] = None  # Registry recipient (see recipient_registry.py) instead of an address
     letterType: str
     specialServices: Optional[List[str]] = None
+    pageCount: Optional[int] = None
+    disputeIds: Optional[List[str]] = None  # All disputes enclosed when letters share an envelope
+    letterTypes: Optional[List[str]] = None  # Every letter type in a shared envelope
+
+# Rick Jefferson Solutions HQ address (return address for dispute mail)
+HQ_ADDRESS = USPSAddress(
+    streetAddress="5700 W Plano Pkwy",
+    secondaryAddress="Suite 3600",
+    cityName="Frisco",
+    state="TX",
+    zipCode="75093"
+)
+
+DISPUTE_LETTER_MAIL_CLASS = "FIRST_CLASS_MAIL"
+DISPUTE_LETTER_SERVICES = ["CERTIFIED_MAIL", "RETURN_RECEIPT"]
+
+# Read-only endpoints whose identical concurrent calls share one upstream request
+COALESCED_ENDPOINT_PREFIXES = (
+    '/addresses/', '/prices/', '/service-standards/', '/locations/', '/tracking/'
+)
 
 class USPSService:
     """USPS API Integration Service"""
@@ -84,87 +140,607 @@ class USPSService:
         # Token management
         self.access_token = None
         self.token_expires_at = None
+        self.token_refresh_ahead_seconds = int(os.getenv('USPS_TOKEN_REFRESH_AHEAD_SECONDS', '120'))
+        self.token_lifetime_seconds: Optional[float] = None  # usable lifetime of the last fetched token
+        self._token_lock: Optional[asyncio.Lock] = None
+        self._token_lock_loop = None
+        self._token_refresh_task: Optional[asyncio.Task] = None
+        
+        # Long-lived HTTP connection pool (opened/closed via FastAPI lifespan)
+        self.http2 = os.getenv('USPS_HTTP2', 'true').lower() == 'true' and HTTP2_AVAILABLE
+        self.http_limits = httpx.Limits(
+            max_connections=int(os.getenv('USPS_HTTP_MAX_CONNECTIONS', '100')),
+            max_keepalive_connections=int(os.getenv('USPS_HTTP_MAX_KEEPALIVE', '20')),
+            keepalive_expiry=float(os.getenv('USPS_HTTP_KEEPALIVE_EXPIRY', '30'))
+        )
+        self.http_timeout = httpx.Timeout(
+            float(os.getenv('USPS_HTTP_TIMEOUT', '30')),
+            connect=float(os.getenv('USPS_HTTP_CONNECT_TIMEOUT', '5'))
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self._requests_total = 0
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        
+        # In-flight request coalescing
+        self.coalescing_enabled = os.getenv('USPS_COALESCE_REQUESTS', 'true').lower() == 'true'
+        # key -> (shared task, the context it runs in)
+        self._coalesced_calls: Dict[str, Tuple[asyncio.Task, contextvars.Context]] = {}
+        self.coalescing_counters = {'requests': 0, 'coalesced': 0}
+        
+        # Response caches
+        self.address_cache = AddressVerificationCache()
+        self.prevalidation_counters = {'rejected': 0, 'corrected': 0, 'warned': 0}
+        self.pricing_cache = LaneCache('pricing')
+        self.service_standards_cache = LaneCache('service-standards')
+        self.batch_concurrency = int(os.getenv('USPS_BATCH_CONCURRENCY', '10'))
+        
+        # Local label store (labels are downloaded once)
+        self.label_store_enabled = os.getenv('USPS_LABEL_STORE_ENABLED', 'true').lower() == 'true'
+        self.label_store = LabelStore() if self.label_store_enabled else None
+        
+        # Retries and circuit breakers
+        self.retry_policies = default_retry_policies()
+        self.default_retry_policy = RetryPolicy(max_attempts=1)
+        self.circuit_breakers: Dict[str, CircuitBreaker] = {}
+        # API family -> retries made, calls that succeeded on a retry, calls that
+        # failed after every attempt, and failures the policy does not retry
+        self.retry_counters: Dict[str, Dict[str, int]] = {}
+        
+        # Client-side request quota with priority classes
+        self.quota = QuotaManager()
+        
+        # Offline rate tables
+        self.rate_table: Optional[RateTable] = load_rate_table()
+        self._rate_table_loaded_on = date.today()
+        self.rate_check_interval_hours = float(os.getenv('USPS_RATE_CHECK_INTERVAL_HOURS', '0'))
+        self.last_rate_check: Optional[Dict] = None
+        self._rate_check_task: Optional[asyncio.Task] = None
+        
+        # Canonical recipients (pre-verified, postage precomputed per page count)
+        self.recipients = RecipientRegistry()
+        self._recipient_postage: Dict[tuple, Optional[Dict]] = {}
+        for recipient_id in self.recipients.recipients:
+            for page_count in range(1, int(os.getenv('USPS_RECIPIENT_PRECOMPUTE_PAGES', '10')) + 1):
+                self.recipient_postage(recipient_id, letter_weight_oz(page_count), DISPUTE_LETTER_SERVICES)
+        
+        # Offline post-office locator
+        self.location_directory = LocationDirectory()
+        self.locations_refresh_hours = float(os.getenv('USPS_LOCATIONS_REFRESH_HOURS', '24'))
+        self.locations_refresh_batch = int(os.getenv('USPS_LOCATIONS_REFRESH_BATCH', '200'))
+        self._locations_refresh_task: Optional[asyncio.Task] = None
         
         if not all([self.consumer_key, self.consumer_secret]):
             logger.warning("USPS credentials not configured. Service will be disabled.")
             self.enabled = False
     
+    async def start(self) -> None:
+        """Open the pooled HTTP client and start background token refresh"""
+        self._get_client()
+        logger.info(f"USPS HTTP client opened (http2={self.http2}, max_connections={self.http_limits.max_connections})")
+        
+        if self.enabled and self._token_refresh_task is None:
+            self._token_refresh_task = asyncio.create_task(self._token_refresh_loop())
+        
+        if self.enabled and self.rate_check_interval_hours > 0 and self._rate_check_task is None:
+            self._rate_check_task = asyncio.create_task(self._rate_check_loop())
+        
+        if self.enabled and self.locations_refresh_hours > 0 and self._locations_refresh_task is None:
+            self._locations_refresh_task = asyncio.create_task(self._locations_refresh_loop())
+    
+    async def close(self) -> None:
+        """Stop background tasks and close the pooled HTTP client"""
+        for task in (self._token_refresh_task, self._rate_check_task, self._locations_refresh_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._token_refresh_task = None
+        self._rate_check_task = None
+        self._locations_refresh_task = None
+        
+        if self.location_directory.dirty:
+            await self._save_locations()
+        
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("USPS HTTP client closed")
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared client, creating it on first use outside the app lifespan"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=self.http_limits,
+                timeout=self.http_timeout
+            )
+        return self._client
+    
+    async def _send(self, method: str, url: str, operation: str = 'api', **kwargs) -> httpx.Response:
+        """Send a request through the pooled client, tracking pool utilization and latency"""
+        client = self._get_client()
+        self._requests_total += 1
+        self._in_flight += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.TransportError as error:
+            record_external_call('usps', operation, type(error).__name__, time.perf_counter() - started, True)
+            raise
+        finally:
+            self._in_flight -= 1
+        
+        record_external_call(
+            'usps', operation, f"{response.status_code // 100}xx",
+            time.perf_counter() - started, response.status_code >= 400
+        )
+        return response
+    
+    def pool_stats(self) -> Dict:
+        """Connection pool utilization statistics"""
+        client_open = self._client is not None and not self._client.is_closed
+        pool = getattr(getattr(self._client, '_transport', None), '_pool', None) if client_open else None
+        connections = list(getattr(pool, 'connections', []) or [])
+        idle = sum(1 for connection in connections if connection.is_idle())
+        max_connections = self.http_limits.max_connections
+        
+        return {
+            'open': client_open,
+            'http2': self.http2,
+            'maxConnections': max_connections,
+            'maxKeepaliveConnections': self.http_limits.max_keepalive_connections,
+            'keepaliveExpirySeconds': self.http_limits.keepalive_expiry,
+            'connections': len(connections),
+            'activeConnections': len(connections) - idle,
+            'idleConnections': idle,
+            'inFlightRequests': self._in_flight,
+            'peakInFlightRequests': self._peak_in_flight,
+            'requestsTotal': self._requests_total,
+            'utilization': round(self._in_flight / max_connections, 4) if max_connections else None
+        }
+    
+    def _token_valid(self, margin_seconds: float = 0) -> bool:
+        """True when the cached token is still valid margin_seconds from now"""
+        return bool(
+            self.access_token and self.token_expires_at
+            and datetime.now() + timedelta(seconds=margin_seconds) < self.token_expires_at
+        )
+    
+    def _get_token_lock(self) -> asyncio.Lock:
+        """Token refresh lock bound to the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._token_lock is None or self._token_lock_loop is not loop:
+            self._token_lock = asyncio.Lock()
+            self._token_lock_loop = loop
+        return self._token_lock
+    
     async def get_access_token(self) -> str:
         """Get or refresh OAuth 2.0 access token"""
-        if self.access_token and self.token_expires_at and datetime.now() < self.token_expires_at:
+        if self._token_valid():
+            return self.access_token
+        
+        # Single-flight: one coroutine refreshes, the rest wait for its token
+        async with self._get_token_lock():
+            if self._token_valid():
+                return self.access_token
+            return await self._refresh_access_token()
+    
+    async def _refresh_access_token(self, min_valid_seconds: float = 0) -> str:
+        """Adopt a token another worker refreshed, or fetch a new one and share it"""
+        if await self._adopt_shared_token(min_valid_seconds):
             return self.access_token
         
+        redis = get_redis()
+        lock_key = f"{self._shared_token_key()}:lock"
+        holds_lock = False
+        
+        if redis is not None:
+            try:
+                holds_lock = bool(await redis.set(lock_key, os.getpid(), nx=True, ex=30))
+                if not holds_lock:
+                    # Another worker is refreshing; wait briefly for its token
+                    for _ in range(50):
+                        await asyncio.sleep(0.2)
+                        if await self._adopt_shared_token(min_valid_seconds):
+                            return self.access_token
+            except Exception as error:
+                logger.warning(f"Shared USPS token cache unavailable: {str(error)}")
+        
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/oauth2/v3/token",
-                    data={
-                        'grant_type': 'client_credentials',
-                        'client_id': self.consumer_key,
-                        'client_secret': self.consumer_secret,
-                        'scope': 'addresses prices service-standards locations labels tracking'
-                    },
-                    headers={
-                        'Content-Type': 'application/x-www-form-urlencoded',
-                        'Accept': 'application/json'
-                    }
-                )
+            return await self._fetch_access_token()
+        finally:
+            if holds_lock:
+                try:
+                    await redis.delete(lock_key)
+                except Exception as error:
+                    logger.warning(f"Failed to release USPS token lock: {str(error)}")
+    
+    async def _fetch_access_token(self) -> str:
+        """Request a new OAuth 2.0 access token from USPS"""
+        try:
+            response = await self._send(
+                'POST',
+                f"{self.base_url}/oauth2/v3/token",
+                operation='oauth',
+                data={
+                    'grant_type': 'client_credentials',
+                    'client_id': self.consumer_key,
+                    'client_secret': self.consumer_secret,
+                    'scope': 'addresses prices service-standards locations labels tracking'
+                },
+                headers={
+                    'Content-Type': 'application/x-www-form-urlencoded',
+                    'Accept': 'application/json'
+                }
+            )
+            
+            if response.status_code == 200:
+                token_data = response.json()
+                self.access_token = token_data['access_token']
+                expires_in = int(token_data.get('expires_in', 3600))
+                # 5 min buffer, but never more than half the lifetime so short-lived tokens stay usable
+                self.token_lifetime_seconds = expires_in - min(300, expires_in // 2)
+                self.token_expires_at = datetime.now() + timedelta(seconds=self.token_lifetime_seconds)
+                
+                await self._store_shared_token()
+                logger.info("USPS access token obtained successfully")
+                return self.access_token
+            else:
+                logger.error(f"Failed to obtain USPS access token: {response.status_code} - {response.text}")
+                raise Exception(f"USPS authentication failed: {response.status_code}")
                 
-                if response.status_code == 200:
-                    token_data = response.json()
-                    self.access_token = token_data['access_token']
-                    expires_in = token_data.get('expires_in', 3600)
-                    self.token_expires_at = datetime.now() + timedelta(seconds=expires_in - 300)  # 5 min buffer
-                    
-                    logger.info("USPS access token obtained successfully")
-                    return self.access_token
-                else:
-                    logger.error(f"Failed to obtain USPS access token: {response.status_code} - {response.text}")
-                    raise Exception(f"USPS authentication failed: {response.status_code}")
-                    
         except Exception as error:
             logger.error(f"Error obtaining USPS access token: {str(error)}")
             raise Exception(f"USPS authentication error: {str(error)}")
     
-    async def make_request(self, endpoint: str, method: str = 'GET', data: Optional[Dict] = None) -> Dict:
-        """Make authenticated request to USPS API"""
-        if not self.enabled:
-            raise Exception("USPS service is disabled")
+    def _shared_token_key(self) -> str:
+        """Redis key for the token shared by all workers using these credentials"""
+        credential_id = hashlib.sha256(f"{self.base_url}|{self.consumer_key}".encode('utf-8')).hexdigest()[:16]
+        return f"usps:oauth_token:{credential_id}"
+    
+    async def _adopt_shared_token(self, min_valid_seconds: float = 0) -> bool:
+        """Use the shared token when it is valid for at least min_valid_seconds"""
+        redis = get_redis()
+        if redis is None:
+            return False
         
         try:
-            token = await self.get_access_token()
+            raw = await redis.get(self._shared_token_key())
+        except Exception as error:
+            logger.warning(f"Shared USPS token cache unavailable: {str(error)}")
+            return False
+        
+        if not raw:
+            return False
+        
+        shared = json.loads(raw)
+        expires_at = datetime.fromtimestamp(shared['expires_at'])
+        if datetime.now() + timedelta(seconds=min_valid_seconds) >= expires_at:
+            return False
+        
+        self.access_token = shared['access_token']
+        self.token_expires_at = expires_at
+        return True
+    
+    async def _store_shared_token(self) -> None:
+        """Publish the current token to the other workers"""
+        redis = get_redis()
+        if redis is None:
+            return
+        
+        ttl = int((self.token_expires_at - datetime.now()).total_seconds())
+        if ttl <= 0:
+            return
+        
+        try:
+            await redis.set(
+                self._shared_token_key(),
+                json.dumps({'access_token': self.access_token, 'expires_at': self.token_expires_at.timestamp()}),
+                ex=ttl
+            )
+        except Exception as error:
+            logger.warning(f"Failed to share USPS access token: {str(error)}")
+    
+    def _refresh_ahead_seconds(self) -> float:
+        """Background refresh margin, at most half a token's lifetime"""
+        if self.token_lifetime_seconds is None:
+            return self.token_refresh_ahead_seconds
+        return min(self.token_refresh_ahead_seconds, self.token_lifetime_seconds / 2)
+    
+    async def _token_refresh_loop(self) -> None:
+        """Refresh the token in the background shortly before it expires"""
+        while True:
+            delay = 30.0
+            try:
+                ahead = self._refresh_ahead_seconds()
+                if not self._token_valid(ahead):
+                    async with self._get_token_lock():
+                        if not self._token_valid(ahead):
+                            await self._refresh_access_token(ahead)
+                
+                if self.token_expires_at is not None:
+                    remaining = (self.token_expires_at - datetime.now()).total_seconds()
+                    delay = remaining - self._refresh_ahead_seconds()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning(f"Background USPS token refresh failed: {str(error)}")
             
-            headers = {
-                'Authorization': f'Bearer {token}',
-                'Content-Type': 'application/json',
-                'Accept': 'application/json',
-                'X-User-Agent': 'Rick Jefferson Solutions Credit Repair Platform'
-            }
+            await asyncio.sleep(max(delay, 5.0))
+    
+    def _retry_policy(self, endpoint: str) -> RetryPolicy:
+        for prefix, policy in self.retry_policies.items():
+            if endpoint.startswith(prefix):
+                return policy
+        return self.default_retry_policy
+    
+    def _circuit_breaker(self, endpoint: str) -> CircuitBreaker:
+        """One breaker per USPS API family (addresses, prices, labels, ...)"""
+        name = endpoint.strip('/').split('/', 1)[0]
+        if name not in self.circuit_breakers:
+            self.circuit_breakers[name] = CircuitBreaker(name)
+        return self.circuit_breakers[name]
+    
+    async def make_request(self, endpoint: str, method: str = 'GET', data: Optional[Dict] = None) -> Dict:
+        """
+        Make authenticated request to USPS API.
+        
+        Concurrent identical calls to read-only endpoints share one upstream
+        request; each caller gets its own copy of the response. The shared
+        request runs at the highest quota priority among its callers: an
+        interactive caller joining a background call promotes it.
+        """
+        if not self.coalescing_enabled or not endpoint.startswith(COALESCED_ENDPOINT_PREFIXES):
+            return await self._request(endpoint, method, data)
+        
+        key = hashlib.sha256(
+            json.dumps([method.upper(), endpoint, data], sort_keys=True, default=str).encode()
+        ).hexdigest()
+        
+        self.coalescing_counters['requests'] += 1
+        entry = self._coalesced_calls.get(key)
+        if entry is None:
+            # Run as its own task so a cancelled caller does not cancel the others
+            context = contextvars.copy_context()
+            call = asyncio.create_task(self._request(endpoint, method, data), context=context)
+            self._coalesced_calls[key] = (call, context)
+            call.add_done_callback(lambda task: self._coalesced_call_done(key, task))
+        else:
+            call, context = entry
+            self.coalescing_counters['coalesced'] += 1
+            if not is_background.get() and context.get(is_background):
+                # The quota wait picks this up on its next check
+                context.run(is_background.set, False)
+        
+        result = await asyncio.shield(call)
+        return copy.deepcopy(result)
+    
+    def _coalesced_call_done(self, key: str, task: asyncio.Task) -> None:
+        self._coalesced_calls.pop(key, None)
+        if not task.cancelled():
+            # Mark the error retrieved even if every caller was cancelled
+            task.exception()
+    
+    def retry_stats(self) -> Dict:
+        """Retry outcomes in total and per API family"""
+        return {
+            'total': sum(counters['retries'] for counters in self.retry_counters.values()),
+            'byFamily': {family: dict(counters) for family, counters in self.retry_counters.items()}
+        }
+    
+    def coalescing_stats(self) -> Dict:
+        """How many read requests were served by another caller's upstream call"""
+        requests = self.coalescing_counters['requests']
+        return {
+            'enabled': self.coalescing_enabled,
+            'inFlight': len(self._coalesced_calls),
+            **self.coalescing_counters,
+            'ratio': round(self.coalescing_counters['coalesced'] / requests, 4) if requests else None
+        }
+    
+    async def _request(self, endpoint: str, method: str = 'GET', data: Optional[Dict] = None) -> Dict:
+        """
+        Send one USPS API request.
+        
+        Retries according to the endpoint's policy and fails fast with
+        CircuitOpenError while the endpoint's circuit breaker is open.
+        """
+        if not self.enabled:
+            raise USPSAPIError("USPS service is disabled", endpoint=endpoint, unsent=True)
+        
+        if method.upper() not in ('GET', 'POST'):
+            raise USPSAPIError(f"Unsupported HTTP method: {method}", endpoint=endpoint, unsent=True)
+        
+        policy = self._retry_policy(endpoint)
+        breaker = self._circuit_breaker(endpoint)
+        counters = self.retry_counters.setdefault(
+            breaker.name, {'retries': 0, 'recovered': 0, 'exhausted': 0, 'notRetried': 0}
+        )
+        attempt = 0
+        
+        while True:
+            attempt += 1
+            # An open circuit fails fast without spending (or waiting for) quota
+            breaker.before_call()
+            try:
+                await self.quota.acquire(endpoint)
+            except BaseException:
+                breaker.release_probe()
+                raise
             
-            async with httpx.AsyncClient() as client:
+            try:
+                try:
+                    token = await self.get_access_token()
+                except Exception as token_error:
+                    raise USPSAPIError(str(token_error), endpoint=endpoint, unsent=True) from token_error
+                
+                headers = {
+                    'Authorization': f'Bearer {token}',
+                    'Content-Type': 'application/json',
+                    'Accept': 'application/json',
+                    'X-User-Agent': 'Rick Jefferson Solutions Credit Repair Platform'
+                }
+                
+                operation = self.quota.request_class(endpoint)
                 if method.upper() == 'GET':
-                    response = await client.get(f"{self.base_url}{endpoint}", headers=headers)
-                elif method.upper() == 'POST':
-                    response = await client.post(
+                    response = await self._send(
+                        'GET', f"{self.base_url}{endpoint}", operation=operation, headers=headers
+                    )
+                else:
+                    response = await self._send(
+                        'POST',
                         f"{self.base_url}{endpoint}", 
+                        operation=operation,
                         headers=headers, 
                         json=data
                     )
-                else:
-                    raise Exception(f"Unsupported HTTP method: {method}")
                 
+            except httpx.TransportError as transport_error:
+                breaker.record_failure()
+                error = USPSAPIError(
+                    f"USPS API request failed: {type(transport_error).__name__}: {str(transport_error)}",
+                    retryable=policy.retries_transport_error(transport_error),
+                    endpoint=endpoint,
+                    unsent=isinstance(transport_error, NOT_SENT_ERRORS)
+                )
+            
+            except BaseException:
+                breaker.release_probe()
+                raise
+            
+            else:
                 if response.status_code in [200, 201]:
+                    breaker.record_success()
+                    if attempt > 1:
+                        counters['recovered'] += 1
                     return response.json()
+                
+                # Client errors (including 429 throttling) mean USPS is up
+                if response.status_code >= 500:
+                    breaker.record_failure()
                 else:
-                    logger.error(f"USPS API request failed: {response.status_code} - {response.text}")
-                    raise Exception(f"USPS API request failed: {response.status_code}")
-                    
-        except Exception as error:
-            logger.error(f"USPS API request failed: {str(error)}")
-            raise Exception(f"USPS API request failed: {str(error)}")
+                    breaker.record_success()
+                
+                logger.error(f"USPS API request failed: {response.status_code} - {response.text}")
+                if response.status_code == 429:
+                    await self.quota.throttled(parse_retry_after(response.headers.get('Retry-After')))
+                error = USPSAPIError(
+                    f"USPS API request failed: {response.status_code}",
+                    status_code=response.status_code,
+                    retry_after=parse_retry_after(response.headers.get('Retry-After')),
+                    retryable=policy.retries_status(response.status_code),
+                    endpoint=endpoint,
+                    # A 4xx answer means USPS rejected the request without acting on it
+                    unsent=response.status_code < 500
+                )
+            
+            delay = policy.delay(attempt, error.retry_after) if error.retryable else None
+            if attempt >= policy.max_attempts or delay is None:
+                # e.g. a label 5xx: it may have created the label, so it is never retried
+                counters['exhausted' if error.retryable and attempt >= policy.max_attempts else 'notRetried'] += 1
+                logger.error(f"USPS API request failed after {attempt} attempt(s): {str(error)}")
+                raise error
+            
+            counters['retries'] += 1
+            logger.warning(f"Retrying USPS {endpoint} in {delay:.2f}s (attempt {attempt + 1}/{policy.max_attempts})")
+            await asyncio.sleep(delay)
+    
+    def _prevalidate(self, address: USPSAddress):
+        """
+        Check the address against the local ZIP database.
+        
+        Returns (rejection, address): a failed verification result for a
+        malformed or nonexistent ZIP or a ZIP in another state, or None and
+        the address with its state corrected or a missing city or state
+        filled in. Warnings (vanity city, or anything the dataset disagrees
+        with while ZIP_DATABASE_STRICT is off) are only counted.
+        """
+        check = zip_database.prevalidate(address.dict())
+        if not check['valid']:
+            self.prevalidation_counters['rejected'] += 1
+            return {
+                'success': False,
+                'verified': False,
+                'deliverable': False,
+                'error': check['error'],
+                'source': 'local'
+            }, address
+        
+        if check['warnings']:
+            self.prevalidation_counters['warned'] += 1
+            logger.debug(f"ZIP database warnings for {address.zipCode}: {'; '.join(check['warnings'])}")
+        if check['corrections']:
+            self.prevalidation_counters['corrected'] += 1
+            address = address.copy(update=check['corrections'])
+        return None, address
     
     async def verify_address(self, address: USPSAddress) -> Dict:
         """Verify and standardize an address"""
+        rejection, address = self._prevalidate(address)
+        if rejection is not None:
+            return rejection
+        
+        cached = await self.address_cache.get(address)
+        if cached is not None:
+            return {**cached, 'cached': True}
+        
+        return await self._verify_address_uncached(address)
+    
+    async def verify_addresses(self, addresses: List[USPSAddress], concurrency: Optional[int] = None) -> Dict:
+        """Verify a batch of addresses, returning results in input order"""
+        results = [result async for _, result in self.iter_verify_addresses(addresses, concurrency)]
+        
+        return {
+            'success': True,
+            'total': len(results),
+            'unique': len({normalize_address(address) for address in addresses}),
+            'cached': sum(1 for result in results if result.get('cached')),
+            'failed': sum(1 for result in results if not result.get('success')),
+            'results': results
+        }
+    
+    async def iter_verify_addresses(self, addresses: List[USPSAddress], concurrency: Optional[int] = None):
+        """
+        Verify a batch of addresses, yielding (index, result) in input order.
+        
+        Duplicate addresses (after normalization) are verified once, cache
+        hits are returned without waiting for a slot, and misses go to USPS
+        with at most `concurrency` requests in flight.
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.batch_concurrency)
+        
+        async def verify(address: USPSAddress) -> Dict:
+            rejection, address = self._prevalidate(address)
+            if rejection is not None:
+                return rejection
+            cached = await self.address_cache.get(address)
+            if cached is not None:
+                return {**cached, 'cached': True}
+            async with semaphore:
+                return await self._verify_address_uncached(address)
+        
+        tasks: Dict[str, asyncio.Task] = {}
+        keys = []
+        for address in addresses:
+            key = normalize_address(address)
+            keys.append(key)
+            if key not in tasks:
+                tasks[key] = asyncio.create_task(verify(address))
+        
+        try:
+            for index, key in enumerate(keys):
+                yield index, await tasks[key]
+        finally:
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+    
+    async def _verify_address_uncached(self, address: USPSAddress) -> Dict:
+        """Verify an address with USPS and cache the result"""
         try:
             address_data = {
                 "streetAddress": address.streetAddress,
@@ -180,13 +756,15 @@ class USPSService:
             
             logger.info(f"Address verification completed for {address.cityName}, {address.state}")
             
-            return {
+            verification = {
                 'success': True,
                 'verified': True,
                 'standardizedAddress': result.get('address', {}),
                 'deliverable': result.get('deliverable', True),
                 'suggestions': result.get('suggestions', [])
             }
+            await self.address_cache.set(address, verification)
+            return verification
             
         except Exception as error:
             logger.error(f"Error verifying address: {str(error)}")
@@ -196,8 +774,177 @@ class USPSService:
                 'error': str(error)
             }
     
+    def current_rate_table(self) -> Optional[RateTable]:
+        """Active rate table, reloaded once a day so new price lists take effect"""
+        if self._rate_table_loaded_on != date.today():
+            previous = self.rate_table.version if self.rate_table else None
+            self.rate_table = load_rate_table()
+            self._rate_table_loaded_on = date.today()
+            if self.rate_table and self.rate_table.version != previous:
+                self.pricing_cache.invalidate()
+        return self.rate_table
+    
+    def quote_postage(self, weight: float, mail_class: str = DISPUTE_LETTER_MAIL_CLASS,
+                      special_services: Optional[List[str]] = None,
+                      destination_zip: Optional[str] = None) -> Optional[Dict]:
+        """Postage from the local rate table, or None if the table cannot price it"""
+        rate_table = self.current_rate_table()
+        if rate_table is None:
+            return None
+        return rate_table.price(
+            mail_class,
+            weight,
+            origin_zip=HQ_ADDRESS.zipCode,
+            destination_zip=destination_zip,
+            special_services=special_services
+        )
+    
+    def recipient_postage(self, recipient_id: str, weight: float, special_services: List[str]) -> Optional[Dict]:
+        """Postage to a registry recipient, computed once per rate table, weight and services"""
+        recipient = self.recipients.get(recipient_id)
+        rate_table = self.current_rate_table()
+        if recipient is None or rate_table is None:
+            return None
+        
+        key = (recipient_id, rate_table.version, weight, tuple(sorted(special_services)))
+        if key not in self._recipient_postage:
+            self._recipient_postage[key] = self.quote_postage(
+                weight, DISPUTE_LETTER_MAIL_CLASS, special_services, recipient['address']['zipCode']
+            )
+        return self._recipient_postage[key]
+    
+    def quote_dispute_letters(self, items: List[Dict]) -> Dict:
+        """
+        Instant postage quote for a batch of dispute letters.
+        
+        Each item has pageCount, quantity and optional specialServices.
+        """
+        lines = []
+        total = Decimal('0')
+        
+        for item in items:
+            page_count = item.get('pageCount') or 1
+            quantity = item.get('quantity') or 1
+            services = item.get('specialServices') or DISPUTE_LETTER_SERVICES
+            weight = letter_weight_oz(page_count)
+            
+            rate = self.quote_postage(weight, DISPUTE_LETTER_MAIL_CLASS, services)
+            if rate is None:
+                return {
+                    'success': False,
+                    'error': f"No local rate for {page_count}-page letter with {', '.join(services)}"
+                }
+            
+            subtotal = Decimal(str(rate['totalPrice'])) * quantity
+            total += subtotal
+            lines.append({
+                'pageCount': page_count,
+                'quantity': quantity,
+                'weight': weight,
+                'processingCategory': rate['processingCategory'],
+                'specialServices': services,
+                'unitPrice': rate['totalPrice'],
+                'subtotal': float(subtotal)
+            })
+        
+        return {
+            'success': True,
+            'letters': sum(line['quantity'] for line in lines),
+            'lines': lines,
+            'totalPostage': float(total),
+            'currency': 'USD',
+            'rateTableVersion': self.rate_table.version
+        }
+    
+    async def check_rate_table(self) -> Dict:
+        """Compare local prices with the live API for the dispute-letter lanes"""
+        rate_table = self.current_rate_table()
+        if rate_table is None:
+            return {'success': False, 'error': 'No rate table loaded'}
+        
+        mismatches = []
+        checked = 0
+        for destination_zip in os.getenv('USPS_RATE_CHECK_ZIPS', '75013,30374,19016').split(','):
+            local = rate_table.price(DISPUTE_LETTER_MAIL_CLASS, 1.0, HQ_ADDRESS.zipCode, destination_zip.strip())
+            try:
+                live = await self.make_request('/prices/v3/base-rates/search', 'POST', {
+                    "originZipCode": HQ_ADDRESS.zipCode,
+                    "destinationZipCode": destination_zip.strip(),
+                    "weight": 1.0,
+                    "mailClass": DISPUTE_LETTER_MAIL_CLASS
+                })
+            except Exception as error:
+                logger.warning(f"USPS rate check skipped for {destination_zip}: {str(error)}")
+                continue
+            
+            checked += 1
+            live_price = live.get('totalBasePrice')
+            if local is None or live_price is None or abs(float(live_price) - local['price']) >= 0.005:
+                mismatches.append({
+                    'destinationZipCode': destination_zip.strip(),
+                    'localPrice': local['price'] if local else None,
+                    'livePrice': live_price
+                })
+        
+        if mismatches:
+            logger.warning(f"USPS rate table {rate_table.version} differs from live prices: {mismatches}")
+        
+        self.last_rate_check = {
+            'success': True,
+            'rateTableVersion': rate_table.version,
+            'checked': checked,
+            'mismatches': mismatches,
+            'checkedAt': datetime.now().isoformat()
+        }
+        return self.last_rate_check
+    
+    async def _rate_check_loop(self) -> None:
+        """Periodically verify the local rate table against the live API"""
+        is_background.set(True)
+        while True:
+            try:
+                await self.check_rate_table()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning(f"USPS rate table check failed: {str(error)}")
+            
+            await asyncio.sleep(self.rate_check_interval_hours * 3600)
+    
     async def get_pricing(self, pricing_request: USPSPricingRequest) -> Dict:
         """Get shipping pricing for different service types"""
+        rate_table = self.current_rate_table()
+        if rate_table is not None:
+            rate = rate_table.price(
+                pricing_request.mailClass,
+                pricing_request.weight,
+                pricing_request.originZipCode,
+                pricing_request.destinationZipCode,
+                pricing_request.length,
+                pricing_request.width,
+                pricing_request.height
+            )
+            if rate is not None:
+                return {
+                    'success': True,
+                    'pricing': [rate],
+                    'currency': rate_table.currency,
+                    'source': 'rate_table'
+                }
+        
+        cache_key = lane_key(
+            pricing_request.originZipCode,
+            pricing_request.destinationZipCode,
+            pricing_request.mailClass,
+            pricing_request.weight,
+            pricing_request.length,
+            pricing_request.width,
+            pricing_request.height
+        )
+        cached = self.pricing_cache.get(cache_key)
+        if cached is not None:
+            return {**cached, 'cached': True}
+        
         try:
             pricing_data = {
                 "originZipCode": pricing_request.originZipCode,
@@ -217,11 +964,13 @@ class USPSService:
             
             logger.info(f"Pricing calculated for {pricing_request.originZipCode} to {pricing_request.destinationZipCode}")
             
-            return {
+            pricing = {
                 'success': True,
                 'pricing': result.get('rates', []),
                 'currency': 'USD'
             }
+            self.pricing_cache.set(cache_key, pricing)
+            return pricing
             
         except Exception as error:
             logger.error(f"Error getting pricing: {str(error)}")
@@ -232,6 +981,11 @@ class USPSService:
     
     async def get_service_standards(self, origin_zip: str, destination_zip: str, mail_class: str = 'USPS_GROUND_ADVANTAGE') -> Dict:
         """Get service standards and delivery timeframes"""
+        cache_key = lane_key(origin_zip, destination_zip, mail_class)
+        cached = self.service_standards_cache.get(cache_key)
+        if cached is not None:
+            return {**cached, 'cached': True}
+        
         try:
             standards_data = {
                 "originZipCode": origin_zip,
@@ -243,11 +997,13 @@ class USPSService:
             
             logger.info(f"Service standards retrieved for {origin_zip} to {destination_zip}")
             
-            return {
+            standards = {
                 'success': True,
                 'serviceStandards': result.get('serviceStandards', {}),
                 'deliveryDays': result.get('deliveryDays', 'Unknown')
             }
+            self.service_standards_cache.set(cache_key, standards)
+            return standards
             
         except Exception as error:
             logger.error(f"Error getting service standards: {str(error)}")
@@ -259,14 +1015,24 @@ class USPSService:
     async def find_locations(self, zip_code: str, radius: int = 10) -> Dict:
         """Find USPS locations near a ZIP code"""
         try:
-            result = await self.make_request(f'/locations/v3/post-offices?zipCode={zip_code}&radius={radius}')
+            local = self.location_directory.lookup(zip_code, radius)
+            if local is not None:
+                return {
+                    'success': True,
+                    'locations': local,
+                    'searchRadius': radius,
+                    'source': 'local'
+                }
+            
+            locations = await self._fetch_locations(zip_code, radius)
             
             logger.info(f"Locations found near {zip_code}")
             
             return {
                 'success': True,
-                'locations': result.get('locations', []),
-                'searchRadius': radius
+                'locations': locations,
+                'searchRadius': radius,
+                'source': 'usps'
             }
             
         except Exception as error:
@@ -276,6 +1042,35 @@ class USPSService:
                 'error': str(error)
             }
     
+    async def _fetch_locations(self, zip_code: str, radius: float) -> List[Dict]:
+        """Live post-office search; the answer is added to the local directory"""
+        result = await self.make_request(f'/locations/v3/post-offices?zipCode={zip_code}&radius={radius}')
+        locations = result.get('locations', [])
+        self.location_directory.ingest(zip_code, radius, locations)
+        if self.location_directory.save_due():
+            await self._save_locations()
+        return locations
+    
+    async def _save_locations(self) -> None:
+        # Snapshot on the event loop, write the file in a thread
+        await asyncio.to_thread(self.location_directory.save, self.location_directory.snapshot())
+    
+    async def _locations_refresh_loop(self) -> None:
+        """Re-fetch covered areas of the local post-office directory before they go stale"""
+        is_background.set(True)
+        while True:
+            try:
+                for circle in self.location_directory.due_for_refresh(self.locations_refresh_batch):
+                    await self._fetch_locations(circle['zip'], circle['radius'])
+                if self.location_directory.dirty:
+                    await self._save_locations()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning(f"USPS post-office refresh failed: {str(error)}")
+            
+            await asyncio.sleep(self.locations_refresh_hours * 3600)
+    
     async def create_label(self, label_request: USPSLabelRequest) -> Dict:
         """Create shipping label with tracking"""
         try:
@@ -301,10 +1096,13 @@ class USPSService:
             tracking_number = result.get('trackingNumber')
             logger.info(f"Shipping label created with tracking number: {tracking_number}")
             
+            label_sha256 = await self._store_label(tracking_number, result)
+            
             return {
                 'success': True,
                 'trackingNumber': tracking_number,
                 'labelUrl': result.get('labelUrl'),
+                'labelSha256': label_sha256,
                 'labelFormat': 'PDF',
                 'postage': result.get('postage'),
                 'customerReference': label_request.customerReference
@@ -315,9 +1113,47 @@ class USPSService:
             return {
                 'success': False,
                 'error': str(error),
-                'trackingNumber': None
+                'trackingNumber': None,
+                # A 5xx, timeout or unknown failure may still have produced a label
+                'outcomeUnknown': not request_unsent(error)
             }
     
+    async def _store_label(self, tracking_number: Optional[str], result: Dict) -> Optional[str]:
+        """Keep a local copy of a new label; failures never fail the label itself"""
+        if self.label_store is None or not tracking_number:
+            return None
+        
+        try:
+            if result.get('labelImage'):
+                return await self.label_store.put_bytes(tracking_number, base64.b64decode(result['labelImage']))
+            if result.get('labelUrl'):
+                return await self.fetch_label(tracking_number, result['labelUrl'])
+        except Exception as error:
+            logger.warning(f"Could not store label for {tracking_number}: {str(error)}")
+        return None
+    
+    async def fetch_label(self, tracking_number: str, label_url: str) -> str:
+        """Download a label into the label store unless it is already there"""
+        existing = self.label_store.get_hash(tracking_number)
+        if existing is not None:
+            return existing
+        
+        headers = {}
+        if label_url.startswith(self.base_url):
+            headers['Authorization'] = f'Bearer {await self.get_access_token()}'
+        
+        async with self._get_client().stream('GET', label_url, headers=headers) as response:
+            if response.status_code != 200:
+                raise USPSAPIError(
+                    f"Label download failed: {response.status_code}",
+                    status_code=response.status_code,
+                    endpoint=label_url
+                )
+            sha256 = await self.label_store.put_stream(tracking_number, response.aiter_bytes())
+        
+        logger.info(f"Label for {tracking_number} stored as {sha256[:12]}")
+        return sha256
+    
     async def track_package(self, tracking_number: str) -> Dict:
         """Track a package using tracking number"""
         try:
@@ -331,6 +1167,7 @@ class USPSService:
                 'status': result.get('status'),
                 'trackingEvents': result.get('trackingEvents', []),
                 'deliveryDate': result.get('deliveryDate'),
+                'expectedDeliveryDate': result.get('expectedDeliveryDate'),
                 'lastUpdate': datetime.now().isoformat()
             }
             
@@ -344,25 +1181,43 @@ class USPSService:
     async def send_dispute_letter(self, dispute_request: USPSDisputeMailRequest) -> Dict:
         """Send dispute letter via USPS with tracking"""
         try:
-            # Rick Jefferson Solutions HQ address
-            from_address = USPSAddress(
-                streetAddress="5700 W Plano Pkwy",
-                secondaryAddress="Suite 3600",
-                cityName="Frisco",
-                state="TX",
-                zipCode="75093"
-            )
+            special_services = dispute_request.specialServices or DISPUTE_LETTER_SERVICES
+            
+            # Standard letter weight unless the page count is known
+            weight = letter_weight_oz(dispute_request.pageCount) if dispute_request.pageCount else 1.0
+            
+            recipient = None
+            if dispute_request.recipientId:
+                recipient = self.recipients.get(dispute_request.recipientId)
+                if recipient is None:
+                    return {'success': False, 'error': f"Unknown recipient: {dispute_request.recipientId}"}
+                to_address = USPSAddress(**recipient['address'])
+            elif dispute_request.recipientAddress is not None:
+                to_address = dispute_request.recipientAddress
+            else:
+                return {'success': False, 'error': 'recipientAddress or recipientId is required'}
             
             # Create label request
             label_request = USPSLabelRequest(
-                fromAddress=from_address,
-                toAddress=dispute_request.recipientAddress,
-                weight=1.0,  # Standard letter weight
-                mailClass="FIRST_CLASS_MAIL",
-                specialServices=dispute_request.specialServices or ["CERTIFIED_MAIL", "RETURN_RECEIPT"],
+                fromAddress=HQ_ADDRESS,
+                toAddress=to_address,
+                weight=weight,
+                mailClass=DISPUTE_LETTER_MAIL_CLASS,
+                specialServices=special_services,
                 customerReference=f"RJS-{dispute_request.clientId}-{dispute_request.disputeId}"
             )
             
+            # Postage from the local rate table (no pricing round trip)
+            if recipient is not None:
+                postage_estimate = self.recipient_postage(recipient['id'], weight, special_services)
+            else:
+                postage_estimate = self.quote_postage(
+                    label_request.weight,
+                    label_request.mailClass,
+                    special_services,
+                    to_address.zipCode
+                )
+            
             # Create the shipping label
             label_result = await self.create_label(label_request)
             
@@ -374,11 +1229,18 @@ class USPSService:
                     'success': True,
                     'trackingNumber': label_result['trackingNumber'],
                     'labelUrl': label_result['labelUrl'],
+                    'labelSha256': label_result.get('labelSha256'),
                     'letterType': dispute_request.letterType,
+                    'letterTypes': dispute_request.letterTypes or [dispute_request.letterType],
                     'clientId': dispute_request.clientId,
                     'disputeId': dispute_request.disputeId,
+                    'disputeIds': dispute_request.disputeIds or [dispute_request.disputeId],
+                    'recipientId': recipient['id'] if recipient else None,
+                    'weight': weight,
                     'mailedAt': datetime.now().isoformat(),
-                    'specialServices': dispute_request.specialServices or ["CERTIFIED_MAIL", "RETURN_RECEIPT"]
+                    'specialServices': special_services,
+                    'postage': label_result.get('postage'),
+                    'postageEstimate': postage_estimate['totalPrice'] if postage_estimate else None
                 }
             else:
                 return label_result
@@ -397,6 +1259,7 @@ class USPSService:
                 return {
                     'healthy': False,
                     'message': 'USPS service is disabled',
+                    'connectionPool': self.pool_stats(),
                     'timestamp': datetime.now().isoformat()
                 }
             
@@ -408,6 +1271,21 @@ class USPSService:
                 'message': 'USPS service is operational',
                 'authenticated': bool(token),
                 'environment': self.environment,
+                'connectionPool': self.pool_stats(),
+                'addressCache': self.address_cache.stats(),
+                'addressPrevalidation': {**self.prevalidation_counters, 'zipDatabase': zip_database.stats()},
+                'pricingCache': self.pricing_cache.stats(),
+                'serviceStandardsCache': self.service_standards_cache.stats(),
+                'circuitBreakers': {name: breaker.stats() for name, breaker in self.circuit_breakers.items()},
+                'retries': self.retry_stats(),
+                'coalescing': self.coalescing_stats(),
+                'quota': self.quota.stats(),
+                'labelStore': self.label_store.stats() if self.label_store else None,
+                'locations': self.location_directory.stats(),
+                'rateTable': {
+                    'version': self.rate_table.version if self.rate_table else None,
+                    'lastCheck': self.last_rate_check
+                },
                 'timestamp': datetime.now().isoformat()
             }
             
@@ -416,6 +1294,7 @@ class USPSService:
             return {
                 'healthy': False,
                 'message': f'USPS service error: {str(error)}',
+                'circuitBreakers': {name: breaker.stats() for name, breaker in self.circuit_breakers.items()},
                 'timestamp': datetime.now().isoformat()
             }
 
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+Rick Jefferson Solutions - USPS API Stand-in
+Local fake of the USPS APIs used by USPSService, for offline testing and benchmarks
+
+Implements oauth2, addresses, prices, service-standards, locations, labels
+(including label PDF downloads) and tracking with plausible responses, plus
+fault injection per API family:
+- latency distributions: fixed:MS, uniform:MIN_MS:MAX_MS,
+  normal:MEAN_MS:STDDEV_MS, lognormal:MEDIAN_MS:SIGMA
+- error rate (503 responses)
+- 429 bursts: every N seconds, M seconds of 429 with Retry-After
+
+The default profile applies to every API family except oauth2, which only
+misbehaves when given its own profile.
+
+Point the platform at it with USPS_BASE_URL=http://localhost:8100 and
+USPS_ENVIRONMENT=standin (any consumer key/secret is accepted). Tracking
+advances on a compressed clock, USPS_STANDIN_DAY_SECONDS real seconds per day.
+
+Usage:
+    python usps_standin.py --port 8100 --latency lognormal:80:0.5 --error-rate 0.02 \\
+        --burst-every 60 --burst-seconds 5
+
+Faults can be changed at runtime with PUT /__standin/profile and counters
+are available from GET /__standin/stats.
+
+@author Rick Jefferson Solutions Development Team
+@version 1.0.0
+@since 2024
+"""
+
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+from urllib.parse import parse_qs
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+from usps_rates import load_rate_table
+from zip_database import zip_database
+
+FAMILIES = ('oauth2', 'addresses', 'prices', 'service-standards', 'locations', 'labels', 'tracking')
+
+# (days after acceptance, event type, event code)
+TRACKING_TIMELINE = [
+    (0.0, 'USPS in possession of item', '03'),
+    (0.4, 'Departed Post Office', 'SF'),
+    (0.9, 'Arrived at USPS Regional Facility', '10'),
+    (1.5, 'In Transit to Next Facility', 'NT'),
+    (2.0, 'Arrived at Post Office', '07'),
+    (2.3, 'Out for Delivery', 'OF'),
+    (2.5, 'Delivered, In/At Mailbox', '01')
+]
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """Sampler returning seconds from a latency spec such as lognormal:80:0.5"""
+    kind, *args = spec.split(':')
+    values = [float(arg) for arg in args]
+
+    if kind == 'fixed':
+        return lambda: values[0] / 1000
+    if kind == 'uniform':
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == 'normal':
+        return lambda: max(random.gauss(values[0], values[1]), 0.0) / 1000
+    if kind == 'lognormal':
+        return lambda: random.lognormvariate(math.log(values[0]), values[1]) / 1000
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class FaultProfile:
+    """Latency and failures injected into one API family"""
+
+    def __init__(self, latency: str = 'fixed:0', error_rate: float = 0.0,
+                 burst_every: float = 0.0, burst_seconds: float = 0.0):
+        self.latency = latency
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.burst_every = burst_every
+        self.burst_seconds = burst_seconds
+
+    def throttled_for(self, elapsed: float) -> Optional[float]:
+        """Seconds left in the current 429 burst, or None outside a burst"""
+        if self.burst_every <= 0 or self.burst_seconds <= 0:
+            return None
+        into_window = elapsed % self.burst_every
+        if into_window < self.burst_seconds:
+            return self.burst_seconds - into_window
+        return None
+
+    def updated(self, changes: Dict) -> 'FaultProfile':
+        return FaultProfile(
+            latency=changes.get('latency', self.latency),
+            error_rate=float(changes.get('errorRate', self.error_rate)),
+            burst_every=float(changes.get('burstEverySeconds', self.burst_every)),
+            burst_seconds=float(changes.get('burstSeconds', self.burst_seconds))
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            'latency': self.latency,
+            'errorRate': self.error_rate,
+            'burstEverySeconds': self.burst_every,
+            'burstSeconds': self.burst_seconds
+        }
+
+
+def label_pdf(tracking_number: str) -> bytes:
+    """Single-page 4x6 label PDF"""
+    content = (
+        f"BT /F1 16 Tf 24 390 Td (USPS CERTIFIED MAIL) Tj "
+        f"0 -28 Td (STAND-IN LABEL - NOT POSTAGE) Tj "
+        f"/F1 12 Tf 0 -40 Td ({tracking_number}) Tj ET"
+    ).encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 288 432] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length " + str(len(content)).encode() + b" >>\nstream\n" + content + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    ]
+
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref_at = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        pdf += f"{offset:010d} 00000 n \n".encode()
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_at}\n%%EOF\n".encode()
+    return bytes(pdf)
+
+
+def create_standin_app(default_profile: Optional[FaultProfile] = None,
+                       profiles: Optional[Dict[str, Dict]] = None,
+                       day_seconds: Optional[float] = None) -> FastAPI:
+    """Build the stand-in app; profiles maps an API family to FaultProfile overrides"""
+    default_profile = default_profile or FaultProfile()
+    state = {
+        'started': time.monotonic(),
+        # oauth2 is fault-free unless given its own profile
+        'profiles': {
+            family: (FaultProfile() if family == 'oauth2' else default_profile).updated((profiles or {}).get(family, {}))
+            for family in FAMILIES
+        },
+        'day_seconds': day_seconds or float(os.getenv('USPS_STANDIN_DAY_SECONDS', '60')),
+        'tokens': set(),
+        'labels': {},
+        'stats': {}
+    }
+    rate_table = load_rate_table()
+
+    app = FastAPI(title="USPS API Stand-in", docs_url=None, redoc_url=None)
+
+    def family_stats(family: str) -> Dict:
+        return state['stats'].setdefault(family, {
+            'requests': 0, 'ok': 0, 'throttled': 0, 'errors': 0, 'unauthorized': 0, 'latencySeconds': 0.0
+        })
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        family = request.url.path.strip('/').split('/')[0]
+        if family not in FAMILIES:
+            return await call_next(request)
+
+        profile: FaultProfile = state['profiles'][family]
+        stats = family_stats(family)
+        stats['requests'] += 1
+
+        latency = profile.sample_latency()
+        stats['latencySeconds'] += latency
+        await asyncio.sleep(latency)
+
+        throttled_for = profile.throttled_for(time.monotonic() - state['started'])
+        if throttled_for is not None:
+            stats['throttled'] += 1
+            return JSONResponse(
+                status_code=429,
+                content={'error': {'code': '429', 'message': 'Too many requests'}},
+                headers={'Retry-After': str(max(math.ceil(throttled_for), 1))}
+            )
+
+        if random.random() < profile.error_rate:
+            stats['errors'] += 1
+            return JSONResponse(status_code=503, content={'error': {'code': '503', 'message': 'Service unavailable'}})
+
+        if family != 'oauth2':
+            token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+            if token not in state['tokens']:
+                stats['unauthorized'] += 1
+                return JSONResponse(status_code=401, content={'error': {'code': '401', 'message': 'Invalid token'}})
+
+        response = await call_next(request)
+        if response.status_code < 400:
+            stats['ok'] += 1
+        return response
+
+    # ========== USPS APIs ==========
+
+    @app.post("/oauth2/v3/token")
+    async def token(request: Request):
+        form = {key: values[0] for key, values in parse_qs((await request.body()).decode()).items()}
+        if not form.get('client_id') or not form.get('client_secret'):
+            return JSONResponse(status_code=401, content={'error': 'invalid_client'})
+        access_token = hashlib.sha256(os.urandom(16)).hexdigest()
+        state['tokens'].add(access_token)
+        return {'access_token': access_token, 'token_type': 'Bearer', 'expires_in': 3600}
+
+    @app.post("/addresses/v3/address")
+    async def address(request: Request):
+        body = await request.json()
+        zip_code = str(body.get('zipCode') or '')
+        if zip_database.centroid(zip_code) is None:
+            return JSONResponse(status_code=400, content={'error': {'message': f"Invalid ZIP Code: {zip_code}"}})
+
+        digest = int(hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest(), 16)
+        return {
+            'address': {
+                'streetAddress': str(body.get('streetAddress') or '').upper(),
+                'secondaryAddress': str(body.get('secondaryAddress') or '').upper() or None,
+                'city': str(body.get('cityName') or '').upper(),
+                'state': str(body.get('state') or '').upper(),
+                'ZIPCode': zip_code[:5],
+                'ZIPPlus4': f"{digest % 10000:04d}"
+            },
+            'deliverable': True,
+            'suggestions': []
+        }
+
+    @app.post("/prices/v3/base-rates/search")
+    async def prices(request: Request):
+        body = await request.json()
+        mail_class = body.get('mailClass') or 'USPS_GROUND_ADVANTAGE'
+        weight = float(body.get('weight') or 1.0)
+
+        rate = rate_table.price(
+            mail_class, weight, body.get('originZipCode'), body.get('destinationZipCode'),
+            body.get('length'), body.get('width'), body.get('height')
+        ) if rate_table else None
+        price = rate['price'] if rate else round(4.5 + 0.35 * weight, 2)
+
+        return {
+            'totalBasePrice': price,
+            'rates': [{'mailClass': mail_class, 'price': price, 'weight': weight, 'zone': rate and rate['zone']}]
+        }
+
+    @app.post("/service-standards/v3/estimates")
+    async def service_standards(request: Request):
+        body = await request.json()
+        origin = zip_database.centroid(body.get('originZipCode'))
+        destination = zip_database.centroid(body.get('destinationZipCode'))
+        miles = math.dist(origin, destination) * 69 if origin and destination else 1000
+        days = 1 if miles < 50 else 2 if miles < 300 else 3 if miles < 1000 else 4
+
+        return {
+            'serviceStandards': {
+                'mailClass': body.get('mailClass') or 'USPS_GROUND_ADVANTAGE',
+                'serviceStandard': str(days),
+                'serviceStandardMessage': f"{days} Days"
+            },
+            'deliveryDays': days
+        }
+
+    @app.get("/locations/v3/post-offices")
+    async def post_offices(zipCode: str, radius: float = 10):
+        centroid = zip_database.centroid(zipCode)
+        if centroid is None:
+            return {'locations': []}
+
+        rng = random.Random(zipCode)
+        locations = []
+        for index in range(rng.randint(2, 6)):
+            distance = rng.uniform(0, radius)
+            bearing = rng.uniform(0, 2 * math.pi)
+            latitude = centroid[0] + distance * math.cos(bearing) / 69
+            longitude = centroid[1] + distance * math.sin(bearing) / (69 * math.cos(math.radians(centroid[0])))
+            locations.append({
+                'locationID': f"{zipCode[:5]}-{index}",
+                'locationName': f"POST OFFICE {zipCode[:5]}-{index}",
+                'latitude': round(latitude, 6),
+                'longitude': round(longitude, 6),
+                'address': {'ZIPCode': zipCode[:5]},
+                'hours': 'MON-FRI 08:30-17:00'
+            })
+        return {'locations': locations}
+
+    @app.post("/labels/v3/label")
+    async def create_label(request: Request):
+        body = await request.json()
+        tracking_number = '9407' + ''.join(random.choices('0123456789', k=18))
+        to_address = body.get('toAddress') or {}
+        rate = rate_table.price(
+            body.get('mailClass') or 'USPS_GROUND_ADVANTAGE', float(body.get('weight') or 1.0),
+            (body.get('fromAddress') or {}).get('zipCode'), to_address.get('zipCode'),
+            special_services=body.get('specialServices')
+        ) if rate_table else None
+
+        state['labels'][tracking_number] = {
+            'createdAt': datetime.now(),
+            'destinationZIP': str(to_address.get('zipCode') or '')[:5]
+        }
+        return {
+            'trackingNumber': tracking_number,
+            'labelUrl': f"{str(request.base_url).rstrip('/')}/labels/v3/label/{tracking_number}.pdf",
+            'postage': rate['totalPrice'] if rate else None
+        }
+
+    @app.get("/labels/v3/label/{tracking_number}.pdf")
+    async def label_download(tracking_number: str):
+        if tracking_number not in state['labels']:
+            return JSONResponse(status_code=404, content={'error': {'message': 'Label not found'}})
+        return Response(content=label_pdf(tracking_number), media_type='application/pdf')
+
+    @app.get("/tracking/v3/tracking/{tracking_number}")
+    async def tracking(tracking_number: str):
+        label = state['labels'].get(tracking_number)
+        if label is None:
+            return JSONResponse(status_code=404, content={'error': {'message': 'Tracking number not found'}})
+
+        day = timedelta(seconds=state['day_seconds'])
+        elapsed_days = (datetime.now() - label['createdAt']) / day
+        events = [
+            {
+                'eventTimestamp': (label['createdAt'] + day * offset).isoformat(),
+                'eventType': event_type,
+                'eventCode': event_code,
+                'eventZIP': label['destinationZIP'] if offset >= 2.0 else '75093'
+            }
+            for offset, event_type, event_code in TRACKING_TIMELINE
+            if offset <= elapsed_days
+        ]
+        delivered = elapsed_days >= TRACKING_TIMELINE[-1][0]
+
+        return {
+            'trackingNumber': tracking_number,
+            'status': 'Delivered' if delivered else events[-1]['eventType'],
+            'trackingEvents': list(reversed(events)),
+            'deliveryDate': events[-1]['eventTimestamp'] if delivered else None,
+            'expectedDeliveryDate': (label['createdAt'] + day * TRACKING_TIMELINE[-1][0]).isoformat()
+        }
+
+    # ========== STAND-IN CONTROL ==========
+
+    @app.get("/__standin/profile")
+    async def get_profile():
+        return {family: profile.to_dict() for family, profile in state['profiles'].items()}
+
+    @app.put("/__standin/profile")
+    async def put_profile(request: Request):
+        """Body: {family or '*': {latency, errorRate, burstEverySeconds, burstSeconds}}"""
+        changes = await request.json()
+        for family in FAMILIES:
+            update = {**changes.get('*', {}), **changes.get(family, {})}
+            if update:
+                state['profiles'][family] = state['profiles'][family].updated(update)
+        state['started'] = time.monotonic()
+        return await get_profile()
+
+    @app.get("/__standin/stats")
+    async def get_stats():
+        return {'labels': len(state['labels']), 'families': state['stats']}
+
+    @app.post("/__standin/reset")
+    async def reset():
+        state['stats'].clear()
+        state['labels'].clear()
+        state['started'] = time.monotonic()
+        return {'reset': True}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='USPS API stand-in with latency and fault injection')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--latency', default=os.getenv('USPS_STANDIN_LATENCY', 'lognormal:80:0.5'))
+    parser.add_argument('--error-rate', type=float, default=float(os.getenv('USPS_STANDIN_ERROR_RATE', '0')))
+    parser.add_argument('--burst-every', type=float, default=float(os.getenv('USPS_STANDIN_BURST_EVERY_SECONDS', '0')))
+    parser.add_argument('--burst-seconds', type=float, default=float(os.getenv('USPS_STANDIN_BURST_SECONDS', '0')))
+    parser.add_argument('--profile', default=os.getenv('USPS_STANDIN_PROFILE'),
+                        help='JSON file with per-family overrides, e.g. {"labels": {"errorRate": 0.1}}')
+    parser.add_argument('--day-seconds', type=float, default=float(os.getenv('USPS_STANDIN_DAY_SECONDS', '60')))
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    profiles = None
+    if args.profile:
+        with open(args.profile, 'r', encoding='utf-8') as f:
+            profiles = json.load(f)
+
+    import uvicorn
+    uvicorn.run(
+        create_standin_app(
+            FaultProfile(args.latency, args.error_rate, args.burst_every, args.burst_seconds),
+            profiles,
+            args.day_seconds
+        ),
+        host=args.host,
+        port=args.port,
+        log_level='warning'
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Rick Jefferson Solutions - ZIP Code Reference Data
+Offline ZIP -> city/state/centroid lookups used by the USPS integration
+
+The dataset is a compact binary file, data/zipdb.bin, memory-mapped at
+runtime and binary-searched, so all ~42k ZIPs cost no Python objects:
+
+    header   32 bytes  magic, dataset version, record count, string table offset
+    records  24 bytes  zip, state, flags, city, latitude, longitude, other cities
+                       (sorted by zip; strings are offsets into the table)
+    strings            NUL-terminated UTF-8
+
+The file is rebuilt with `python zip_database.py build` (from the zipcodes
+package or a CSV export). With ZIP_DATABASE_REFRESH_URL set, each API
+worker also downloads a new dataset (the binary file or a CSV export) once
+the file is older than ZIP_DATABASE_REFRESH_HOURS and swaps it in
+atomically; `python zip_database.py refresh` does the same once. Running
+workers stat the file every ZIP_DATABASE_RECHECK_SECONDS and remap it when
+its mtime changes.
+Without the file, the same format is built in memory from the zipcodes
+package when it is installed. ZIPs missing from the dataset can be learned
+from USPS responses (coordinates only).
+
+@author Rick Jefferson Solutions Development Team
+@version 1.1.0
+@since 2024
+"""
+
+import io
+import os
+import re
+import csv
+import sys
+import mmap
+import time
+import struct
+import asyncio
+import logging
+import argparse
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+try:
+    import zipcodes
+except ImportError:
+    zipcodes = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ZIP_DATABASE_FILE = Path(__file__).parent / 'data' / 'zipdb.bin'
+
+MAGIC = b'RJZIPDB1'
+HEADER = struct.Struct('<8s10s2xII4x')
+RECORD = struct.Struct('<I2sBxIffI')
+NO_STRING = 0xFFFFFFFF
+
+ZIP_TYPES = ('STANDARD', 'PO BOX', 'UNIQUE', 'MILITARY')
+FLAG_ACTIVE = 0x01
+
+
+def zip5(zip_code: Optional[str]) -> Optional[str]:
+    """First five digits of a ZIP or ZIP+4, or None if there are not five"""
+    digits = re.sub(r'\D', '', zip_code or '')
+    return digits[:5] if len(digits) >= 5 else None
+
+
+def _normalize_city(city: Optional[str]) -> str:
+    city = re.sub(r'[^A-Z ]', '', (city or '').upper())
+    city = re.sub(r'\bSAINT\b', 'ST', city)
+    city = re.sub(r'\bFORT\b', 'FT', city)
+    return re.sub(r'\s+', ' ', city).strip()
+
+
+def build_database(entries: Iterable[Dict], version: str) -> bytes:
+    """
+    Encode ZIP entries into the binary format.
+
+    Each entry has zip_code, city, state, lat, long and optionally
+    acceptable_cities, zip_code_type and active.
+    """
+    strings = bytearray()
+    string_offsets: Dict[str, int] = {}
+
+    def add_string(value: Optional[str]) -> int:
+        if not value:
+            return NO_STRING
+        if value not in string_offsets:
+            string_offsets[value] = len(strings)
+            strings.extend(value.encode('utf-8') + b'\0')
+        return string_offsets[value]
+
+    records = []
+    for entry in entries:
+        key = zip5(entry.get('zip_code'))
+        state = (entry.get('state') or '').upper()
+        if key is None or len(state) != 2:
+            continue
+        try:
+            latitude, longitude = float(entry.get('lat')), float(entry.get('long'))
+        except (TypeError, ValueError):
+            latitude = longitude = float('nan')
+
+        zip_type = entry.get('zip_code_type') or 'STANDARD'
+        flags = (FLAG_ACTIVE if entry.get('active', True) else 0)
+        flags |= (ZIP_TYPES.index(zip_type) if zip_type in ZIP_TYPES else 0) << 1
+        other_cities = '|'.join(city.upper() for city in entry.get('acceptable_cities') or [])
+
+        records.append((
+            int(key), state.encode('ascii'), flags,
+            add_string((entry.get('city') or '').upper()),
+            latitude, longitude,
+            add_string(other_cities)
+        ))
+
+    records.sort(key=lambda record: record[0])
+    header_size = HEADER.size
+    strings_offset = header_size + RECORD.size * len(records)
+
+    data = bytearray(HEADER.pack(MAGIC, version.encode('ascii')[:10], len(records), strings_offset))
+    for record in records:
+        data += RECORD.pack(*record)
+    data += strings
+    return bytes(data)
+
+
+def _csv_entries(f) -> List[Dict]:
+    return [
+        {**row, 'acceptable_cities': [city for city in (row.get('acceptable_cities') or '').split('|') if city]}
+        for row in csv.DictReader(f)
+    ]
+
+
+def entries_from_csv(path: Path) -> List[Dict]:
+    """ZIP entries from a CSV with zip_code, city, state, lat, long[, acceptable_cities] columns"""
+    with open(path, newline='', encoding='utf-8') as f:
+        return _csv_entries(f)
+
+
+def write_database(data: bytes, output: Path) -> int:
+    """Atomically replace output with an encoded dataset; returns its ZIP count"""
+    magic, _, count, _ = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a ZIP database file")
+    if count == 0:
+        raise ValueError("Refusing to install an empty ZIP database")
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output.with_suffix('.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, output)
+    return count
+
+
+class ZipDatabase:
+    """Memory-mapped ZIP code reference data"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or os.getenv('ZIP_DATABASE_FILE') or DEFAULT_ZIP_DATABASE_FILE)
+        self.recheck_seconds = float(os.getenv('ZIP_DATABASE_RECHECK_SECONDS', '300'))
+        # false while the dataset is known to lag behind USPS: unknown ZIPs and state
+        # mismatches are then only reported and left to USPS verification
+        self.strict = os.getenv('ZIP_DATABASE_STRICT', 'true').lower() == 'true'
+        self.refresh_url = os.getenv('ZIP_DATABASE_REFRESH_URL') or None
+        self.refresh_hours = float(os.getenv('ZIP_DATABASE_REFRESH_HOURS', '168'))
+        self.last_refresh: Optional[Dict] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._data = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self.version: Optional[str] = None
+        self.count = 0
+        self._strings_offset = 0
+        self._learned: Dict[str, Tuple[float, float]] = {}
+
+    # ========== LOADING ==========
+
+    def _open(self) -> None:
+        """Map the dataset file (again if it was rebuilt since it was opened)"""
+        now = time.monotonic()
+        if self._data is not None and now < self._next_check:
+            return
+        self._next_check = now + self.recheck_seconds
+
+        try:
+            mtime = self.path.stat().st_mtime
+        except OSError:
+            mtime = None
+
+        if self._data is not None and mtime == self._mtime:
+            return
+
+        if mtime is not None:
+            with open(self.path, 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            source = str(self.path)
+        elif self._data is not None:
+            return
+        elif zipcodes is not None:
+            data = build_database(zipcodes.list_all(), 'zipcodes')
+            source = 'zipcodes package'
+        else:
+            logger.warning("No ZIP database file and zipcodes package not installed; ZIP checks are disabled")
+            data = build_database([], 'empty')
+            source = 'empty'
+
+        magic, version, count, strings_offset = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a ZIP database file")
+
+        if self._mmap is not None:
+            self._mmap.close()
+        self._mmap = data if isinstance(data, mmap.mmap) else None
+        self._data = data
+        self._mtime = mtime
+        self.version = version.rstrip(b'\0').decode('ascii')
+        self.count = count
+        self._strings_offset = strings_offset
+        logger.info(f"ZIP database {self.version} loaded from {source} ({count} ZIPs)")
+
+    # ========== REFRESH ==========
+
+    def start(self) -> None:
+        if self.refresh_url and self.refresh_hours > 0 and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def close(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    def refresh_due(self) -> bool:
+        """True when the file is missing or older than ZIP_DATABASE_REFRESH_HOURS"""
+        try:
+            age = time.time() - self.path.stat().st_mtime
+        except OSError:
+            return True
+        return age >= self.refresh_hours * 3600
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                if self.refresh_due():
+                    await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning(f"ZIP database refresh failed: {str(error)}")
+
+            # Every worker runs the loop; whichever replaces the file first
+            # makes it fresh for the others
+            await asyncio.sleep(min(self.refresh_hours * 3600, 3600))
+
+    async def _download(self, url: str) -> bytes:
+        async with httpx.AsyncClient(timeout=120.0, follow_redirects=True) as client:
+            response = await client.get(url)
+            response.raise_for_status()
+            return response.content
+
+    async def refresh(self, url: Optional[str] = None) -> Dict:
+        """Download a dataset (binary file or CSV export) and swap it in for the current file"""
+        url = url or self.refresh_url
+        if not url:
+            raise ValueError("ZIP_DATABASE_REFRESH_URL is not set")
+
+        content = await self._download(url)
+        if content.startswith(MAGIC):
+            data = content
+        else:
+            entries = _csv_entries(io.StringIO(content.decode('utf-8-sig')))
+            data = build_database(entries, date.today().isoformat())
+
+        count = await asyncio.to_thread(write_database, data, self.path)
+        self._next_check = 0.0
+        self._open()
+        self.last_refresh = {'at': time.time(), 'version': self.version, 'zips': count}
+        logger.info(f"ZIP database refreshed from {url}")
+        return self.last_refresh
+
+    def _string(self, offset: int) -> Optional[str]:
+        if offset == NO_STRING:
+            return None
+        start = self._strings_offset + offset
+        end = self._data.find(b'\0', start)
+        return self._data[start:end].decode('utf-8')
+
+    def _record(self, zip_code: Optional[str]) -> Optional[Tuple]:
+        key = zip5(zip_code)
+        if key is None:
+            return None
+        self._open()
+
+        target = int(key)
+        low, high = 0, self.count - 1
+        while low <= high:
+            middle = (low + high) // 2
+            record = RECORD.unpack_from(self._data, HEADER.size + middle * RECORD.size)
+            if record[0] < target:
+                low = middle + 1
+            elif record[0] > target:
+                high = middle - 1
+            else:
+                return record
+        return None
+
+    # ========== LOOKUPS ==========
+
+    def lookup(self, zip_code: Optional[str]) -> Optional[Dict]:
+        """City, state and centroid of a ZIP code, or None if it does not exist"""
+        record = self._record(zip_code)
+        if record is None:
+            return None
+
+        zip_int, state, flags, city, latitude, longitude, other_cities = record
+        other = self._string(other_cities)
+        return {
+            'zipCode': f"{zip_int:05d}",
+            'city': self._string(city),
+            'state': state.decode('ascii'),
+            'acceptableCities': other.split('|') if other else [],
+            'type': ZIP_TYPES[(flags >> 1) & 0x03],
+            'active': bool(flags & FLAG_ACTIVE),
+            'latitude': None if latitude != latitude else latitude,
+            'longitude': None if longitude != longitude else longitude
+        }
+
+    def centroid(self, zip_code: Optional[str]) -> Optional[Tuple[float, float]]:
+        """(latitude, longitude) of a ZIP code, or None if unknown"""
+        record = self._record(zip_code)
+        if record is not None and record[4] == record[4]:
+            return record[4], record[5]
+        return self._learned.get(zip5(zip_code))
+
+    def learn_centroid(self, zip_code: Optional[str], latitude: float, longitude: float) -> None:
+        """Remember coordinates for a ZIP the reference data does not have"""
+        key = zip5(zip_code)
+        if key is not None and self.centroid(key) is None:
+            self._learned[key] = (latitude, longitude)
+
+    def prevalidate(self, address: Dict) -> Dict:
+        """
+        Check cityName/state/zipCode of an address before any USPS call.
+
+        Rejects malformed or nonexistent ZIPs and ZIPs in another state. A
+        wrong state is corrected instead when the city matches the ZIP, and
+        a missing city or state is filled in. A city that differs from the
+        dataset is only reported: vanity city names are deliverable.
+
+        With strict off (ZIP_DATABASE_STRICT=false) unknown ZIPs and state
+        mismatches are reported as warnings and left for USPS to decide.
+        """
+        zip_code = address.get('zipCode')
+        if zip5(zip_code) is None:
+            return {'valid': False, 'error': f"ZIP Code '{zip_code or ''}' is not a 5-digit ZIP"}
+
+        self._open()
+        if self.count == 0:
+            return {'valid': True, 'corrections': {}, 'warnings': ['ZIP database unavailable']}
+
+        entry = self.lookup(zip_code)
+        if entry is None:
+            error = f"ZIP Code {zip5(zip_code)} does not exist"
+            if self.strict:
+                return {'valid': False, 'error': error}
+            return {'valid': True, 'corrections': {}, 'warnings': [error]}
+
+        corrections = {}
+        warnings = []
+        city = address.get('cityName')
+        city_listed = _normalize_city(city) in {
+            _normalize_city(name) for name in [entry['city'], *entry['acceptableCities']]
+        }
+
+        state = (address.get('state') or '').strip().upper()
+        if not state or (state != entry['state'] and city_listed):
+            corrections['state'] = entry['state']
+        elif state != entry['state']:
+            error = f"ZIP Code {entry['zipCode']} is in {entry['state']}, not {state}"
+            if self.strict:
+                return {'valid': False, 'error': error}
+            warnings.append(error)
+
+        if not (city or '').strip():
+            corrections['cityName'] = entry['city']
+        elif not city_listed:
+            warnings.append(f"City {city} is not listed for ZIP Code {entry['zipCode']} ({entry['city']})")
+
+        if not entry['active']:
+            warnings.append(f"ZIP Code {entry['zipCode']} is no longer active")
+
+        return {'valid': True, 'corrections': corrections, 'warnings': warnings}
+
+    def stats(self) -> Dict:
+        return {
+            'version': self.version,
+            'zips': self.count,
+            'memoryMapped': self._mmap is not None,
+            'learnedCentroids': len(self._learned),
+            'strict': self.strict,
+            'lastRefresh': self.last_refresh
+        }
+
+
+# Create singleton instance
+zip_database = ZipDatabase()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ZIP code reference database')
+    subcommands = parser.add_subparsers(dest='command', required=True)
+
+    build = subcommands.add_parser('build', help='Rebuild the binary ZIP database')
+    build.add_argument('--csv', help='CSV export to build from instead of the zipcodes package')
+    build.add_argument('--output', default=str(zip_database.path))
+    build.add_argument('--version', default=date.today().isoformat())
+
+    refresh = subcommands.add_parser('refresh', help='Download the dataset and swap it in')
+    refresh.add_argument('--url', help='Binary file or CSV export (default: ZIP_DATABASE_REFRESH_URL)')
+
+    show = subcommands.add_parser('lookup', help='Look up ZIP codes')
+    show.add_argument('zip_codes', nargs='+')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        if args.csv:
+            entries = entries_from_csv(Path(args.csv))
+        elif zipcodes is not None:
+            entries = zipcodes.list_all()
+        else:
+            print("Install the zipcodes package or pass --csv")
+            return 1
+
+        data = build_database(entries, args.version)
+        count = write_database(data, Path(args.output))
+        print(f"✅ Wrote {count} ZIPs ({len(data)} bytes) to {args.output}")
+        return 0
+
+    if args.command == 'refresh':
+        result = asyncio.run(zip_database.refresh(args.url))
+        print(f"✅ Installed ZIP database {result['version']} ({result['zips']} ZIPs) at {zip_database.path}")
+        return 0
+
+    for zip_code in args.zip_codes:
+        print(zip_code, zip_database.lookup(zip_code))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
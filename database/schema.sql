@@ -76,6 +76,25 @@ CREATE TABLE disputes (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Bulk mailing jobs for dispute letters
+CREATE TABLE mailing_jobs (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    status VARCHAR(30) NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'completed', 'completed_with_errors', 'cancelled', 'failed')),
+    total_items INTEGER NOT NULL,
+    concurrency INTEGER NOT NULL,
+    verify_addresses BOOLEAN DEFAULT TRUE,
+    unconfirmed_items INTEGER DEFAULT 0,
+    envelopes INTEGER, -- Labels needed after consolidating letters per client and recipient
+    options JSONB,
+    last_error TEXT,
+    cancel_requested_at TIMESTAMP, -- Set by a cancel request; the worker running the job stops at its next envelope
+    started_at TIMESTAMP,
+    completed_at TIMESTAMP,
+    created_by UUID REFERENCES users(id),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Letters table for dispute letters
 CREATE TABLE letters (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -86,11 +105,16 @@ CREATE TABLE letters (
     content TEXT NOT NULL,
     recipient_name VARCHAR(255),
     recipient_address JSONB,
+    recipient_id VARCHAR(50), -- Canonical recipient id from backend/data/recipients.json
     recipient_email VARCHAR(255),
     send_method VARCHAR(20) CHECK (send_method IN ('email', 'mail', 'fax')),
     sent_at TIMESTAMP,
     delivered_at TIMESTAMP,
     tracking_number VARCHAR(100),
+    special_services JSONB, -- USPS extra services, e.g. ["CERTIFIED_MAIL", "RETURN_RECEIPT"]
+    page_count INTEGER DEFAULT 1,
+    mailing_job_id UUID REFERENCES mailing_jobs(id) ON DELETE SET NULL,
+    mailing_job_position INTEGER, -- Order of the letter within its mailing job
     created_by UUID REFERENCES users(id),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
@@ -268,6 +292,9 @@ CREATE INDEX idx_letters_dispute_id ON letters(dispute_id);
 CREATE INDEX idx_letters_status ON letters(status);
 CREATE INDEX idx_letters_letter_type ON letters(letter_type);
 CREATE INDEX idx_letters_created_at ON letters(created_at);
+CREATE INDEX idx_letters_mailing_job ON letters(mailing_job_id, mailing_job_position);
+CREATE INDEX idx_letter_tracking_letter_id ON letter_tracking(letter_id, created_at);
+CREATE INDEX idx_mailing_jobs_status ON mailing_jobs(status);
 
 -- Documents indexes
 CREATE INDEX idx_documents_client_id ON documents(client_id);
@@ -326,6 +353,7 @@ CREATE TRIGGER update_users_updated_at BEFORE UPDATE ON users FOR EACH ROW EXECU
 CREATE TRIGGER update_clients_updated_at BEFORE UPDATE ON clients FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_disputes_updated_at BEFORE UPDATE ON disputes FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_letters_updated_at BEFORE UPDATE ON letters FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+CREATE TRIGGER update_mailing_jobs_updated_at BEFORE UPDATE ON mailing_jobs FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_documents_updated_at BEFORE UPDATE ON documents FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_subscriptions_updated_at BEFORE UPDATE ON subscriptions FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_payments_updated_at BEFORE UPDATE ON payments FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
@@ -487,6 +515,7 @@ COMMENT ON TABLE users IS 'System users including staff and administrators';
 COMMENT ON TABLE clients IS 'Credit repair clients and their personal information';
 COMMENT ON TABLE disputes IS 'Credit disputes filed on behalf of clients';
 COMMENT ON TABLE letters IS 'Dispute letters generated and sent to credit bureaus';
+COMMENT ON TABLE mailing_jobs IS 'Bulk dispute-letter mailing jobs and their progress';
 COMMENT ON TABLE documents IS 'File uploads related to clients and disputes';
 COMMENT ON TABLE subscriptions IS 'Client subscription plans and billing information';
 COMMENT ON TABLE payments IS 'Payment transactions and billing records';